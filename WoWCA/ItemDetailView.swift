@@ -22,6 +22,8 @@ struct ItemDetailView: View {
     @State private var loadedSpells: [Int: Spell] = [:]
     @State private var isLoadingSpells = false
     @State private var spellLoadError: String? = nil
+    // Build-time rendered tooltip lines (item_spell_text), keyed by spell ID
+    @State private var spellTexts: [Int: String] = [:]
 
     // Logger for detail view events
     private let logger = Logger(subsystem: "com.wowca.app", category: "ItemDetail")
@@ -177,6 +179,7 @@ struct ItemDetailView: View {
             logger.info("🚀 ItemDetailView task started - loading spell bonuses for [\(item.entry)]")
             print("🚀 Loading spell bonuses for item [\(item.entry)] \(item.name)")
             await loadSpellBonuses()
+            await loadSpellTexts()
         }
         .onAppear {
             logger.info("👁️ ItemDetailView appeared for item [\(item.entry)] \(item.name)")
@@ -1201,6 +1204,32 @@ struct ItemDetailView: View {
             || (item.duration ?? 0) > 0 || (item.lock_id ?? 0) > 0
     }
 
+    // Tooltip lines rendered at build time: one primary-key read of item_spell_text.
+    // Databases built before the table existed fall back to Spell.parsedDescription()
+    private func loadSpellTexts() async {
+        guard spellTexts.isEmpty, item.hasSpellEffects, let queue = DatabaseService.shared.dbQueue
+        else { return }
+        do {
+            let entry = item.entry
+            let lines: [ItemSpellText] = try await queue.read { db in
+                guard try db.tableExists(ItemSpellText.databaseTableName) else { return [] }
+                return try ItemSpellText.filter(Column("entry") == entry).order(Column("slot"))
+                    .fetchAll(db)
+            }
+            var texts: [Int: String] = [:]
+            for line in lines {
+                if let text = line.text, !text.isEmpty, texts[line.spellId] == nil {
+                    texts[line.spellId] = text
+                }
+            }
+            spellTexts = texts
+            print("📜 Loaded \(texts.count) rendered spell lines for [\(entry)]")
+        } catch {
+            logger.error("❌ Spell text loading failed: \(error.localizedDescription)")
+            print("❌ Spell text load failed: \(error)")
+        }
+    }
+
     // Fetch spells from DB if not already provided on the item
     private func ensureSpellsLoaded() {
         // If spells already populated externally, index and bail
@@ -1270,15 +1299,25 @@ struct ItemDetailView: View {
                                 .font(.caption)
                                 .foregroundStyle(.secondary)
                         }
+                        if let renderedText = spellTexts[effect.spellId] {
+                            Text(renderedText)
+                                .font(.caption)
+                                .foregroundStyle(.primary)
+                                .padding(6)
+                                .background(Color.orange.opacity(0.08))
+                                .clipShape(RoundedRectangle(cornerRadius: 6))
+                        }
                         if let spell = spell {
-                            let parsedDesc = spell.parsedDescription()
-                            if !parsedDesc.isEmpty && parsedDesc != "No description available" {
-                                Text(parsedDesc)
-                                    .font(.caption)
-                                    .foregroundStyle(.primary)
-                                    .padding(6)
-                                    .background(Color.orange.opacity(0.08))
-                                    .clipShape(RoundedRectangle(cornerRadius: 6))
+                            if spellTexts[effect.spellId] == nil {
+                                let parsedDesc = spell.parsedDescription()
+                                if !parsedDesc.isEmpty && parsedDesc != "No description available" {
+                                    Text(parsedDesc)
+                                        .font(.caption)
+                                        .foregroundStyle(.primary)
+                                        .padding(6)
+                                        .background(Color.orange.opacity(0.08))
+                                        .clipShape(RoundedRectangle(cornerRadius: 6))
+                                }
                             }
 
                             // Show damage ranges for each effect
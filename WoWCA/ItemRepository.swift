@@ -54,12 +54,32 @@ import os.log
                     return items
                 }
 
-                // Build FTS query with token prefixes
+                // First keystrokes: one- and two-character single-token queries read the
+                // precomputed, ranked suggestions (item_suggest.py) with one primary-key range
+                // read instead of an FTS prefix scan over thousands of rows
+                if let prefix = Self.suggestPrefix(for: trimmed), limit <= Self.suggestTopK,
+                    try db.tableExists("item_suggest")
+                {
+                    let suggestSQL = """
+                        SELECT i.* FROM item_suggest s
+                        JOIN items i ON i.entry = s.entry
+                        WHERE s.prefix = ?
+                        ORDER BY s.rank
+                        LIMIT ?
+                        """
+                    let items = try Item.fetchAll(db, sql: suggestSQL, arguments: [prefix, limit])
+                    logger.info("💡 Suggestion lookup for '\(prefix)' returned \(items.count) items")
+                    print("💡 Suggestion lookup '\(prefix)': \(items.count) items")
+                    return items
+                }
+
+                // Build FTS query with token prefixes; each token is quoted so apostrophes,
+                // hyphens and other punctuation are matched as text, not parsed as FTS5 syntax
                 logger.info("🔤 Text query detected, building FTS query...")
                 print("🔤 Text query - building FTS search...")
 
                 let tokens = trimmed.split(whereSeparator: { $0.isWhitespace })
-                let ftsTokens = tokens.map { "\($0)*" }
+                let ftsTokens = tokens.map { "\"" + $0.replacingOccurrences(of: "\"", with: "\"\"") + "\"*" }
                 let ftsQuery = ftsTokens.joined(separator: " ")
 
                 logger.info("🔍 FTS tokens: \(tokens) -> \(ftsTokens)")
@@ -103,6 +123,22 @@ import os.log
             }
         }
 
+        /// Longest prefix and suggestions per prefix precomputed into `item_suggest`
+        /// (MAX_PREFIX / TOP_K in item_suggest.py).
+        private static let suggestPrefixLength = 2
+        private static let suggestTopK = 50
+
+        /// The `item_suggest` key for a query short enough to be served from it: one token
+        /// of letters, digits or apostrophes, folded like the FTS tokenizer (lowercase, no
+        /// diacritics). Nil when the query needs FTS.
+        private static func suggestPrefix(for query: String) -> String? {
+            guard query.count <= suggestPrefixLength,
+                query.allSatisfy({ $0.isLetter || $0.isNumber || $0 == "'" })
+            else { return nil }
+            return query.folding(options: [.caseInsensitive, .diacriticInsensitive], locale: nil)
+                .lowercased()
+        }
+
         /// Enrich items with spell rows if they have spell effect references.
         func enrichWithSpells(items: [Item]) -> [Item] {
             logger.info("🪄 enrichWithSpells() called with \(items.count) items")
@@ -641,3 +641,27 @@ extension Spell {
 #if canImport(GRDB)
     extension Spell: FetchableRecord, PersistableRecord {}
 #endif
+
+/// One item spell line rendered at build time (spell_tooltips.py): `text` is the
+/// tooltip with placeholders already substituted and the trigger prefix
+/// ("Use: ", "Equip: ", "Chance on hit: "), so the detail view does not run
+/// `parsedDescription()` on databases that ship the table.
+struct ItemSpellText: Codable, Hashable {
+    var entry: Int
+    var slot: Int
+    var spellId: Int
+    var trigger: Int?
+    var name: String?
+    var text: String?
+
+    enum CodingKeys: String, CodingKey {
+        case entry, slot, trigger, name, text
+        case spellId = "spell_id"
+    }
+}
+
+#if canImport(GRDB)
+    extension ItemSpellText: FetchableRecord, TableRecord {
+        nonisolated static var databaseTableName: String { "item_spell_text" }
+    }
+#endif
@@ -0,0 +1,167 @@
+"""Benchmark the dump row decoder against the parsing paths it replaced.
+
+Writes a synthetic 129-column `items` dump and a 179-column `spell_template`
+dump to a temporary directory, then reports rows/sec for:
+ - legacy items path: f.read() + DOTALL regex + extract_tuples + eval
+ - legacy spells path: per-character `current_value += char` splitter
+ - sql_dump.iter_rows (mmap byte scanner + eval-free decoder)
+ - sql_dump.iter_rows(fields=...) decoding only the columns the discrepancy
+   analysis keeps
+
+Usage:
+  python3 bench/bench_decode.py [--rows 20000]
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sql_dump import iter_rows  # noqa: E402
+
+ITEM_COLUMNS = 129
+SPELL_COLUMNS = 179
+SPELL_TEXT_COLUMNS = range(117, 149)
+NAMES = [
+    "Worn Shortsword", "Tome of the Lost (Vol. 2)", "Tarnished Chain Belt",
+    "Arcanite Reaper", "Hand of Ragnaros", "Tirion\\'s Blessing", "Warden\\'s Staff, Used",
+]
+
+
+def _literal(rng: random.Random, text: bool) -> str:
+    if text:
+        return "'%s'" % rng.choice(NAMES + [''])
+    r = rng.random()
+    if r < 0.6:
+        return '0'
+    if r < 0.8:
+        return str(rng.randint(-1, 5000))
+    if r < 0.9:
+        return '%.2f' % (rng.random() * 4)
+    return '-1'
+
+
+def write_dump(path: str, table: str, columns: int, rows: int, text_columns, per_insert: int = 500):
+    rng = random.Random(columns)
+    with open(path, 'w') as f:
+        col_list = ', '.join('`c%d`' % c for c in range(columns))
+        f.write("CREATE TABLE `%s` (`entry` int(11));\n" % table)
+        for start in range(0, rows, per_insert):
+            f.write("INSERT INTO `%s` (%s) VALUES\n" % (table, col_list))
+            tuples = []
+            for entry in range(start, min(rows, start + per_insert)):
+                vals = [str(entry), str(rng.randint(0, 9))]
+                vals += [_literal(rng, c in text_columns) for c in range(2, columns)]
+                tuples.append('(' + ','.join(vals) + ')')
+            f.write(',\n'.join(tuples) + ';\n')
+
+
+def legacy_items(path: str) -> int:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    insert_re = re.compile(r"INSERT INTO `items` .*? VALUES\s*(.*?);", re.DOTALL)
+    count = 0
+    for payload in insert_re.findall(content):
+        depth = 0
+        current = []
+        tuples = []
+        for ch in payload:
+            if ch == '(':
+                if depth == 0:
+                    current = []
+                depth += 1
+                current.append(ch)
+            elif ch == ')':
+                current.append(ch)
+                depth -= 1
+                if depth == 0:
+                    tuples.append(''.join(current))
+            elif depth > 0:
+                current.append(ch)
+        for raw in tuples:
+            eval(raw)
+            count += 1
+    return count
+
+
+def legacy_spells(path: str) -> int:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    matches = re.findall(r"INSERT INTO `spell_template`.*?VALUES\s+(.*?)(?=INSERT|$)",
+                         content, re.DOTALL | re.IGNORECASE)
+    count = 0
+    for match in matches:
+        for line in match.split('\n'):
+            line = line.strip()
+            if not line.endswith(('),', ');')):
+                continue
+            values = []
+            current_value = ""
+            in_quotes = False
+            escape_next = False
+            for char in line[1:-2]:
+                if escape_next:
+                    current_value += char
+                    escape_next = False
+                elif char == '\\':
+                    current_value += char
+                    escape_next = True
+                elif char == "'":
+                    in_quotes = not in_quotes
+                    current_value += char
+                elif char == ',' and not in_quotes:
+                    values.append(current_value.strip())
+                    current_value = ""
+                else:
+                    current_value += char
+            values.append(current_value.strip())
+            count += 1
+    return count
+
+
+def streaming(table: str, fields=None):
+    def run(path: str) -> int:
+        return sum(1 for _ in iter_rows(path, table, fields=fields))
+    return run
+
+
+def timed(label: str, fn, path: str, expected: int):
+    start = time.perf_counter()
+    count = fn(path)
+    elapsed = time.perf_counter() - start
+    assert count == expected, f"{label}: decoded {count} rows, expected {expected}"
+    print(f"  {label:<34} {elapsed:7.3f}s  {count / elapsed:12,.0f} rows/sec")
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--rows', type=int, default=20000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        items_sql = os.path.join(tmp, 'items.sql')
+        spells_sql = os.path.join(tmp, 'spells.sql')
+        write_dump(items_sql, 'items', ITEM_COLUMNS, args.rows, {4, 5})
+        write_dump(spells_sql, 'spell_template', SPELL_COLUMNS, args.rows, SPELL_TEXT_COLUMNS)
+
+        print(f"items ({ITEM_COLUMNS} columns, {args.rows} rows)")
+        old = timed('legacy extract_tuples + eval', legacy_items, items_sql, args.rows)
+        new = timed('sql_dump.iter_rows', streaming('items'), items_sql, args.rows)
+        print(f"  speedup x{old / new:.1f}")
+
+        print(f"spell_template ({SPELL_COLUMNS} columns, {args.rows} rows)")
+        old = timed('legacy per-character splitter', legacy_spells, spells_sql, args.rows)
+        new = timed('sql_dump.iter_rows', streaming('spell_template'), spells_sql, args.rows)
+        print(f"  speedup x{old / new:.1f}")
+        new = timed('sql_dump.iter_rows(fields=4 cols)', streaming('spell_template', (0, 1, 76, 121)),
+                    spells_sql, args.rows)
+        print(f"  speedup x{old / new:.1f}")
+
+
+if __name__ == '__main__':
+    main()
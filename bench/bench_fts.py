@@ -0,0 +1,202 @@
+"""Replay search-as-you-type prefix queries against items_fts configurations.
+
+The app sends every (debounced) keystroke as a query in which each
+whitespace-separated token becomes a quoted prefix term (`"thund"*`). This
+harness builds `items_fts` over the same items with several tokenizer/prefix
+configurations and, for each one, reports:
+  size      pages used by the FTS shadow tables (dbstat, else file growth)
+  latency   median / p95 per query, overall and by the length of the token
+            being typed, plus the mean weighted by how often each length occurs
+  recall    share of keystroke queries typed from a name containing an
+            apostrophe or hyphen that still match that item
+
+The workload is every keystroke prefix of a seeded sample of item names, so
+the token-length histogram it prints is what the schema's `prefix=` sizes
+are chosen from: a prefix index pays off for the short, most frequent
+lengths whose prefix ranges are widest.
+
+Usage:
+  python3 bench/bench_fts.py [--db build/items.sqlite] [--synthetic 20000]
+      [--sample 300] [--seed 1] [--config 'unicode61|' --config 'unicode61|2 3' ...]
+      [--out build/bench/fts.json]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# tokenizer|prefix; the first entry is the reference the others are compared with
+DEFAULT_CONFIGS = (
+    "unicode61|",
+    "unicode61|1 2 3",
+    "unicode61 remove_diacritics 2 tokenchars ''''|",
+    "unicode61 remove_diacritics 2 tokenchars ''''|2 3",
+    "unicode61 remove_diacritics 2 tokenchars ''''|1 2 3",
+    "unicode61 remove_diacritics 2 tokenchars ''''|2 3 4",
+)
+# The app's search (ItemRepository.search)
+SEARCH_SQL = ("SELECT i.entry FROM items i JOIN items_fts f ON i.entry = f.rowid "
+              "WHERE items_fts MATCH ? ORDER BY rank LIMIT 50")
+RECALL_SQL = "SELECT 1 FROM items_fts WHERE items_fts MATCH ? AND rowid = ?"
+
+
+def fts_query(text: str) -> Optional[str]:
+    """The FTS5 query the app builds: each token quoted (so ' and - are not syntax) and prefixed."""
+    tokens = text.split()
+    if not tokens:
+        return None
+    return ' '.join('"%s"*' % t.replace('"', '""') for t in tokens)
+
+
+def load_items(db: Optional[str], synthetic: int, seed: int) -> List[Tuple[int, str, str]]:
+    if db and os.path.exists(db):
+        con = sqlite3.connect(db)
+        rows = con.execute("SELECT entry, name, description FROM items").fetchall()
+        con.close()
+        print(f"Loaded {len(rows)} items from {db}")
+        return rows
+    import synth
+    from sql_dump import decode_tuple
+    rows = {}
+    for raw in synth.item_rows(synthetic, synthetic, seed):
+        values = decode_tuple(raw)
+        rows[values[0]] = (values[0], values[4], values[5])
+    print(f"{db or 'no --db'} not found: using {len(rows)} synthetic items")
+    return list(rows.values())
+
+
+def keystroke_queries(items, sample: int, seed: int) -> List[Tuple[int, str]]:
+    """(entry, typed text) for every keystroke while typing a sample of item names."""
+    rng = random.Random(seed)
+    named = [(entry, name) for entry, name, _ in items if name and name.strip()]
+    out = []
+    for entry, name in rng.sample(named, min(sample, len(named))):
+        name = ' '.join(name.split())
+        for end in range(1, len(name) + 1):
+            if name[end - 1] != ' ':
+                out.append((entry, name[:end]))
+    return out
+
+
+def parse_config(spec: str) -> Tuple[str, str]:
+    tokenize, _, prefix = spec.partition('|')
+    if not re.fullmatch(r"[\d ]*", prefix):
+        raise SystemExit(f"Bad prefix list in {spec!r}")
+    return tokenize.strip(), ' '.join(prefix.split())
+
+
+def build(path: str, items, tokenize: str, prefix: str) -> Optional[int]:
+    """Items + items_fts (external content, like the app DB); returns the FTS size in bytes."""
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE items (entry INTEGER PRIMARY KEY, name TEXT, description TEXT)")
+    con.executemany("INSERT INTO items VALUES (?,?,?)", items)
+    options = "tokenize='%s'" % tokenize.replace("'", "''")
+    if prefix:
+        options += ", prefix='%s'" % prefix
+    con.execute("CREATE VIRTUAL TABLE items_fts USING fts5(entry, name, description, "
+                "content=items, content_rowid=entry, %s)" % options)
+    con.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    con.execute("INSERT INTO items_fts(items_fts) VALUES ('optimize')")
+    con.commit()
+    try:
+        size = con.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'items_fts%'").fetchone()[0]
+    except sqlite3.OperationalError:  # SQLite built without dbstat
+        size = None
+    con.close()
+    return size
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def replay(path: str, queries, tricky) -> dict:
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    by_length: Dict[int, List[float]] = {}
+    timings = []
+    for _, text in queries:
+        q = fts_query(text)
+        start = time.perf_counter()
+        con.execute(SEARCH_SQL, (q,)).fetchall()
+        ms = (time.perf_counter() - start) * 1000
+        timings.append(ms)
+        by_length.setdefault(len(text.split()[-1]), []).append(ms)
+    found = sum(1 for entry, text in tricky if con.execute(RECALL_SQL, (fts_query(text), entry)).fetchone())
+    con.close()
+    lengths = Counter({n: len(v) for n, v in by_length.items()})
+    weighted = sum(statistics.mean(v) * lengths[n] for n, v in by_length.items()) / len(timings)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'weighted_mean_ms': round(weighted, 3),
+        'by_token_length': {n: {'queries': lengths[n], 'median_ms': round(statistics.median(v), 3)}
+                            for n, v in sorted(by_length.items())},
+        'tricky_recall': round(found / len(tricky), 3) if tricky else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--db', default=os.path.join(ROOT, 'build', 'items.sqlite'))
+    ap.add_argument('--synthetic', type=int, default=20000, help="synthetic items when --db is missing")
+    ap.add_argument('--sample', type=int, default=300, help="item names typed keystroke by keystroke")
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--config', action='append', help="'tokenizer|prefix lengths' (repeatable)")
+    ap.add_argument('--out', default=os.path.join(ROOT, 'build', 'bench', 'fts.json'))
+    args = ap.parse_args()
+
+    items = load_items(args.db, args.synthetic, args.seed)
+    queries = keystroke_queries(items, args.sample, args.seed)
+    tricky = [(e, t) for e, t in queries if "'" in t or '-' in t]
+    histogram = Counter(len(text.split()[-1]) for _, text in queries)
+    print(f"{len(queries)} keystroke queries ({len(tricky)} with ' or -); token length histogram:")
+    for n in sorted(histogram)[:12]:
+        print(f"  {n:>2} chars {histogram[n]:>6} {'#' * max(1, 60 * histogram[n] // max(histogram.values()))}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, spec in enumerate(args.config or DEFAULT_CONFIGS):
+            tokenize, prefix = parse_config(spec)
+            path = os.path.join(tmp, f"fts{i}.sqlite")
+            size = build(path, items, tokenize, prefix)
+            replay(path, queries[:200], tricky)  # warm-up
+            stats = replay(path, queries, tricky)
+            results.append({'tokenize': tokenize, 'prefix': prefix, 'fts_bytes': size, **stats})
+
+    print(f"\n{'tokenize':<48} {'prefix':<8} {'FTS MB':>7} {'median':>8} {'p95':>8} {'weighted':>9} {'recall':>7}")
+    base = results[0]
+    for r in results:
+        size = f"{r['fts_bytes'] / 1e6:7.2f}" if r['fts_bytes'] else '      ?'
+        recall = f"{r['tricky_recall']:7.0%}" if r['tricky_recall'] is not None else '      -'
+        print(f"{r['tokenize']:<48} {r['prefix'] or '-':<8} {size} {r['median_ms']:7.3f}ms "
+              f"{r['p95_ms']:7.3f}ms {r['weighted_mean_ms']:8.3f}ms {recall}")
+    print(f"\nMedian latency by token length (ms), vs {base['tokenize']!r} without prefix indexes:")
+    lengths = sorted(base['by_token_length'])[:8]
+    print(f"  {'prefix':<8}" + ''.join(f"{n:>8}" for n in lengths))
+    for r in results:
+        print(f"  {r['prefix'] or '-':<8}" + ''.join(
+            f"{r['by_token_length'][n]['median_ms']:8.3f}" for n in lengths))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump({'queries': len(queries), 'token_lengths': dict(sorted(histogram.items())),
+                   'configs': results}, f, indent=1)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
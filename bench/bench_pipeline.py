@@ -0,0 +1,187 @@
+"""Per-stage benchmark of the build pipeline on synthetic dumps, with a regression gate.
+
+Generates `items` and `spell_template` dumps with bench/synth.py (fully
+offline, deterministic per seed) and times each stage on its own:
+  read      raw sequential read of the dump file
+  tokenize  row boundary scan (sql_dump.iter_tuples)
+  decode    row decoding (sql_dump.decode_tuple)
+  select    best version per entry (patch priority / build preference)
+  insert    BulkLoader batched inserts
+  index     secondary index rebuild (items)
+  fts       items_fts rebuild (items)
+
+Results go to a JSON file. With `--baseline`, every stage's rows/sec is
+compared with the baseline's and the run exits non-zero when one is slower
+by more than `--tolerance` (stages under `--noise-floor` seconds in both runs
+are not compared). Baselines are machine-specific: record one with
+`--save-baseline` on the machine that runs the comparison.
+
+Usage:
+  python3 bench/bench_pipeline.py [--items 20000] [--spells 20000] [--seed 1]
+      [--out build/bench/pipeline.json] [--baseline bench/baseline.json]
+      [--tolerance 0.25] [--save-baseline]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from best_version import BestVersions, spell_build_rank  # noqa: E402
+from sql_dump import CHUNK_SIZE, decode_tuple, iter_tuples  # noqa: E402
+from sqlite_bulk import BulkLoader  # noqa: E402
+from items_rebuild_patch_priority import item_record, select_patch_priority  # noqa: E402
+from table_schema import ITEMS, items_schema_sql  # noqa: E402
+import synth  # noqa: E402
+
+class Stages:
+    def __init__(self):
+        self.results = {}
+
+    def record(self, name: str, seconds: float, rows: int, nbytes: int = 0) -> None:
+        entry = {'seconds': round(seconds, 4), 'rows': rows,
+                 'rows_per_sec': round(rows / seconds, 1) if seconds and rows else None}
+        if nbytes:
+            entry['mb_per_sec'] = round(nbytes / 1e6 / seconds, 1) if seconds else None
+        self.results[name] = entry
+        rate = f"{entry['rows_per_sec']:>12,.0f} rows/sec" if entry['rows_per_sec'] else ''
+        if entry.get('mb_per_sec'):
+            rate += f"  {entry['mb_per_sec']:8,.1f} MB/sec"
+        print(f"  {name:<16} {seconds:8.3f}s  {rate}")
+
+    def timed(self, name: str, fn, rows_of=len, nbytes: int = 0):
+        start = time.perf_counter()
+        out = fn()
+        self.record(name, time.perf_counter() - start, rows_of(out), nbytes)
+        return out
+
+
+def read_file(path: str) -> int:
+    total = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            total += len(chunk)
+    return total
+
+
+def select_spell_builds(rows):
+    """Build preference used by spells_extract_full.py: 5875, then 4222, then the newest."""
+    best = BestVersions(spell_build_rank({}), keep='last')
+    for row in rows:
+        best.add(row[0], row[1], row)
+    return best.rows()
+
+
+def bench_items(stages: Stages, path: str, db_path: str) -> None:
+    size = os.path.getsize(path)
+    stages.timed('items.read', lambda: read_file(path), rows_of=lambda n: 0, nbytes=size)
+    raw = stages.timed('items.tokenize', lambda: list(iter_tuples(path, 'items')), nbytes=size)
+    rows = stages.timed('items.decode', lambda: [decode_tuple(r) for r in raw])
+
+    final = stages.timed('items.select', lambda: select_patch_priority(rows, log_conflicts=False)[0],
+                         rows_of=lambda _: len(rows))
+
+    con = sqlite3.connect(db_path)
+    con.executescript(items_schema_sql())
+    with BulkLoader(con, 'items', fts_tables=['items_fts'], label='item', progress_every=0) as loader:
+        loader.insert(ITEMS.insert_sql(), (item_record(v) for v in final.values()))
+    con.close()
+    stages.record('items.insert', loader.insert_seconds, loader.rows)
+    stages.record('items.index', loader.index_seconds, loader.rows)
+    stages.record('items.fts', loader.fts_seconds, loader.rows)
+
+
+def bench_spells(stages: Stages, path: str, db_path: str) -> None:
+    size = os.path.getsize(path)
+    stages.timed('spells.read', lambda: read_file(path), rows_of=lambda n: 0, nbytes=size)
+    raw = stages.timed('spells.tokenize', lambda: list(iter_tuples(path, 'spell_template')), nbytes=size)
+    rows = stages.timed('spells.decode', lambda: [decode_tuple(r) for r in raw])
+    final = stages.timed('spells.select', lambda: select_spell_builds(rows), rows_of=lambda _: len(rows))
+
+    con = sqlite3.connect(db_path)
+    width = synth.SPELL_COLUMNS
+    con.execute("CREATE TABLE spell_template (%s)" % ', '.join('c%d' % c for c in range(width)))
+    with BulkLoader(con, 'spell_template', label='spell', progress_every=0) as loader:
+        loader.insert("INSERT INTO spell_template VALUES (%s)" % ','.join('?' * width), final.values())
+    con.close()
+    stages.record('spells.insert', loader.insert_seconds, loader.rows)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, noise_floor: float) -> list:
+    """Stages whose throughput fell more than `tolerance` below the baseline."""
+    failures = []
+    for name, base in baseline.get('stages', {}).items():
+        cur = results['stages'].get(name)
+        metric = 'rows_per_sec' if base.get('rows_per_sec') else 'mb_per_sec'
+        if not cur or not cur.get(metric) or not base.get(metric):
+            continue
+        if cur['seconds'] < noise_floor and base['seconds'] < noise_floor:
+            continue
+        ratio = cur[metric] / base[metric]
+        marker = 'OK'
+        if ratio < 1 / (1 + tolerance):
+            failures.append(name)
+            marker = 'REGRESSION'
+        print(f"  {name:<16} x{ratio:5.2f} vs baseline  {marker}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--items', type=int, default=20000)
+    ap.add_argument('--spells', type=int, default=20000)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--out', default=os.path.join(ROOT, 'build', 'bench', 'pipeline.json'))
+    ap.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    ap.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown per stage (0.25 = 25%%)")
+    ap.add_argument('--noise-floor', type=float, default=0.05, help="ignore stages faster than this (seconds)")
+    ap.add_argument('--save-baseline', action='store_true', help="also write the results to --baseline")
+    args = ap.parse_args()
+
+    stages = Stages()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        paths = synth.write_tree(tmp, args.items, args.spells, args.seed)
+        print(f"Generated synthetic dumps in {time.perf_counter() - start:.1f}s "
+              f"({args.items} items, {args.spells} spells, seed {args.seed})")
+        bench_items(stages, paths['items'], os.path.join(tmp, 'items.sqlite'))
+        bench_spells(stages, paths['spells'], os.path.join(tmp, 'spells.sqlite'))
+
+    results = {
+        'meta': {
+            'items': args.items, 'spells': args.spells, 'seed': args.seed,
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(), 'cpus': os.cpu_count(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'stages': stages.results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Wrote {args.out}")
+
+    if not args.baseline:
+        return
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Saved baseline {args.baseline}")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = compare(results, baseline, args.tolerance, args.noise_floor)
+    if failures:
+        sys.exit(f"❌ {len(failures)} stage(s) regressed beyond {args.tolerance:.0%}: {', '.join(failures)}")
+    print("✅ no stage regressed beyond the tolerance")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""Replay the app's queries against a built items.sqlite: latency percentiles and plan audit.
+
+The workload is what the app issues at runtime (ItemRepository.swift,
+ItemDetailView.swift, Spell.swift), with parameters drawn from the DB itself:
+  search    FTS prefix join, one query per keystroke while typing item names
+  suggest   item_suggest range read for 1-2 character prefixes (if the table exists)
+  entry     item by primary key
+  spells    Spell.filter(ids.contains(entry)) for an item's spell ids
+  spell_text  item_spell_text rows of an item (if the table exists)
+  class     items of a class/subclass        (idx_items_class)
+  quality   items of a quality               (idx_items_quality)
+  level     items in an item_level range     (idx_items_level)
+  spellid   items whose first spell is X     (idx_items_spellids)
+
+A generated workload can be saved (`--save-workload`) and replayed later
+(`--workload`) so two builds are measured with identical queries.
+
+For every kind it reports p50 / p95 / p99 latency:
+  warm   on one long-lived connection, after a warm-up pass
+  cold   opening a fresh read-only connection for each query (schema parse,
+         b-tree descent from the root); the OS file cache is not dropped, so
+         this is SQLite-side cold-start work, not disk latency
+and the `EXPLAIN QUERY PLAN` of one representative query, flagging full
+table / index scans (`SCAN items`, `SCAN ... USING COVERING INDEX`) and
+temp b-tree sorts. Scans of FTS virtual tables are index lookups, not flagged.
+
+Gates (exit status 1, for items_verify.sh):
+  --max-p95-ms MS      any kind's warm p95 above MS
+  --baseline FILE      any kind's warm p95 slower than the baseline's by more than
+                       --tolerance (kinds under --noise-floor ms in both runs skipped);
+                       record one with --save-baseline on the machine that compares
+  --fail-on-scan       any flagged full scan
+
+Usage:
+  python3 bench/bench_queries.py [DB] [--sample 200] [--cold 30] [--seed 1]
+      [--workload FILE | --save-workload FILE] [--out build/bench/queries.json]
+      [--baseline bench/query_baseline.json [--save-baseline]] [--tolerance 0.5]
+      [--max-p95-ms 20] [--fail-on-scan]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Dict, List, Sequence, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_fts import fts_query, keystroke_queries, percentile  # noqa: E402
+
+SPELL_TABLE = 'spell_template_ultimate_nerd'
+# kind -> SQL; `spells` gets one placeholder per id at run time
+QUERIES = {
+    'search': ("SELECT i.* FROM items i JOIN items_fts f ON i.entry = f.rowid "
+               "WHERE items_fts MATCH ? ORDER BY rank LIMIT 50"),
+    'suggest': ("SELECT i.* FROM item_suggest s JOIN items i ON i.entry = s.entry "
+                "WHERE s.prefix = ? ORDER BY s.rank LIMIT 50"),
+    'entry': "SELECT * FROM items WHERE entry = ?",
+    'spells': f"SELECT * FROM {SPELL_TABLE} WHERE entry IN ({{ids}})",
+    'spell_text': "SELECT * FROM item_spell_text WHERE entry = ?",
+    'class': "SELECT * FROM items WHERE class = ? AND subclass = ? LIMIT 50",
+    'quality': "SELECT * FROM items WHERE quality = ? LIMIT 50",
+    'level': "SELECT * FROM items WHERE item_level BETWEEN ? AND ? LIMIT 50",
+    'spellid': "SELECT entry FROM items WHERE spellid_1 = ?",
+}
+# Tables a kind needs; kinds whose tables are missing from the DB are skipped
+REQUIRES = {'suggest': 'item_suggest', 'spells': SPELL_TABLE, 'spell_text': 'item_spell_text'}
+SUGGEST_PREFIX = 2  # item_suggest.MAX_PREFIX
+
+Workload = List[Tuple[str, list]]
+
+
+def has_table(con: sqlite3.Connection, name: str) -> bool:
+    return con.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def sql_for(kind: str, params: Sequence) -> str:
+    sql = QUERIES[kind]
+    return sql.format(ids=','.join('?' * len(params))) if kind == 'spells' else sql
+
+
+def generate_workload(con: sqlite3.Connection, sample: int, seed: int) -> Workload:
+    """Queries of every kind, with parameters drawn from the DB's own rows."""
+    rng = random.Random(seed)
+    items = con.execute("SELECT entry, name, description FROM items").fetchall()
+    workload: Workload = []
+    for _, text in keystroke_queries(items, max(1, sample // 10), seed):
+        workload.append(('search', [fts_query(text)]))
+        token = text.split()[-1].lower()
+        if len(text.split()) == 1 and len(token) <= SUGGEST_PREFIX:
+            workload.append(('suggest', [token]))
+    entries = [e for e, _, _ in items]
+    for entry in rng.sample(entries, min(sample, len(entries))):
+        workload.append(('entry', [entry]))
+        workload.append(('spell_text', [entry]))
+    with_spells = con.execute(
+        "SELECT spellid_1, spellid_2, spellid_3, spellid_4, spellid_5 FROM items "
+        "WHERE spellid_1 > 0 OR spellid_2 > 0 OR spellid_3 > 0 OR spellid_4 > 0 OR spellid_5 > 0").fetchall()
+    for ids in rng.sample(with_spells, min(sample, len(with_spells))):
+        workload.append(('spells', [i for i in ids if i]))
+    # `spellid` times the app's spellid_1 lookup, so only items with a slot-1 spell
+    # (spellid_1 = 0 would read most of the index instead)
+    slot1 = [ids[0] for ids in with_spells if (ids[0] or 0) > 0]
+    for spell_id in rng.sample(slot1, min(sample, len(slot1))):
+        workload.append(('spellid', [spell_id]))
+    classes = con.execute("SELECT DISTINCT class, subclass FROM items").fetchall()
+    qualities = [q for q, in con.execute("SELECT DISTINCT quality FROM items")]
+    for _ in range(sample):
+        workload.append(('class', list(rng.choice(classes))))
+        workload.append(('quality', [rng.choice(qualities)]))
+        low = rng.randint(1, 60)
+        workload.append(('level', [low, low + 5]))
+    return workload
+
+
+def load_workload(path: str) -> Workload:
+    with open(path) as f:
+        return [(q['kind'], q['params']) for q in json.load(f)['queries']]
+
+
+def save_workload(path: str, workload: Workload) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'queries': [{'kind': k, 'params': p} for k, p in workload]}, f)
+
+
+def query_plan(con: sqlite3.Connection, kind: str, params: Sequence) -> Tuple[List[str], List[str]]:
+    """(plan lines, flagged lines): full scans of real tables/indexes and temp b-tree sorts."""
+    plan = [row[3] for row in con.execute("EXPLAIN QUERY PLAN " + sql_for(kind, params), params)]
+    flagged = [line for line in plan
+               if (line.startswith('SCAN ') and 'VIRTUAL TABLE' not in line) or 'TEMP B-TREE' in line]
+    return plan, flagged
+
+
+def timed(con: sqlite3.Connection, kind: str, params: Sequence) -> float:
+    start = time.perf_counter()
+    con.execute(sql_for(kind, params), params).fetchall()
+    return (time.perf_counter() - start) * 1000
+
+
+def cold_ms(path: str, kind: str, params: Sequence) -> float:
+    start = time.perf_counter()
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    con.execute(sql_for(kind, params), params).fetchall()
+    con.close()
+    return (time.perf_counter() - start) * 1000
+
+
+def summary(timings: Sequence[float]) -> dict:
+    return {
+        'queries': len(timings),
+        'p50_ms': round(statistics.median(timings), 4),
+        'p95_ms': round(percentile(timings, 0.95), 4),
+        'p99_ms': round(percentile(timings, 0.99), 4),
+    }
+
+
+def run(path: str, workload: Workload, cold: int, seed: int) -> Dict[str, dict]:
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    kinds = [k for k in QUERIES if k not in REQUIRES or has_table(con, REQUIRES[k])]
+    by_kind: Dict[str, List[list]] = {k: [p for kind, p in workload if kind == k] for k in kinds}
+    results: Dict[str, dict] = {}
+    rng = random.Random(seed)
+    for kind in kinds:
+        params = by_kind[kind]
+        if not params:
+            continue
+        plan, flagged = query_plan(con, kind, params[0])
+        for p in params:  # warm-up
+            con.execute(sql_for(kind, p), p).fetchall()
+        warm = [timed(con, kind, p) for p in params]
+        cold_timings = [cold_ms(path, kind, p) for p in rng.sample(params, min(cold, len(params)))]
+        results[kind] = {'warm': summary(warm), 'cold': summary(cold_timings), 'plan': plan, 'flagged': flagged}
+    skipped = [k for k in QUERIES if k not in kinds]
+    con.close()
+    if skipped:
+        print(f"Skipped (tables missing): {', '.join(skipped)}")
+    return results
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    print(f"\n{'kind':<11} {'n':>5}  {'warm p50':>9} {'p95':>8} {'p99':>8}   {'cold p50':>9} {'p95':>8} {'p99':>8}  plan")
+    for kind, r in results.items():
+        w, c = r['warm'], r['cold']
+        flag = '⚠️ ' + '; '.join(r['flagged']) if r['flagged'] else 'OK'
+        print(f"{kind:<11} {w['queries']:>5}  {w['p50_ms']:8.3f}ms {w['p95_ms']:7.3f}ms {w['p99_ms']:7.3f}ms"
+              f"   {c['p50_ms']:8.3f}ms {c['p95_ms']:7.3f}ms {c['p99_ms']:7.3f}ms  {flag}")
+
+
+def compare(results: Dict[str, dict], baseline: dict, tolerance: float, noise_floor: float) -> list:
+    """Kinds whose warm p95 grew more than `tolerance` over the baseline's."""
+    failures = []
+    for kind, base in baseline.get('kinds', {}).items():
+        cur = results.get(kind)
+        if not cur:
+            continue
+        now, then = cur['warm']['p95_ms'], base['warm']['p95_ms']
+        if now < noise_floor and then < noise_floor:
+            continue
+        ratio = now / then if then else float('inf')
+        marker = 'OK'
+        if ratio > 1 + tolerance:
+            failures.append(kind)
+            marker = 'REGRESSION'
+        print(f"  {kind:<11} p95 x{ratio:5.2f} vs baseline  {marker}")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('db', nargs='?', default=os.path.join(ROOT, 'Resources', 'items.sqlite'))
+    ap.add_argument('--sample', type=int, default=200, help="queries per kind (search: names typed = sample/10)")
+    ap.add_argument('--cold', type=int, default=30, help="fresh-connection queries per kind")
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--workload', help="replay this saved workload instead of generating one")
+    ap.add_argument('--save-workload', help="write the generated workload here")
+    ap.add_argument('--out', default=os.path.join(ROOT, 'build', 'bench', 'queries.json'))
+    ap.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    ap.add_argument('--save-baseline', action='store_true', help="also write the results to --baseline")
+    ap.add_argument('--tolerance', type=float, default=0.5, help="allowed p95 growth per kind (0.5 = 50%%)")
+    ap.add_argument('--noise-floor', type=float, default=0.05, help="ignore kinds faster than this (ms)")
+    ap.add_argument('--max-p95-ms', type=float, help="fail when any kind's warm p95 exceeds this")
+    ap.add_argument('--fail-on-scan', action='store_true', help="fail when a query plan has a full scan")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"❌ Database not found: {args.db}")
+    if args.workload:
+        workload = load_workload(args.workload)
+    else:
+        con = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        workload = generate_workload(con, args.sample, args.seed)
+        con.close()
+        if args.save_workload:
+            save_workload(args.save_workload, workload)
+            print(f"Saved workload {args.save_workload}")
+    print(f"Replaying {len(workload)} queries against {args.db}")
+    results = run(args.db, workload, args.cold, args.seed)
+    print_results(results)
+
+    out = {
+        'meta': {
+            'db': os.path.abspath(args.db), 'workload': args.workload, 'queries': len(workload),
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'machine': platform.machine(), 'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'kinds': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(out, f, indent=1)
+    print(f"Wrote {args.out}")
+
+    failures = []
+    scans = [k for k, r in results.items() if r['flagged']]
+    if args.fail_on_scan and scans:
+        failures.append(f"full scans in {', '.join(scans)}")
+    if args.max_p95_ms is not None:
+        slow = [k for k, r in results.items() if r['warm']['p95_ms'] > args.max_p95_ms]
+        if slow:
+            failures.append(f"p95 above {args.max_p95_ms}ms in {', '.join(slow)}")
+    if args.baseline:
+        if args.save_baseline:
+            with open(args.baseline, 'w') as f:
+                json.dump(out, f, indent=1)
+            print(f"Saved baseline {args.baseline}")
+        else:
+            with open(args.baseline) as f:
+                regressed = compare(results, json.load(f), args.tolerance, args.noise_floor)
+            if regressed:
+                failures.append(f"p95 regressed beyond {args.tolerance:.0%} in {', '.join(regressed)}")
+    if failures:
+        sys.exit("❌ Query latency gate failed: " + '; '.join(failures))
+    if args.max_p95_ms is not None or args.baseline or args.fail_on_scan:
+        print("✅ Query latency gate passed")
+
+
+if __name__ == '__main__':
+    main()
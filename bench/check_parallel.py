@@ -0,0 +1,74 @@
+"""Check that parallel (--jobs N) and serial imports give byte-identical DBs.
+
+Runs items_rebuild_patch_priority.py and spells_extract_full.py twice against
+copies of a base database, once with --jobs 1 and once with --jobs N, with the
+row cache disabled so both runs really parse the dumps. Each result is
+VACUUMed INTO a fresh file and the two files are compared byte for byte.
+Importers whose source dump is missing are skipped.
+
+Usage:
+  python3 bench/check_parallel.py [--jobs 4] [--db build/items.sqlite]
+      [--items-src classic-wow-item-db/db/unmodified.sql]
+      [--spells-src world_full_05_october_2019.sql]
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def vacuum_digest(db_path: str) -> str:
+    out = db_path + '.vacuum'
+    con = sqlite3.connect(db_path)
+    con.execute("VACUUM INTO ?", (out,))
+    con.close()
+    with open(out, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def run_import(script: str, args: list, db_path: str, jobs: int) -> None:
+    env = dict(os.environ, NO_DUMP_CACHE='1')
+    cmd = [sys.executable, os.path.join(ROOT, script), '--db', db_path, '--jobs', str(jobs)] + args
+    subprocess.run(cmd, check=True, env=env, cwd=ROOT, stdout=subprocess.DEVNULL)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--jobs', type=int, default=4)
+    ap.add_argument('--db', default=os.path.join(ROOT, 'build', 'items.sqlite'))
+    ap.add_argument('--items-src', default=os.path.join(ROOT, 'classic-wow-item-db', 'db', 'unmodified.sql'))
+    ap.add_argument('--spells-src', default=os.path.join(ROOT, 'world_full_05_october_2019.sql'))
+    args = ap.parse_args()
+
+    steps = []
+    if os.path.exists(args.items_src):
+        steps.append(('items_rebuild_patch_priority.py', ['--src', os.path.abspath(args.items_src)]))
+    if os.path.exists(args.spells_src):
+        steps.append(('spells_extract_full.py', ['--src', os.path.abspath(args.spells_src)]))
+    if not steps:
+        sys.exit("No source dumps found; nothing to compare")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        digests = {}
+        for jobs in (1, args.jobs):
+            db_path = os.path.join(tmp, f'jobs{jobs}.sqlite')
+            shutil.copyfile(args.db, db_path)
+            for script, extra in steps:
+                run_import(script, extra, db_path, jobs)
+            digests[jobs] = vacuum_digest(db_path)
+            print(f"  --jobs {jobs:<3} {digests[jobs]}")
+
+    if digests[1] != digests[args.jobs]:
+        sys.exit("❌ parallel and serial builds differ")
+    print(f"✅ --jobs {args.jobs} output is byte-identical to the serial build")
+
+
+if __name__ == '__main__':
+    main()
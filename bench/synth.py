@@ -0,0 +1,182 @@
+"""Generate realistic synthetic dumps for benchmarking the build pipeline offline.
+
+Writes an `items` dump shaped like `classic-wow-item-db/db/unmodified.sql`
+(129 columns) and a `spell_template` dump shaped like
+`world_full_05_october_2019.sql` (179 columns), deterministic for a seed:
+ - items repeat across patches and spells across client builds, with the
+   values that differ between versions (armor, stats, base points) changed
+ - names and descriptions contain MySQL escapes (\\' '' \\\\ \\n), commas,
+   semicolons, parentheses, `INSERT INTO` text and non-ASCII characters
+ - item spell slots point at spells that exist in the spell dump, and some
+   spells trigger others
+ - the world dump interleaves statements for unrelated tables
+
+With `--out DIR` the files land in the layout the build scripts expect
+(`DIR/classic-wow-item-db/db/unmodified.sql`, `DIR/world_full_05_october_2019.sql`).
+
+Usage:
+  python3 bench/synth.py --out /tmp/synth [--items 20000] [--spells 20000] [--seed 1]
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+from typing import Iterable, List, Sequence
+
+ITEM_COLUMNS = 129
+SPELL_COLUMNS = 179
+ITEM_TEXT_COLUMNS = (4, 5)
+# name1..8, nameSubtext1..8, description1..8, auraDescription1..8
+SPELL_TEXT_COLUMNS = tuple(range(121, 129)) + tuple(range(130, 138)) + tuple(range(139, 147)) + tuple(range(148, 156))
+SPELL_REAL_COLUMNS = (38, 71, 72, 73, 74, 75, 76, 98, 99, 100, 113, 114, 115, 168, 169, 170)
+ITEM_REAL_COLUMNS = (48, 50, 51, 53, 54, 56, 57, 59, 60, 62, 63, 76, 83, 90, 97, 104)
+BUILDS = (4222, 4297, 4449, 4544, 4695, 4878, 5086, 5302, 5464, 5875)
+ROWS_PER_INSERT = 500
+
+WORDS = [
+    "Arcanite", "Reaper", "Hand", "of", "Ragnaros", "Worn", "Shortsword", "Tome", "the",
+    "Lost", "Tarnished", "Chain", "Belt", "Warden", "Staff", "Mithril", "Spaulders",
+    "Thunderfury,", "Blessed", "Blade", "Windseeker", "Qiraji", "Bindings", "Dominion",
+]
+TRICKY = [
+    "Tirion\\'s Blessing", "Warden\\'s Staff, Used", "Tome of the Lost (Vol. 2)", "It''s a Trap",
+    "Back\\\\slash", "Line\\nbreak", "Semi; colon", "INSERT INTO `items` VALUES (1);",
+    "Quoted \\\"name\\\"", "Gnomish Cloaking Device (ä é ü)", "鍛造の剣", "Tab\\tseparated",
+]
+DESCRIPTIONS = [
+    "", "", "", "Use: Restores 100 health over 10 sec.", "Equip: Increases damage done by spells by up to 13.",
+    "Chance on hit: Blasts your enemy with lightning, dealing 300 Nature damage (and more).",
+    "\\\"Property of the Kirin Tor\\\"", "Don\\'t eat the yellow snow; it\\'s bad.",
+]
+
+
+def _name(rng: random.Random) -> str:
+    if rng.random() < 0.15:
+        return rng.choice(TRICKY)
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+def _number(rng: random.Random, real: bool) -> str:
+    r = rng.random()
+    if r < 0.65:
+        return '0.0' if real and rng.random() < 0.5 else '0'
+    if real:
+        return '%.2f' % (rng.random() * 100)
+    if r < 0.75:
+        return '-1'
+    return str(rng.randint(1, 5000))
+
+
+def _statements(table: str, rows: Iterable[str], column_list: Sequence[str] = ()) -> Iterable[str]:
+    header = "INSERT INTO `%s`%s VALUES\n" % (
+        table, (' (' + ', '.join('`%s`' % c for c in column_list) + ')') if column_list else '')
+    batch: List[str] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == ROWS_PER_INSERT:
+            yield header + ',\n'.join(batch) + ';\n'
+            batch = []
+    if batch:
+        yield header + ',\n'.join(batch) + ';\n'
+
+
+def item_rows(count: int, spell_count: int, seed: int = 1, dup_rate: float = 0.3) -> Iterable[str]:
+    """`count` unique items; `dup_rate` of them also appear in up to three older/newer patches."""
+    rng = random.Random(seed)
+    for entry in range(1, count + 1):
+        base = [_number(rng, c in ITEM_REAL_COLUMNS) for c in range(ITEM_COLUMNS)]
+        base[0] = str(entry)
+        base[2] = str(rng.randint(0, 15))  # class
+        base[4] = "'%s'" % _name(rng)
+        base[5] = "'%s'" % rng.choice(DESCRIPTIONS)
+        base[7] = str(rng.randint(0, 5))  # quality
+        base[15] = str(rng.randint(1, 90))  # item_level
+        for slot in range(5):
+            base[73 + 7 * slot] = str(rng.randint(1, spell_count)) if rng.random() < 0.2 else '0'
+        patches = [0]
+        if rng.random() < dup_rate:
+            patches += rng.sample(range(1, 11), rng.randint(1, 3))
+        for patch in patches:
+            values = list(base)
+            values[1] = str(patch)
+            if patch:
+                values[66] = str(rng.randint(0, 3000))  # armor changed between patches
+                values[28] = str(rng.randint(0, 40))  # stat_value1
+            yield '(' + ','.join(values) + ')'
+
+
+def spell_rows(count: int, seed: int = 1, dup_rate: float = 0.4) -> Iterable[str]:
+    """`count` unique spells; `dup_rate` of them exist in several client builds."""
+    rng = random.Random(seed + 1)
+    for entry in range(1, count + 1):
+        base = [_number(rng, c in SPELL_REAL_COLUMNS) for c in range(SPELL_COLUMNS)]
+        base[0] = str(entry)
+        for c in SPELL_TEXT_COLUMNS:
+            base[c] = "''"
+        base[121] = "'%s'" % _name(rng)
+        base[139] = "'%s'" % rng.choice(DESCRIPTIONS)
+        for t in (110, 111, 112):  # effectTriggerSpell1..3
+            base[t] = str(rng.randint(1, count)) if rng.random() < 0.05 else '0'
+        builds = [5875]
+        if rng.random() < dup_rate:
+            builds += rng.sample(BUILDS[:-1], rng.randint(1, 3))
+        for build in builds:
+            values = list(base)
+            values[1] = str(build)
+            if build != 5875:
+                values[77] = str(rng.randint(0, 40))  # effectBasePoints1 differs per build
+            yield '(' + ','.join(values) + ')'
+
+
+def noise_rows(count: int, seed: int = 1) -> Iterable[str]:
+    rng = random.Random(seed + 2)
+    for entry in range(1, count + 1):
+        yield "(%d,'%s',%d,%s)" % (entry, _name(rng), rng.randint(1, 63), _number(rng, True))
+
+
+def write_items_dump(path: str, count: int, spell_count: int, seed: int = 1) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    columns = ['entry', 'patch', 'class', 'subclass', 'name', 'description'] + \
+        ['c%d' % c for c in range(6, ITEM_COLUMNS)]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("-- synthetic items dump (bench/synth.py)\nCREATE TABLE `items` (`entry` int(11));\n")
+        for stmt in _statements('items', item_rows(count, spell_count, seed), columns):
+            f.write(stmt)
+
+
+def write_spells_dump(path: str, count: int, seed: int = 1, noise: int = 2) -> None:
+    """World dump with `noise` statements of unrelated tables around each spell statement."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    noise_stmts = list(_statements('creature_template', noise_rows(ROWS_PER_INSERT * max(noise, 1), seed)))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("-- synthetic world dump (bench/synth.py)\nCREATE TABLE `spell_template` (`entry` int(11));\n")
+        for i, stmt in enumerate(_statements('spell_template', spell_rows(count, seed))):
+            for n in range(noise):
+                f.write(noise_stmts[(i + n) % len(noise_stmts)])
+            f.write(stmt)
+
+
+def write_tree(out: str, items: int, spells: int, seed: int = 1) -> dict:
+    """Write both dumps in the build scripts' layout under `out`; returns their paths."""
+    paths = {
+        'items': os.path.join(out, 'classic-wow-item-db', 'db', 'unmodified.sql'),
+        'spells': os.path.join(out, 'world_full_05_october_2019.sql'),
+    }
+    write_items_dump(paths['items'], items, spells, seed)
+    write_spells_dump(paths['spells'], spells, seed)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--out', required=True)
+    ap.add_argument('--items', type=int, default=20000)
+    ap.add_argument('--spells', type=int, default=20000)
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+    for kind, path in write_tree(args.out, args.items, args.spells, args.seed).items():
+        print(f"  {kind:<7} {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
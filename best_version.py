@@ -0,0 +1,115 @@
+"""Streaming best-version selection for dumps that repeat an entry per version.
+
+The item dump holds one row per item per patch and the world dump one
+`spell_template` row per spell per client build. Instead of grouping every
+version of every row and choosing afterwards, `BestVersions` keeps only the
+current best row per key as rows stream in, so memory scales with unique
+entries rather than total versions. Each version can also leave a small
+summary (e.g. its armor value): a key keeps its first summary, and only keys
+that turn out to have several versions grow a history list. An `on_conflict`
+callback sees each such key the moment another version arrives, so conflict
+reports can be written while the stream is still being read.
+
+Usage:
+  from best_version import BestVersions, spell_build_rank
+  best = BestVersions(spell_build_rank(corrections), keep='last')
+  for row in rows:
+      best.add(row[0], row[1], row)
+  final = best.rows()
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Mapping, Optional, Tuple
+
+# Client builds preferred for spells, in order; otherwise the newest build wins
+PREFERRED_BUILDS = (5875, 4222)
+
+
+def item_patch_rank(entry: Hashable, patch: Any) -> Any:
+    """Items: the highest patch wins."""
+    return patch
+
+
+def spell_build_rank(corrections: Mapping[int, int]) -> Callable[[int, int], Tuple[int, int]]:
+    """Spells: a corrected spell takes its corrected build, others 5875, then 4222.
+
+    When none of those is present the newest build wins. A corrected spell whose
+    corrected build is missing falls back to the newest build, not to 5875.
+    """
+    def rank(spell_id: int, build: int) -> Tuple[int, int]:
+        corrected = corrections.get(spell_id)
+        if corrected is not None:
+            return (int(build == corrected), build)
+        for preference, preferred in enumerate(PREFERRED_BUILDS):
+            if build == preferred:
+                return (len(PREFERRED_BUILDS) - preference, build)
+        return (0, build)
+    return rank
+
+
+class BestVersions:
+    """Keeps the best-ranked row per key as (key, version, row) triples arrive.
+
+    `rank(key, version)` orders versions, highest wins. Ties keep the first row
+    seen (`keep='first'`) or the last one (`keep='last'`). With `summarize`, the
+    `(version, summarize(row))` pairs of every key with several versions are kept
+    for `conflicts()`. `on_conflict(key, best version, history)` is called each
+    time a key receives a second or later version, after the best row is updated.
+    """
+
+    def __init__(self, rank: Callable[[Hashable, Any], Any], keep: str = 'first',
+                 summarize: Optional[Callable[[Any], Any]] = None,
+                 on_conflict: Optional[Callable[[Hashable, Any, List[tuple]], None]] = None):
+        if keep not in ('first', 'last'):
+            raise ValueError(f"keep must be 'first' or 'last', not {keep!r}")
+        self.rank = rank
+        self.keep_last = keep == 'last'
+        self.summarize = summarize
+        self.on_conflict = on_conflict
+        self.best: Dict[Hashable, tuple] = {}  # key -> (rank, version, row)
+        self.counts: Dict[Hashable, int] = {}  # versions per key, only for keys seen twice or more
+        self.first: Dict[Hashable, tuple] = {}  # key -> (version, summary) while it has one version
+        self.history: Dict[Hashable, List[tuple]] = {}  # key -> [(version, summary), ...], keys seen twice+
+        self.versions = 0
+
+    def __len__(self) -> int:
+        return len(self.best)
+
+    def add(self, key: Hashable, version: Any, row: Any) -> bool:
+        """Offer one version; returns True when it became the key's best row."""
+        self.versions += 1
+        rank = self.rank(key, version)
+        current = self.best.get(key)
+        if current is None:
+            if self.summarize is not None:
+                self.first[key] = (version, self.summarize(row))
+            self.best[key] = (rank, version, row)
+            return True
+        self.counts[key] = self.counts.get(key, 1) + 1
+        if self.summarize is not None:
+            history = self.history.get(key)
+            if history is None:
+                history = self.history[key] = [self.first.pop(key)]
+            history.append((version, self.summarize(row)))
+        won = rank > current[0] or (rank == current[0] and self.keep_last)
+        if won:
+            self.best[key] = (rank, version, row)
+        if self.on_conflict is not None:
+            self.on_conflict(key, self.best[key][1], self.history.get(key, []))
+        return won
+
+    def items(self) -> Iterator[Tuple[Hashable, Any, Any]]:
+        """(key, chosen version, row) in order of each key's first appearance."""
+        for key, (_, version, row) in self.best.items():
+            yield key, version, row
+
+    def rows(self) -> Dict[Hashable, Any]:
+        return {key: row for key, (_, _, row) in self.best.items()}
+
+    def conflicts(self) -> Iterator[Tuple[Hashable, Any, Any, List[tuple]]]:
+        """(key, chosen version, row, history) for every key seen in several versions.
+
+        `history` is empty unless the reducer was built with `summarize`.
+        """
+        for key, (_, version, row) in self.best.items():
+            if key in self.counts:
+                yield key, version, row, self.history.get(key, [])
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""One driver for the whole data build, run as a DAG of cached stages.
+
+Each stage is one of the existing entry points with its declared inputs
+(files whose content it depends on), outputs and upstream stages:
+
+  items      items_build.sh --no-ship        unmodified.sql -> build/items.sqlite
+  world      dump_router.py                  world dump -> spell_template row cache (one pass)
+  overrides  spells_analyze_discrepancies    spell rows -> build/spell_build_corrections.py
+  spells     spells_extract_full.py          spell rows + items + overrides -> spell tables
+  tooltips   spell_tooltips.py               spell tables -> item_spell_text
+  suggest    item_suggest.py                 items_fts -> item_suggest (ranked short prefixes)
+  package    sqlite_optimize.py              build/items.sqlite -> build/items.ship.sqlite
+  verify     items_verify.sh, db_verify.py   checks build/items.ship.sqlite against build/items.sqlite
+
+A stage's key hashes its command, the content of its inputs and the keys of
+the stages it depends on; it is skipped when the key matches the last
+successful run (build/stages.json) and its outputs are unchanged since the
+pipeline last wrote them, so editing a script or a dump reruns exactly that
+stage and everything downstream.
+Independent stages run concurrently (`--jobs`): the item build runs next to
+the world dump pass and the overrides analysis. The world dump is read once;
+every later consumer of spell_template reads the row cache (dump_cache.py).
+
+Stage output goes to build/logs/<stage>.log. Only when every stage has
+passed is build/items.ship.sqlite copied next to Resources/items.sqlite and
+renamed over it, so the app never picks up a half-built or unverified DB.
+
+Usage:
+  python3 build_pipeline.py [--jobs 2] [--force STAGE ...] [--force-all]
+      [--until STAGE] [--dry-run]
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence
+
+from build_stats import BuildReport, maxrss_mb
+from dump_cache import cache_dir, is_cached, source_digest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ITEM_DUMP = 'classic-wow-item-db/db/unmodified.sql'
+WORLD_DUMP = 'world_full_05_october_2019.sql'
+BUILD_DB = 'build/items.sqlite'
+SHIP_DB = 'build/items.ship.sqlite'
+BUNDLE_DB = 'Resources/items.sqlite'
+MANIFEST = 'build/items.manifest.json'
+STAMPS = 'build/stages.json'
+# Generated by the overrides stage; the tracked spells_build_overrides.py is only read
+CORRECTIONS = 'build/spell_build_corrections.py'
+LOG_DIR = 'build/logs'
+# Modules every Python stage imports
+COMMON = ('build_stats.py', 'sql_dump.py', 'dump_cache.py', 'sqlite_bulk.py')
+
+
+class Stage:
+    """One step of the build: a command plus what it reads, writes and waits for."""
+
+    def __init__(self, name: str, cmd: Sequence[str], inputs: Sequence[str] = (),
+                 outputs: Sequence[str] = (), deps: Sequence[str] = (), env: Optional[Dict[str, str]] = None,
+                 valid: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.cmd = list(cmd)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.env = env or {}
+        # Extra freshness check for results whose paths are not known up front (the row cache)
+        self.valid = valid
+
+
+STAGES = (
+    Stage('items', ['bash', 'items_build.sh', '--no-ship'],
+          inputs=[ITEM_DUMP, 'items_build.sh', 'table_schema.py', 'table_sync.py', *COMMON],
+          outputs=[BUILD_DB]),
+    # Its result is the spell_template row cache, named by the dump's digest: stale once deleted
+    Stage('world', [sys.executable, 'dump_router.py', WORLD_DUMP, 'spell_template'],
+          inputs=[WORLD_DUMP, 'dump_router.py', *COMMON],
+          valid=lambda: is_cached(_path(WORLD_DUMP), 'spell_template')),
+    Stage('overrides', [sys.executable, 'spells_analyze_discrepancies.py', '--src', WORLD_DUMP],
+          inputs=[WORLD_DUMP, 'spells_analyze_discrepancies.py', 'spells_build_overrides.py', 'best_version.py',
+                  'table_schema.py', *COMMON],
+          outputs=[CORRECTIONS, 'build/spell_discrepancies.csv'], deps=['world']),
+    Stage('spells', [sys.executable, 'spells_extract_full.py', '--src', WORLD_DUMP, '--db', BUILD_DB],
+          inputs=[WORLD_DUMP, 'spells_extract_full.py', 'spells_build_overrides.py', CORRECTIONS,
+                  'table_schema.py', 'spell_refs.py', 'best_version.py', 'sqlite_optimize.py', *COMMON],
+          outputs=[BUILD_DB], deps=['items', 'world', 'overrides']),
+    Stage('tooltips', [sys.executable, 'spell_tooltips.py', '--db', BUILD_DB],
+          inputs=['spell_tooltips.py', 'build_stats.py', 'sqlite_bulk.py'],
+          outputs=[BUILD_DB], deps=['spells']),
+    # After tooltips only so that writers of BUILD_DB never run at the same time
+    Stage('suggest', [sys.executable, 'item_suggest.py', '--db', BUILD_DB],
+          inputs=['item_suggest.py', 'build_stats.py', 'sqlite_optimize.py'],
+          outputs=[BUILD_DB], deps=['items', 'tooltips']),
+    Stage('package', [sys.executable, 'sqlite_optimize.py', BUILD_DB, SHIP_DB],
+          inputs=['sqlite_optimize.py', 'build_stats.py'],
+          outputs=[SHIP_DB], deps=['suggest']),  # BUILD_DB is only read
+    # Also checks that the packaged copy holds exactly the rows of the build (content manifest)
+    Stage('verify', ['bash', 'items_verify.sh', SHIP_DB],
+          inputs=['items_verify.sh', 'db_verify.py', 'table_sync.py', 'bench/bench_queries.py'],
+          outputs=[MANIFEST], deps=['package'], env={'REFERENCE_DB': BUILD_DB, 'MANIFEST_OUT': MANIFEST}),
+)
+
+
+def _path(rel: str) -> str:
+    return os.path.join(ROOT, rel)
+
+
+def stage_key(stage: Stage, keys: Dict[str, str]) -> str:
+    """Hash of the stage's command, its inputs' content and its upstream stages' keys."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([stage.cmd[1:], sorted(stage.env.items())]).encode())
+    for rel in stage.inputs:
+        # source_digest memoizes by (size, mtime), so unchanged dumps are not re-read
+        digest = source_digest(_path(rel), cache_dir()) if os.path.exists(_path(rel)) else 'missing'
+        h.update(f"{rel}={digest};".encode())
+    for dep in stage.deps:
+        h.update(f"{dep}:{keys[dep]};".encode())
+    return h.hexdigest()
+
+
+def fingerprint(rel: str) -> Optional[list]:
+    try:
+        st = os.stat(_path(rel))
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def load_stamps() -> dict:
+    try:
+        with open(_path(STAMPS)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_stamps(stamps: dict) -> None:
+    tmp = _path(STAMPS) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(stamps, f, indent=1, sort_keys=True)
+    os.replace(tmp, _path(STAMPS))
+
+
+def run_stage(stage: Stage) -> tuple:
+    """Run `stage` with its output in build/logs/<name>.log.
+
+    Returns (returncode, seconds, cpu seconds, peak RSS MB); CPU and RSS are the stage
+    process's own (including the processes it waited for), from wait4, where available.
+    """
+    missing = [rel for rel in stage.inputs if not os.path.exists(_path(rel))]
+    log_path = _path(os.path.join(LOG_DIR, f"{stage.name}.log"))
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        if missing:
+            log.write(f"missing inputs: {', '.join(missing)}\n")
+            return 1, 0.0, None, None
+        log.write(f"$ {' '.join(stage.cmd)}\n")
+        log.flush()
+        proc = subprocess.Popen(stage.cmd, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+                                env={**os.environ, **stage.env})
+        if not hasattr(os, 'wait4'):
+            return proc.wait(), time.perf_counter() - start, None, None
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    return (proc.returncode, time.perf_counter() - start,
+            usage.ru_utime + usage.ru_stime, maxrss_mb(usage.ru_maxrss))
+
+
+def tail(path: str, lines: int = 20) -> str:
+    with open(path, errors='replace') as f:
+        return ''.join(f.readlines()[-lines:])
+
+
+def select(stages: Sequence[Stage], until: Optional[str]) -> List[Stage]:
+    """`until` and everything it depends on, or every stage."""
+    if until is None:
+        return list(stages)
+    by_name = {s.name: s for s in stages}
+    if until not in by_name:
+        raise SystemExit(f"Unknown stage {until!r} (stages: {', '.join(by_name)})")
+    wanted, todo = set(), [until]
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(by_name[name].deps)
+    return [s for s in stages if s.name in wanted]
+
+
+def swap_in(src: str, dest: str) -> bool:
+    """Atomically replace `dest` with a copy of `src`; False when they already match."""
+    directory = cache_dir()
+    if os.path.exists(dest) and source_digest(dest, directory) == source_digest(src, directory):
+        return False
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = dest + '.tmp'
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    return True
+
+
+def run_pipeline(jobs: int = 2, force: Sequence[str] = (), force_all: bool = False,
+                 until: Optional[str] = None, dry_run: bool = False) -> int:
+    stages = select(STAGES, until)
+    by_name = {s.name: s for s in stages}
+    os.makedirs(cache_dir(), exist_ok=True)
+    keys: Dict[str, str] = {}
+    for stage in stages:  # dependency order
+        keys[stage.name] = stage_key(stage, keys)
+    stamps = load_stamps()
+    written = stamps.setdefault('_outputs', {})  # output path -> fingerprint after the last stage wrote it
+
+    def fresh(stage: Stage) -> bool:
+        if force_all or stage.name in force:
+            return False
+        # Upstream stages must not have rerun since, and outputs must still be what the
+        # pipeline last wrote (not rebuilt or edited by hand)
+        stamp = stamps.get(stage.name, {})
+        return (stamp.get('key') == keys[stage.name]
+                and stamp.get('upstream') == {d: stamps.get(d, {}).get('run') for d in stage.deps}
+                and all(fingerprint(p) is not None and fingerprint(p) == written.get(p) for p in stage.outputs)
+                and (stage.valid is None or stage.valid()))
+
+    # A stage reruns when it is stale or anything upstream of it reruns
+    rerun = set()
+    for stage in stages:
+        if not fresh(stage) or any(d in rerun for d in stage.deps):
+            rerun.add(stage.name)
+    for stage in stages:
+        print(f"  {stage.name:<10} {'run' if stage.name in rerun else 'cached':<7} {' '.join(stage.cmd[1:])}")
+    if dry_run:
+        return 0
+
+    os.makedirs(_path(LOG_DIR), exist_ok=True)
+    report = BuildReport('build_pipeline')
+    done, failed = {s.name for s in stages if s.name not in rerun}, set()
+    pending = [s for s in stages if s.name in rerun]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if any(d in failed for d in stage.deps):
+                    pending.remove(stage)
+                    failed.add(stage.name)
+                    print(f"⏭  {stage.name}: skipped, upstream failed")
+                elif all(d in done for d in stage.deps):
+                    pending.remove(stage)
+                    # Upstream stages may have rewritten this stage's inputs (build/spell_build_corrections.py)
+                    keys[stage.name] = stage_key(stage, keys)
+                    print(f"▶  {stage.name}")
+                    running[pool.submit(run_stage, stage)] = stage
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                code, seconds, cpu, rss = future.result()
+                report.record(stage.name, seconds, cpu=cpu, child_rss_mb=rss,
+                              status='ok' if code == 0 else f"exit {code}")
+                if code == 0:
+                    done.add(stage.name)
+                    stamps[stage.name] = {'key': keys[stage.name], 'run': time.time_ns(),
+                                          'upstream': {d: stamps[d]['run'] for d in stage.deps},
+                                          'seconds': round(seconds, 3),
+                                          'finished': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+                    written.update({p: fingerprint(p) for p in stage.outputs})
+                    save_stamps(stamps)
+                else:
+                    failed.add(stage.name)
+                    stamps.pop(stage.name, None)
+                    save_stamps(stamps)
+                    log = os.path.join(LOG_DIR, f"{stage.name}.log")
+                    print(f"❌ {stage.name} failed (exit {code}); last lines of {log}:")
+                    print(tail(_path(log)), end='')
+
+    if failed:
+        report.write()
+        print(f"❌ Pipeline failed ({', '.join(sorted(failed))}); {BUNDLE_DB} left untouched")
+        return 1
+    if 'verify' in by_name:
+        swapped = swap_in(_path(SHIP_DB), _path(BUNDLE_DB))
+        print(f"✅ {BUNDLE_DB} {'updated' if swapped else 'already current'}")
+    else:
+        print(f"✅ Stages up to {until} passed; {BUNDLE_DB} is only replaced after verify")
+    report.write()
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=2, help="stages run at the same time (default: 2)")
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE', help="rerun STAGE even if cached")
+    parser.add_argument('--force-all', action='store_true', help="rerun every stage")
+    parser.add_argument('--until', metavar='STAGE', help="run only STAGE and what it depends on")
+    parser.add_argument('--dry-run', action='store_true', help="print which stages would run")
+    args = parser.parse_args()
+    unknown = set(args.force) - {s.name for s in STAGES}
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    sys.exit(run_pipeline(args.jobs, args.force, args.force_all, args.until, args.dry_run))
@@ -0,0 +1,216 @@
+"""Per-stage timing, throughput and memory instrumentation for the build scripts.
+
+Each script opens a `BuildReport` and wraps its phases in `report.stage(...)`.
+A stage records wall time, CPU time (including worker processes that finished
+inside it), rows/sec, MB/sec and the process peak RSS at the end of the stage,
+and prints live progress with an ETA when the total is known. `report.write()`
+merges the run into `build/build_report.json` under the script's name, so one
+file describes the latest run of every stage of the pipeline; the merge holds
+a lock on `build_report.json.lock`, so pipeline stages that finish at the same
+time do not drop each other's entries. With
+`profile=True` every stage also runs under cProfile and its stats are dumped
+to `build/profile/<script>.<stage>.prof` (inspect with `python3 -m pstats`).
+
+Environment overrides:
+  BUILD_REPORT  (default: build/build_report.json)
+
+Usage:
+  from build_stats import BuildReport
+  report = BuildReport('spells_extract_full', profile=args.profile)
+  with report.stage('parse', nbytes=os.path.getsize(src)) as st:
+      for row in rows:
+          st.advance()
+  report.write()
+"""
+from __future__ import annotations
+import cProfile
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = resource = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PROGRESS_INTERVAL = 1.0  # seconds between live progress lines
+
+
+def report_path() -> str:
+    return os.environ.get('BUILD_REPORT') or os.path.join(ROOT, 'build', 'build_report.json')
+
+
+def maxrss_mb(ru_maxrss: int) -> float:
+    """A `ru_maxrss` value in MB (it is KiB on Linux, bytes on macOS)."""
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(ru_maxrss * scale / 1e6, 1)
+
+
+def _rss_mb(who) -> Optional[float]:
+    if resource is None:
+        return None
+    return maxrss_mb(resource.getrusage(who).ru_maxrss)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB."""
+    return _rss_mb(resource.RUSAGE_SELF) if resource else None
+
+
+def children_peak_rss_mb() -> Optional[float]:
+    """Largest peak RSS among finished child processes (decode workers), in MB."""
+    return _rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+
+
+def _cpu_seconds() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class Stage:
+    """One timed phase; call `advance(n)` as rows are processed."""
+
+    def __init__(self, report: 'BuildReport', name: str, total: Optional[int] = None,
+                 nbytes: Optional[int] = None, unit: str = 'rows'):
+        self.report = report
+        self.name = name
+        self.total = total
+        self.nbytes = nbytes
+        self.unit = unit
+        self.rows = 0
+        self.extra = {}
+        self._profiler = None
+        self._tty = sys.stderr.isatty()
+
+    def __enter__(self) -> 'Stage':
+        self._start = self._last = time.perf_counter()
+        self._cpu = _cpu_seconds()
+        if self.report.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def advance(self, n: int = 1) -> None:
+        self.rows += n
+        now = time.perf_counter()
+        if now - self._last >= PROGRESS_INTERVAL:
+            self._last = now
+            self._progress(now)
+
+    def _progress(self, now: float) -> None:
+        elapsed = now - self._start
+        rate = self.rows / elapsed if elapsed else 0.0
+        msg = f"  [{self.name}] {self.rows:,} {self.unit} ({rate:,.0f}/sec"
+        if self.total and rate:
+            remaining = max(self.total - self.rows, 0) / rate
+            msg += f", {self.rows / self.total:.0%}, ETA {remaining:.0f}s"
+        msg += ")"
+        if self._tty:
+            sys.stderr.write('\r' + msg + '\033[K')
+            sys.stderr.flush()
+        else:
+            print(msg, file=sys.stderr)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        wall = time.perf_counter() - self._start
+        cpu = _cpu_seconds() - self._cpu
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.report.profile_path(self.name))
+        if self._tty:
+            sys.stderr.write('\r\033[K')
+        if exc_type is None:
+            self.report.record(self.name, wall, self.rows, self.nbytes, cpu, **self.extra)
+
+
+class BuildReport:
+    """Collects the stages of one script run and writes them to the shared report."""
+
+    def __init__(self, script: str, profile: bool = False):
+        self.script = script
+        self.profile = profile
+        self.stages = []
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self._start = time.perf_counter()
+        self._cpu = _cpu_seconds()
+
+    def stage(self, name: str, total: Optional[int] = None, nbytes: Optional[int] = None,
+              unit: str = 'rows') -> Stage:
+        return Stage(self, name, total, nbytes, unit)
+
+    def profile_path(self, stage: str) -> str:
+        directory = os.path.join(os.path.dirname(report_path()), 'profile')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{self.script}.{stage}.prof")
+
+    def record(self, name: str, wall: float, rows: int = 0, nbytes: Optional[int] = None,
+               cpu: Optional[float] = None, child_rss_mb: Optional[float] = None, **extra) -> None:
+        """Add a stage measured elsewhere (or by `Stage`), and print its summary line.
+
+        `child_rss_mb` is the peak RSS of a stage that ran as its own process; it is
+        recorded as children_peak_rss_mb instead of this process's own peak, which
+        says nothing about that stage.
+        """
+        entry = {'stage': name, 'wall_seconds': round(wall, 3)}
+        if cpu is not None:
+            entry['cpu_seconds'] = round(cpu, 3)
+        entry['rows'] = rows
+        entry['rows_per_sec'] = round(rows / wall, 1) if rows and wall else None
+        if nbytes:
+            entry['mb'] = round(nbytes / 1e6, 1)
+            entry['mb_per_sec'] = round(nbytes / 1e6 / wall, 1) if wall else None
+        if child_rss_mb is None:
+            entry['peak_rss_mb'] = peak_rss_mb()
+            children = children_peak_rss_mb()
+            if children:
+                entry['children_peak_rss_mb'] = children
+        else:
+            entry['children_peak_rss_mb'] = child_rss_mb
+        entry.update(extra)
+        self.stages.append(entry)
+
+        parts = [f"{wall:.2f}s wall"]
+        if cpu is not None:
+            parts.append(f"{cpu:.2f}s CPU")
+        if entry['rows_per_sec']:
+            parts.append(f"{entry['rows_per_sec']:,.0f} rows/sec")
+        if entry.get('mb_per_sec'):
+            parts.append(f"{entry['mb_per_sec']:,.1f} MB/sec")
+        if entry.get('peak_rss_mb') is not None:
+            parts.append(f"peak RSS {entry['peak_rss_mb']:,.0f} MB")
+        elif child_rss_mb is not None:
+            parts.append(f"stage peak RSS {child_rss_mb:,.0f} MB")
+        print(f"  ⏱  {name}: " + ', '.join(parts))
+
+    def write(self) -> str:
+        path = report_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        run = {
+            'started': self.started,
+            'argv': sys.argv[1:],
+            'wall_seconds': round(time.perf_counter() - self._start, 3),
+            'cpu_seconds': round(_cpu_seconds() - self._cpu, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'profiled': self.profile,
+            'stages': self.stages,
+        }
+        # Load, merge and replace under one lock: pipeline stages may finish at the same time
+        with open(f"{path}.lock", 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            data[self.script] = run
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, path)
+        print(f"  build report: {path}")
+        return path
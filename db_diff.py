@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Set-based diff of two built databases (items and spells).
+
+The previous DB is ATTACHed to the new one and every comparison runs as SQL
+over whole tables rather than as Python loops over rows:
+ - added / removed keys: anti-joins on the key column
+ - changed keys: one join whose WHERE clause checks every column both schemas
+   share with `IS NOT` (so NULL vs value counts as a change)
+ - per-field deltas: one INSERT ... SELECT per shared column, limited to the
+   changed keys
+Tables and columns missing on either side are skipped, so any two historical
+builds can be compared.
+
+Results land in `<table>_changes`-style tables of the new DB when requested
+(`item_changes`, `spell_changes`):
+
+  entry INTEGER PRIMARY KEY, changed_fields TEXT, change TEXT, deltas TEXT
+
+with `change` one of added / removed / changed and `deltas` a JSON object
+`{"armor": [old, new], ...}`. A CSV with one line per changed field
+(table, entry, change, field, old, new, delta; added and removed keys get
+one line each) and a JSON summary (counts and changes per field) are
+written as well.
+
+Usage:
+  python3 db_diff.py PREV_DB [NEW_DB] [--record] [--csv build/db_diff.csv]
+      [--json build/db_diff.json] [--tables items,spell_template_ultimate_nerd]
+"""
+from __future__ import annotations
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+import urllib.parse
+from typing import Dict, Iterable, List, Optional
+
+from build_stats import BuildReport
+from table_sync import change_row, write_changes
+
+# table -> (key column, changes table written into the new DB)
+DIFF_TABLES = {
+    'items': ('entry', 'item_changes'),
+    'spell_template_ultimate_nerd': ('entry', 'spell_changes'),
+}
+CSV_HEADER = ('table', 'entry', 'change', 'field', 'old', 'new', 'delta')
+
+
+def _uri(path: str, mode: str) -> str:
+    return f"file:{urllib.parse.quote(os.path.abspath(path))}?mode={mode}"
+
+
+def table_columns(con: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [r[1] for r in con.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def shared_columns(con: sqlite3.Connection, table: str, key: str, schema: str = 'prev') -> List[str]:
+    """Columns of `table` present in both databases, in the new DB's order, key excluded."""
+    prev = set(table_columns(con, schema, table))
+    return [c for c in table_columns(con, 'main', table) if c in prev and c != key]
+
+
+def diff_table(con: sqlite3.Connection, table: str, key: str = 'entry', schema: str = 'prev') -> dict:
+    """Diff main.`table` against `schema`.`table` into temp.diff_keys / temp.diff_fields.
+
+    temp.diff_keys(key, change) holds every added, removed or changed key and
+    temp.diff_fields(key, pos, field, old, new) every changed field of the
+    changed keys. Returns counts per change kind and per field.
+    """
+    cols = shared_columns(con, table, key, schema)
+    con.executescript("""
+        DROP TABLE IF EXISTS temp.diff_keys;
+        DROP TABLE IF EXISTS temp.diff_fields;
+        CREATE TEMP TABLE diff_keys (key PRIMARY KEY, change TEXT NOT NULL) WITHOUT ROWID;
+        CREATE TEMP TABLE diff_fields (key, pos INTEGER, field TEXT, old, new, PRIMARY KEY (key, pos)) WITHOUT ROWID;
+    """)
+    new, old = f"main.{table}", f"{schema}.{table}"
+    con.execute(f"INSERT INTO diff_keys SELECT n.{key}, 'added' FROM {new} n "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {old} p WHERE p.{key} = n.{key})")
+    con.execute(f"INSERT INTO diff_keys SELECT p.{key}, 'removed' FROM {old} p "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {new} n WHERE n.{key} = p.{key})")
+    if cols:
+        differs = ' OR '.join(f"n.{c} IS NOT p.{c}" for c in cols)
+        con.execute(f"INSERT INTO diff_keys SELECT n.{key}, 'changed' FROM {new} n "
+                    f"JOIN {old} p ON p.{key} = n.{key} WHERE {differs}")
+    for pos, c in enumerate(cols):
+        con.execute(f"INSERT INTO diff_fields SELECT d.key, ?, ?, p.{c}, n.{c} FROM diff_keys d "
+                    f"JOIN {new} n ON n.{key} = d.key JOIN {old} p ON p.{key} = d.key "
+                    f"WHERE d.change = 'changed' AND n.{c} IS NOT p.{c}", (pos, c))
+    counts = dict(con.execute("SELECT change, COUNT(*) FROM diff_keys GROUP BY change").fetchall())
+    fields = dict(con.execute("SELECT field, COUNT(*) FROM diff_fields GROUP BY field ORDER BY 2 DESC, field"))
+    return {
+        'columns_compared': len(cols),
+        'added': counts.get('added', 0),
+        'removed': counts.get('removed', 0),
+        'changed': counts.get('changed', 0),
+        'field_changes': sum(fields.values()),
+        'fields': fields,
+    }
+
+
+def record_changes(con: sqlite3.Connection, changes_table: str, key: str = 'entry') -> int:
+    """Replace `changes_table` with one row per key of temp.diff_keys.
+
+    Rows are formatted by table_sync.change_row, the same as the incremental
+    build's, so both paths leave identical item_changes rows for the same edit.
+    """
+    def rows():
+        cur = con.execute("SELECT d.key, d.change, f.field, f.old, f.new FROM diff_keys d "
+                          "LEFT JOIN diff_fields f ON f.key = d.key ORDER BY d.key, f.pos")
+        current, change, fields = None, None, []
+        for k, kind, field, old, new in cur:
+            if k != current:
+                if current is not None:
+                    yield change_row(current, change, fields)
+                current, change, fields = k, kind, []
+            if field is not None:
+                fields.append((field, old, new))
+        if current is not None:
+            yield change_row(current, change, fields)
+
+    write_changes(con, changes_table, key, list(rows()))
+    return con.execute(f"SELECT COUNT(*) FROM main.{changes_table}").fetchone()[0]
+
+
+def delta_rows(con: sqlite3.Connection, table: str) -> Iterable[tuple]:
+    """CSV lines for the current temp.diff_* tables; numeric fields get new - old."""
+    for key, change in con.execute("SELECT key, change FROM diff_keys WHERE change != 'changed' ORDER BY key"):
+        yield (table, key, change, '', '', '', '')
+    for key, field, old, new in con.execute("SELECT key, field, old, new FROM diff_fields ORDER BY key, pos"):
+        numeric = all(isinstance(v, (int, float)) for v in (old, new))
+        yield (table, key, 'changed', field, old, new, round(new - old, 6) if numeric else '')
+
+
+def diff_databases(prev_db: str, new_db: str, tables: Optional[Iterable[str]] = None, record: bool = False,
+                   csv_path: Optional[str] = None, json_path: Optional[str] = None,
+                   profile: bool = False) -> Dict[str, dict]:
+    """Diff `tables` (default: DIFF_TABLES) of `new_db` against `prev_db`; returns stats per table."""
+    report = BuildReport('db_diff', profile=profile)
+    if not os.path.exists(prev_db):
+        raise SystemExit(f"❌ Previous DB not found: {prev_db}")
+    con = sqlite3.connect(_uri(new_db, 'rw' if record else 'ro'), uri=True)
+    con.execute("ATTACH DATABASE ? AS prev", (_uri(prev_db, 'ro'),))
+    results: Dict[str, dict] = {}
+    csv_file = open(csv_path, 'w', newline='') if csv_path else None
+    writer = csv.writer(csv_file) if csv_file else None
+    if writer:
+        writer.writerow(CSV_HEADER)
+    try:
+        for table in tables or DIFF_TABLES:
+            key, changes_table = DIFF_TABLES.get(table, ('entry', f"{table}_changes"))
+            present = [s for s in ('main', 'prev') if con.execute(
+                f"SELECT 1 FROM {s}.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()]
+            if len(present) < 2:
+                print(f"  {table}: skipped (missing from {'both DBs' if not present else 'one DB'})")
+                continue
+            start = time.perf_counter()
+            with report.stage(table) as st:
+                stats = diff_table(con, table, key)
+                if record:
+                    with con:
+                        stats['recorded'] = record_changes(con, changes_table, key)
+                if writer:
+                    writer.writerows(delta_rows(con, table))
+                st.advance(stats['added'] + stats['removed'] + stats['changed'])
+                st.extra.update({k: v for k, v in stats.items() if k != 'fields'})
+            stats['seconds'] = round(time.perf_counter() - start, 3)
+            results[table] = stats
+            top = ', '.join(f"{f} {n}" for f, n in list(stats['fields'].items())[:5])
+            print(f"  {table}: {stats['added']} added, {stats['removed']} removed, {stats['changed']} changed "
+                  f"across {stats['columns_compared']} columns in {stats['seconds']:.2f}s"
+                  + (f" (top fields: {top})" if top else ""))
+    finally:
+        if csv_file:
+            csv_file.close()
+        con.close()
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'prev_db': os.path.abspath(prev_db), 'new_db': os.path.abspath(new_db),
+                       'tables': results}, f, indent=1)
+    report.write()
+    return results
+
+
+if __name__ == '__main__':
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('prev_db', help="earlier build to compare against")
+    parser.add_argument('new_db', nargs='?', default=os.path.join(root, 'build', 'items.sqlite'))
+    parser.add_argument('--record', action='store_true',
+                        help="write item_changes / spell_changes into NEW_DB (otherwise it is opened read-only)")
+    parser.add_argument('--tables', help="comma-separated tables (default: %s)" % ','.join(DIFF_TABLES))
+    parser.add_argument('--csv', default=os.path.join(root, 'build', 'db_diff.csv'), help="per-field delta CSV")
+    parser.add_argument('--json', default=os.path.join(root, 'build', 'db_diff.json'), help="summary JSON")
+    parser.add_argument('--profile', action='store_true', help="dump cProfile stats per stage to build/profile/")
+    args = parser.parse_args()
+    for path in (args.csv, args.json):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    diff_databases(args.prev_db, args.new_db, args.tables.split(',') if args.tables else None,
+                   args.record, args.csv, args.json, args.profile)
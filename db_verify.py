@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Verify built item databases: integrity checks plus a per-row content manifest.
+
+Every check for one database runs over a single connection (no process per
+query), and several databases are verified in parallel (`--jobs`):
+  integrity   PRAGMA quick_check (`--full`: integrity_check)
+  fts         items_fts 'integrity-check' against its content table (skipped,
+              with a warning, when the file is not writable)
+  version     latest data_version row: patch (warning when not --expected-patch)
+              and item_count against the actual row count
+  invariants  at least MIN_ITEMS items, max item_level >= MIN_MAX_ITEM_LEVEL
+  spot        known values (SPOT_CHECKS; warnings)
+  references  item_suggest / item_spell_text rows point at existing items;
+              item spell ids missing from the spell table (warning)
+  manifest    content of MANIFEST_TABLES against a manifest (below)
+
+A manifest holds, per table, its columns, one digest per row (key -> blake2b
+of the affinity-normalized row, as table_sync.row_digest) and a whole-table
+digest over all (key, row digest) pairs in key order. Checking a database
+against it is one pass over each table: equal table digests mean identical
+content, otherwise the added, removed and changed keys are listed. Every row
+is compared, so corruption that a sampled spot check would miss still fails.
+
+Write a manifest from the first database and check the others against it
+(e.g. the optimized copy against the build it was made from):
+  python3 db_verify.py build/items.sqlite build/items.ship.sqlite --write-manifest build/items.manifest.json
+Check against an earlier manifest:
+  python3 db_verify.py Resources/items.sqlite --manifest build/items.manifest.json
+
+Usage:
+  python3 db_verify.py DB [DB ...] [--expected-patch 1.15.7] [--full] [--jobs N]
+      [--manifest FILE | --write-manifest FILE]
+Exit status is 1 when any check fails.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence
+
+from sql_dump import pool_context
+from table_sync import affinity, row_digest, table_columns
+
+SPELL_TABLE = 'spell_template_ultimate_nerd'
+MANIFEST_TABLES = {'items': 'entry', SPELL_TABLE: 'entry'}
+MIN_ITEMS = 1000
+MIN_MAX_ITEM_LEVEL = 60
+# entry -> (column, expected, label); a mismatch is a warning (the app has DEBUG overrides)
+SPOT_CHECKS = {17066: ('armor', 2539, 'Drillborer Disk')}
+SPELL_ID_COLUMNS = [f'spellid_{i}' for i in range(1, 6)]
+MANIFEST_VERSION = 1
+LIST_KEYS = 10  # keys shown per kind of manifest difference
+
+
+def _uri(path: str, mode: str) -> str:
+    return f"file:{urllib.parse.quote(os.path.abspath(path))}?mode={mode}"
+
+
+def has_table(con: sqlite3.Connection, name: str) -> bool:
+    return con.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _check(checks: list, name: str, ok: bool, detail: str, severity: str = 'fail') -> None:
+    checks.append({'check': name, 'status': 'ok' if ok else severity, 'detail': detail})
+
+
+def table_manifest(con: sqlite3.Connection, table: str, key: str) -> dict:
+    """Columns, per-row digests and whole-table digest of `table`, in one ordered pass."""
+    cols = table_columns(con, table)
+    names = [c for c, _ in cols]
+    norms = [affinity(t) for _, t in cols]
+    k = names.index(key)
+    digests = {}
+    whole = hashlib.blake2b(digest_size=16)
+    for row in con.execute(f"SELECT {','.join(names)} FROM {table} ORDER BY {key}"):
+        row = tuple([f(v) for f, v in zip(norms, row)])
+        digest = row_digest(row)
+        digests[str(row[k])] = digest.hex()
+        whole.update(repr(row[k]).encode('utf-8'))
+        whole.update(digest)
+    return {'key': key, 'columns': names, 'rows': len(digests), 'digest': whole.hexdigest(),
+            'row_digests': digests}
+
+
+def database_manifest(con: sqlite3.Connection) -> dict:
+    return {'version': MANIFEST_VERSION,
+            'tables': {t: table_manifest(con, t, key) for t, key in MANIFEST_TABLES.items() if has_table(con, t)}}
+
+
+def _keys(keys: Sequence[str]) -> str:
+    shown = ', '.join(sorted(keys, key=lambda k: (len(k), k))[:LIST_KEYS])
+    return shown + (', ...' if len(keys) > LIST_KEYS else '')
+
+
+def compare_manifest(current: dict, expected: dict) -> List[dict]:
+    """One check per table of `expected`: its content in `current` is identical."""
+    checks: list = []
+    for table, want in expected['tables'].items():
+        name = f'manifest {table}'
+        have = current['tables'].get(table)
+        if have is None:
+            _check(checks, name, False, "table missing")
+            continue
+        if have['columns'] != want['columns']:
+            added = [c for c in have['columns'] if c not in want['columns']]
+            removed = [c for c in want['columns'] if c not in have['columns']]
+            _check(checks, name, False, f"columns differ (added: {', '.join(added) or '-'}; "
+                                        f"removed: {', '.join(removed) or '-'}; or reordered)")
+            continue
+        if have['digest'] == want['digest']:
+            _check(checks, name, True, f"{have['rows']} rows identical")
+            continue
+        hd, wd = have['row_digests'], want['row_digests']
+        extra = [k for k in hd if k not in wd]
+        missing = [k for k in wd if k not in hd]
+        changed = [k for k in wd if k in hd and hd[k] != wd[k]]
+        parts = [f"{label} {len(keys)} ({_keys(keys)})"
+                 for label, keys in (('changed', changed), ('added', extra), ('removed', missing)) if keys]
+        _check(checks, name, False, '; '.join(parts) or "row order differs")
+    return checks
+
+
+def run_checks(con: sqlite3.Connection, writable: bool, expected_patch: Optional[str], full: bool) -> List[dict]:
+    checks: list = []
+    pragma = 'integrity_check' if full else 'quick_check'
+    problems = [r[0] for r in con.execute(f"PRAGMA {pragma}")]
+    _check(checks, 'integrity', problems == ['ok'], f"{pragma}: " + '; '.join(problems[:LIST_KEYS]))
+    if not has_table(con, 'items'):
+        _check(checks, 'items', False, "items table missing")
+        return checks
+
+    if has_table(con, 'items_fts'):
+        if writable:
+            try:
+                # rank = 1 also compares the index against the content table (items)
+                con.execute("INSERT INTO items_fts(items_fts, rank) VALUES('integrity-check', 1)")
+                _check(checks, 'fts', True, "items_fts matches items")
+            except sqlite3.DatabaseError as e:
+                _check(checks, 'fts', False, f"items_fts: {e}")
+            finally:
+                con.rollback()
+        else:
+            _check(checks, 'fts', False, "read-only file, items_fts check skipped", 'warn')
+
+    count, max_ilvl = con.execute("SELECT COUNT(*), MAX(item_level) FROM items").fetchone()
+    if has_table(con, 'data_version'):
+        row = con.execute("SELECT patch_version, build_date, item_count, max_item_level FROM data_version "
+                          "ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            _check(checks, 'version', False, "data_version is empty", 'warn')
+        else:
+            patch, build_date, item_count, version_ilvl = row
+            _check(checks, 'version', True,
+                   f"patch {patch}, built {build_date}, {item_count} items, max iLvl {version_ilvl}")
+            if expected_patch:
+                _check(checks, 'version patch', patch == expected_patch,
+                       f"{patch} (expected {expected_patch})", 'warn')
+            _check(checks, 'version count', item_count == count,
+                   f"data_version {item_count} items, items table {count}", 'warn')
+    else:
+        _check(checks, 'version', False, "data_version table missing", 'warn')
+
+    _check(checks, 'item count', count >= MIN_ITEMS, f"{count} items (minimum {MIN_ITEMS})")
+    _check(checks, 'max item_level', (max_ilvl or 0) >= MIN_MAX_ITEM_LEVEL,
+           f"max item_level {max_ilvl} (minimum {MIN_MAX_ITEM_LEVEL})")
+
+    for entry, (column, expected, label) in SPOT_CHECKS.items():
+        row = con.execute(f"SELECT {column} FROM items WHERE entry = ?", (entry,)).fetchone()
+        if row is None:
+            _check(checks, f'spot {entry}', False, f"{label} not found (entry {entry})", 'warn')
+        else:
+            _check(checks, f'spot {entry}', row[0] == expected,
+                   f"{label} {column}: {row[0]} (expected {expected})", 'warn')
+
+    for table in ('item_suggest', 'item_spell_text'):
+        if has_table(con, table):
+            orphans = con.execute(f"SELECT COUNT(*) FROM {table} t "
+                                  f"WHERE NOT EXISTS (SELECT 1 FROM items i WHERE i.entry = t.entry)").fetchone()[0]
+            _check(checks, f'{table} refs', orphans == 0, f"{orphans} rows reference missing items")
+    if has_table(con, SPELL_TABLE):
+        ids = ' UNION '.join(f"SELECT {c} AS id FROM items WHERE {c} > 0" for c in SPELL_ID_COLUMNS)
+        missing = con.execute(f"SELECT COUNT(*) FROM ({ids}) s "
+                              f"WHERE NOT EXISTS (SELECT 1 FROM {SPELL_TABLE} t WHERE t.entry = s.id)").fetchone()[0]
+        _check(checks, 'spell refs', missing == 0, f"{missing} item spell ids not in {SPELL_TABLE}", 'warn')
+
+    if has_table(con, 'item_changes'):
+        changes = con.execute("SELECT COUNT(*) FROM item_changes").fetchone()[0]
+        _check(checks, 'item_changes', True, f"{changes} rows")
+    return checks
+
+
+def verify_db(path: str, expected_patch: Optional[str] = None, full: bool = False,
+              manifest: bool = False) -> dict:
+    """All checks for one database over one connection; also its manifest when asked for."""
+    start = time.perf_counter()
+    if not os.path.exists(path):
+        return {'db': path, 'checks': [{'check': 'exists', 'status': 'fail', 'detail': "database not found"}],
+                'manifest': None, 'seconds': 0.0}
+    writable = os.access(path, os.W_OK)
+    # Nothing is written: the FTS integrity-check runs in a transaction that is rolled back
+    con = sqlite3.connect(_uri(path, 'rw' if writable else 'ro'), uri=True)
+    try:
+        checks = run_checks(con, writable, expected_patch, full)
+        content = database_manifest(con) if manifest and has_table(con, 'items') else None
+    finally:
+        con.close()
+    return {'db': path, 'checks': checks, 'manifest': content, 'seconds': time.perf_counter() - start}
+
+
+def verify_all(paths: Sequence[str], expected_patch: Optional[str] = None, full: bool = False,
+               manifest: bool = False, jobs: int = 0) -> List[dict]:
+    """verify_db for each path, in parallel processes when there is more than one; results in order."""
+    jobs = min(len(paths), jobs or os.cpu_count() or 1)
+    if jobs <= 1:
+        return [verify_db(p, expected_patch, full, manifest) for p in paths]
+    with ProcessPoolExecutor(jobs, mp_context=pool_context()) as pool:
+        futures = [pool.submit(verify_db, p, expected_patch, full, manifest) for p in paths]
+        return [f.result() for f in futures]
+
+
+def write_manifest(path: str, content: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(content, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def load_manifest(path: str) -> dict:
+    with open(path) as f:
+        content = json.load(f)
+    if content.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"{path}: manifest version {content.get('version')}, expected {MANIFEST_VERSION}")
+    return content
+
+
+def print_result(result: dict) -> None:
+    print(f"🔎 Verifying {result['db']}")
+    for c in result['checks']:
+        if c['status'] == 'ok':
+            print(f"   {c['check']}: {c['detail']}")
+        elif c['status'] == 'warn':
+            print(f"   ⚠️ {c['check']}: {c['detail']}")
+        else:
+            print(f"   ❌ {c['check']}: {c['detail']}")
+    print(f"   ({result['seconds'] * 1000:.0f} ms)")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dbs', nargs='+', help="databases to verify")
+    parser.add_argument('--expected-patch', help="warn when data_version has another patch")
+    parser.add_argument('--full', action='store_true', help="PRAGMA integrity_check instead of quick_check")
+    parser.add_argument('--jobs', type=int, default=0, help="databases verified at once (0 = one per CPU)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--manifest', help="check every DB's content against this manifest")
+    group.add_argument('--write-manifest', help="write the first DB's manifest here and check the others against it")
+    args = parser.parse_args(argv)
+
+    reference = load_manifest(args.manifest) if args.manifest else None
+    results = verify_all(args.dbs, args.expected_patch, args.full,
+                         manifest=bool(args.manifest or args.write_manifest), jobs=args.jobs)
+    if args.write_manifest:
+        reference = results[0]['manifest']
+        if reference is None:
+            print(f"❌ Cannot write manifest {args.write_manifest}: {results[0]['db']} has no items table",
+                  file=sys.stderr)
+        else:
+            write_manifest(args.write_manifest, reference)
+            tables = ', '.join(f"{t} ({m['rows']} rows)" for t, m in reference['tables'].items())
+            print(f"📝 Wrote manifest {args.write_manifest}: {tables}")
+    failed = False
+    for i, result in enumerate(results):
+        if args.manifest or args.write_manifest:
+            if result['manifest'] is None:
+                _check(result['checks'], 'manifest', False, "no items table, manifest not built")
+            elif reference is None:
+                _check(result['checks'], 'manifest', False, "not compared: no reference manifest")
+            elif not (args.write_manifest and i == 0):
+                result['checks'].extend(compare_manifest(result['manifest'], reference))
+        print_result(result)
+        failed = failed or any(c['status'] == 'fail' for c in result['checks'])
+    if failed:
+        print("❌ Verification failed", file=sys.stderr)
+        return 1
+    print("✅ Verification complete")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Binary cache of decoded dump rows, keyed by source content hash.
+
+Turning `unmodified.sql` / `world_full_05_october_2019.sql` text into tuples
+dominates build wall time, yet the dumps rarely change between runs. The
+first run of a table streams its decoded rows into `build/cache/` as batched,
+length-prefixed `marshal` records; later runs with the same dump content and parser version
+stream them back one batch per read and never touch the tokenizer.
+
+Cache files are named `<dump>.<table>.<content hash>.p<parser>m<marshal>.rows`,
+so editing the dump or bumping `sql_dump.PARSER_VERSION` invalidates them
+automatically. Stale files for the same dump/table are pruned on write.
+Field-selective reads (`fields=`) are cached separately as
+`<dump>.<table>+<fields hash>.<content hash>...`, holding only those columns.
+Key-filtered and field-selective reads are served from the full-row cache
+when it exists. Otherwise key-filtered reads go straight to the parser, which
+then decodes only the matching rows, and nothing is written. `CacheWriter`
+records rows pushed to it, which is how dump_router.py fills the caches of
+several tables in one pass over a dump.
+
+Environment overrides:
+  DUMP_CACHE_DIR  (default: build/cache)
+  NO_DUMP_CACHE=1 (always parse the dump; nothing is read or written)
+
+Usage:
+  from dump_cache import cached_rows
+  for values in cached_rows('classic-wow-item-db/db/unmodified.sql', 'items'):
+      ...
+"""
+from __future__ import annotations
+import glob
+import hashlib
+import json
+import marshal
+import os
+import struct
+from typing import AbstractSet, Iterable, Iterator, Optional, Sequence
+
+from sql_dump import CHUNK_SIZE, PARSER_VERSION, iter_rows
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BATCH_ROWS = 5000
+# Each batch is stored as a little-endian length prefix + marshal payload so it
+# can be pulled in with one read (marshal.load on a file issues tiny reads).
+_LEN = struct.Struct('<Q')
+SOURCES_INDEX = 'sources.json'  # path -> {size, mtime_ns, digest}
+
+
+def cache_dir() -> str:
+    return os.environ.get('DUMP_CACHE_DIR') or os.path.join(ROOT, 'build', 'cache')
+
+
+def _write_json(path: str, data) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"  # concurrent builds may write the same index
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def source_digest(path: str, directory: str) -> str:
+    """Content hash of `path`, memoized by (size, mtime) in the cache directory."""
+    st = os.stat(path)
+    index_path = os.path.join(directory, SOURCES_INDEX)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    key = os.path.abspath(path)
+    known = index.get(key)
+    if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+        return known['digest']
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    index[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'digest': digest}
+    _write_json(index_path, index)
+    return digest
+
+
+def _cache_prefix(path: str, table: str, directory: str, fields: Optional[Sequence[int]] = None) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if fields is not None:
+        tag = hashlib.blake2b(repr(tuple(fields)).encode(), digest_size=4).hexdigest()
+        table = f"{table}+{tag}"
+    return os.path.join(directory, f"{stem}.{table}.")
+
+
+def cache_path(path: str, table: str, directory: str, fields: Optional[Sequence[int]] = None) -> str:
+    digest = source_digest(path, directory)
+    return _cache_prefix(path, table, directory, fields) + f"{digest}.p{PARSER_VERSION}m{marshal.version}.rows"
+
+
+def _read_cache(target: str) -> Iterator[tuple]:
+    with open(target, 'rb') as f:
+        while True:
+            header = f.read(_LEN.size)
+            if not header:
+                return
+            yield from marshal.loads(f.read(_LEN.unpack(header)[0]))
+
+
+def _dump_batch(f, batch: list) -> None:
+    payload = marshal.dumps(batch)
+    f.write(_LEN.pack(len(payload)))
+    f.write(payload)
+
+
+class CacheWriter:
+    """Records rows of one table into its cache file; the file only appears on `close(True)`.
+
+    Callable with one decoded row, so it can be a dump_router sink.
+    """
+
+    def __init__(self, path: str, table: str, fields: Optional[Sequence[int]] = None):
+        directory = cache_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.target = cache_path(path, table, directory, fields)
+        self.prefix = _cache_prefix(path, table, directory, fields)
+        self.tmp = f"{self.target}.{os.getpid()}.tmp"
+        self.f = open(self.tmp, 'wb')
+        self.batch = []
+        self.rows = 0
+
+    def __call__(self, row: tuple) -> None:
+        self.batch.append(row)
+        self.rows += 1
+        if len(self.batch) >= BATCH_ROWS:
+            _dump_batch(self.f, self.batch)
+            self.batch = []
+
+    def close(self, complete: bool = True) -> None:
+        if complete and self.batch:
+            _dump_batch(self.f, self.batch)
+        self.batch = []
+        self.f.close()
+        if complete:
+            os.replace(self.tmp, self.target)
+            for stale in glob.glob(glob.escape(self.prefix) + '*.rows'):
+                if stale != self.target:
+                    os.remove(stale)
+        else:
+            os.remove(self.tmp)
+
+
+def _write_through(rows: Iterable[tuple], path: str, table: str,
+                   fields: Optional[Sequence[int]]) -> Iterator[tuple]:
+    """Yield `rows` while recording them; the cache only appears if fully consumed."""
+    writer = CacheWriter(path, table, fields)
+    complete = False
+    try:
+        for row in rows:
+            writer(row)
+            yield row
+        complete = True
+    finally:
+        writer.close(complete)
+
+
+def _project(rows: Iterable[tuple], fields: Sequence[int]) -> Iterator[tuple]:
+    """Column subset of full rows, shaped like `sql_dump.decode_fields` output."""
+    for row in rows:
+        yield tuple(row[i] if i < len(row) else None for i in fields)
+
+
+def is_cached(path: str, table: str) -> bool:
+    """Whether the full-row cache of `table` is current for `path`."""
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    return os.path.exists(cache_path(path, table, directory))
+
+
+def cached_rows(path: str, table: str, jobs: int = 1, fields: Optional[Sequence[int]] = None,
+                keys: Optional[AbstractSet] = None) -> Iterator[tuple]:
+    """Like `sql_dump.iter_rows`, served from the row cache when it is current."""
+    if os.environ.get('NO_DUMP_CACHE') == '1':
+        return iter_rows(path, table, jobs, fields, keys)
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    full = cache_path(path, table, directory)
+    if keys is not None:
+        if os.path.exists(full):
+            rows = (row for row in _read_cache(full) if row and row[0] in keys)
+            return rows if fields is None else _project(rows, fields)
+        return iter_rows(path, table, jobs, fields, keys)
+    target = cache_path(path, table, directory, fields)
+    if os.path.exists(target):
+        return _read_cache(target)
+    if fields is not None and os.path.exists(full):
+        # A full-row cache (e.g. from a dump_router pass) serves any column subset
+        return _project(_read_cache(full), fields)
+    return _write_through(iter_rows(path, table, jobs, fields), path, table, fields)
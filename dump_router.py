@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Single-pass routing of a dump's INSERT rows to per-table consumers.
+
+Every consumer of the world dump used to scan the whole file for its own
+table. `DumpRouter` registers sinks per table and reads the dump once: a
+single header regex finds the statements of all routed tables
+(`sql_dump.iter_table_tuples`), each row is decoded at most once, and every
+sink whose `keys` accept the row receives it (projected to its `fields`).
+Rows no sink wants are skipped undecoded. With `jobs > 1` decoding runs in a
+process pool and rows still reach the sinks in file order.
+
+A sink is any callable taking one decoded row. If it has a `close(complete)`
+method, that is called once the pass ends (`complete=False` when it failed),
+which is how `dump_cache.CacheWriter` sinks publish their cache files.
+
+Run as a script, it fills the row cache of the given tables in one pass, so
+the spell extractor, the discrepancy analysis and the trigger-chain walk
+(spell_refs.py) all read `spell_template` from build/cache instead of
+rescanning the dump:
+
+  python3 dump_router.py world_full_05_october_2019.sql spell_template [TABLE ...] [--jobs N]
+
+Usage:
+  from dump_router import DumpRouter
+  router = DumpRouter('world_full_05_october_2019.sql', jobs=4)
+  router.route('spell_template', chosen.append, keys=wanted_spells)
+  router.route('spell_template', names.append, fields=(0, 121))
+  counts = router.run()  # {'spell_template': rows routed}
+"""
+from __future__ import annotations
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import AbstractSet, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from build_stats import BuildReport
+from dump_cache import CacheWriter, is_cached
+from sql_dump import (PARALLEL_BATCH_ROWS, decode_fields, decode_tuple, iter_table_tuples, pool_context,
+                      resolve_jobs, row_key)
+
+Sink = Callable[[tuple], None]
+
+
+class _Route:
+    def __init__(self, sink: Sink, fields: Optional[Sequence[int]], keys: Optional[AbstractSet]):
+        self.sink = sink
+        self.fields = tuple(fields) if fields is not None else None
+        self.keys = keys
+
+
+def _decode_plan(routes: List[_Route]) -> Optional[tuple]:
+    """Columns to decode for a table: the union of its routes' fields, or None for whole rows."""
+    if any(r.fields is None for r in routes):
+        return None
+    return tuple(sorted({f for r in routes for f in r.fields}))
+
+
+def _decode(raw: bytes, plan: Optional[tuple]) -> tuple:
+    """Whole row, or a row-length tuple holding only the planned columns (None elsewhere)."""
+    if plan is None:
+        return decode_tuple(raw)
+    values = decode_fields(raw, plan)
+    row = [None] * (plan[-1] + 1 if plan else 0)
+    for i, v in zip(plan, values):
+        row[i] = v
+    return tuple(row)
+
+
+def _decode_batch(batch: list, plans: Dict[str, Optional[tuple]]) -> list:
+    return [_decode(raw, plans[table]) for table, raw in batch]
+
+
+class DumpRouter:
+    """Routes the rows of several tables of one dump to their sinks in a single pass."""
+
+    def __init__(self, path: str, jobs: int = 1):
+        self.path = path
+        self.jobs = resolve_jobs(jobs)
+        self.routes: Dict[str, List[_Route]] = {}
+
+    def route(self, table: str, sink: Sink, fields: Optional[Sequence[int]] = None,
+              keys: Optional[AbstractSet] = None) -> 'DumpRouter':
+        """Send `table` rows (only `fields`, only rows whose first column is in `keys`) to `sink`."""
+        self.routes.setdefault(table, []).append(_Route(sink, fields, keys))
+        return self
+
+    def _wanted(self) -> Iterator[Tuple[str, bytes]]:
+        """(table, raw) for every row at least one route accepts, in file order."""
+        filtered = {t: all(r.keys is not None for r in routes) for t, routes in self.routes.items()}
+        for table, raw in iter_table_tuples(self.path, list(self.routes)):
+            if filtered[table]:
+                key = row_key(raw)
+                if not any(key in r.keys for r in self.routes[table]):
+                    continue
+            yield table, raw
+
+    def _decoded(self, plans: Dict[str, Optional[tuple]]) -> Iterator[Tuple[str, tuple]]:
+        wanted = self._wanted()
+        if self.jobs == 1:
+            for table, raw in wanted:
+                yield table, _decode(raw, plans[table])
+            return
+        with ProcessPoolExecutor(self.jobs, mp_context=pool_context()) as pool:
+            pending = deque()
+            while True:
+                batch = list(islice(wanted, PARALLEL_BATCH_ROWS))
+                if batch:
+                    pending.append(([t for t, _ in batch], pool.submit(_decode_batch, batch, plans)))
+                # Keep a bounded window of batches in flight; results leave in order.
+                while pending and (len(pending) > 2 * self.jobs or not batch):
+                    tables, future = pending.popleft()
+                    yield from zip(tables, future.result())
+                if not batch:
+                    return
+
+    def run(self, progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+        """Read the dump once and feed every sink; returns the rows routed per table."""
+        plans = {t: _decode_plan(routes) for t, routes in self.routes.items()}
+        counts = {t: 0 for t in self.routes}
+        complete = False
+        try:
+            for table, row in self._decoded(plans):
+                counts[table] += 1
+                if progress is not None:
+                    progress(1)
+                for r in self.routes[table]:
+                    if r.keys is not None and row[0] not in r.keys:
+                        continue
+                    if r.fields is None:
+                        r.sink(row)
+                    else:
+                        r.sink(tuple(row[i] if i < len(row) else None for i in r.fields))
+            complete = True
+        finally:
+            for routes in self.routes.values():
+                for r in routes:
+                    close = getattr(r.sink, 'close', None)
+                    if close is not None:
+                        close(complete)
+        return counts
+
+
+def warm_cache(path: str, tables: Sequence[str], jobs: int = 1,
+               progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+    """Fill the full-row cache of every table in `tables` not cached yet, in one pass."""
+    missing = [t for t in tables if not is_cached(path, t)]
+    if not missing:
+        return {}
+    router = DumpRouter(path, jobs)
+    for table in missing:
+        router.route(table, CacheWriter(path, table))
+    return router.run(progress)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', help="dump to read")
+    parser.add_argument('tables', nargs='+', help="tables whose rows are cached")
+    parser.add_argument('--jobs', type=int, default=1, help="decode worker processes (0 = one per CPU)")
+    parser.add_argument('--profile', action='store_true', help="dump cProfile stats per stage to build/profile/")
+    args = parser.parse_args()
+    report = BuildReport('dump_router', profile=args.profile)
+    with report.stage('route', nbytes=os.path.getsize(args.src)) as st:
+        counts = warm_cache(args.src, args.tables, args.jobs, st.advance)
+        st.extra['tables'] = counts
+    report.write()
+    for table in args.tables:
+        print(f"  {table}: " + (f"{counts[table]} rows cached" if table in counts else "already cached"))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Precompute ranked autocomplete suggestions for short item-name prefixes.
+
+A one- or two-character FTS prefix query (`"a"*`) matches thousands of items,
+all of which get joined back to `items` and ranked on every keystroke. This
+stage answers those first keystrokes ahead of time:
+
+  item_suggest(prefix, rank, entry)
+      PRIMARY KEY (prefix, rank), WITHOUT ROWID
+
+holds, for every prefix of 1..`max_prefix` characters of every token of an
+item's name, the top `top_k` items ranked by quality, then item level, then
+shorter name (then entry, so ties are stable). The search for a short prefix
+is then one range read of the primary key (`WHERE prefix = ? ORDER BY rank`),
+and full FTS only runs once the query is longer.
+
+Tokens are read back from items_fts itself through an `fts5vocab` table, so
+the prefixes are exactly what the FTS tokenizer produced (lowercased,
+diacritics folded, apostrophes kept inside tokens) and the suggestions match
+what `MATCH '"<prefix>"*'` would find in the name column. The whole table is
+built with one INSERT ... SELECT; ranking is a window function.
+
+Run after items_build.sh:
+  python3 item_suggest.py [--db build/items.sqlite] [--max-prefix 2] [--top-k 50] [--profile]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sqlite3
+
+from build_stats import BuildReport
+from sqlite_optimize import table_bytes
+
+SUGGEST_TABLE = 'item_suggest'
+# Keep in step with ItemRepository.swift (suggestPrefixLength and the search limit)
+MAX_PREFIX = 2
+TOP_K = 50
+
+SUGGEST_SQL = f"""
+DROP TABLE IF EXISTS {SUGGEST_TABLE};
+CREATE TABLE {SUGGEST_TABLE} (
+    prefix TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    entry INTEGER NOT NULL,
+    PRIMARY KEY (prefix, rank)
+) WITHOUT ROWID;
+"""
+
+FILL_SQL = f"""
+WITH RECURSIVE lengths(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM lengths WHERE n < :max_prefix),
+prefixes AS (
+    SELECT DISTINCT substr(v.term, 1, l.n) AS prefix, v.doc AS entry
+    FROM temp.suggest_vocab v JOIN lengths l ON length(v.term) >= l.n
+    WHERE v.col = 'name'
+),
+ranked AS (
+    SELECT p.prefix, p.entry,
+           row_number() OVER (PARTITION BY p.prefix
+                              ORDER BY i.quality DESC, i.item_level DESC, length(i.name), i.entry) AS rank
+    FROM prefixes p JOIN items i ON i.entry = p.entry
+)
+INSERT INTO {SUGGEST_TABLE} (prefix, rank, entry)
+SELECT prefix, rank, entry FROM ranked WHERE rank <= :top_k
+"""
+
+
+def build_suggestions(con: sqlite3.Connection, max_prefix: int = MAX_PREFIX, top_k: int = TOP_K) -> dict:
+    """(Re)create item_suggest from items / items_fts; returns suggestion and prefix counts."""
+    con.executescript(SUGGEST_SQL)
+    con.execute("DROP TABLE IF EXISTS temp.suggest_vocab")
+    con.execute("CREATE VIRTUAL TABLE temp.suggest_vocab USING fts5vocab(main, items_fts, instance)")
+    try:
+        with con:
+            con.execute(FILL_SQL, {'max_prefix': max_prefix, 'top_k': top_k})
+    finally:
+        con.execute("DROP TABLE temp.suggest_vocab")
+    rows, prefixes = con.execute(f"SELECT COUNT(*), COUNT(DISTINCT prefix) FROM {SUGGEST_TABLE}").fetchone()
+    return {'suggestions': rows, 'prefixes': prefixes}
+
+
+def build_item_suggest(db_path: str, max_prefix: int = MAX_PREFIX, top_k: int = TOP_K,
+                       profile: bool = False) -> dict:
+    report = BuildReport('item_suggest', profile=profile)
+    con = sqlite3.connect(db_path)
+    try:
+        with report.stage('suggest', unit='suggestions') as st:
+            stats = build_suggestions(con, max_prefix, top_k)
+            st.advance(stats['suggestions'])
+            sizes = table_bytes(con)
+            if sizes is not None:
+                stats['bytes'] = sizes.get(SUGGEST_TABLE, 0)
+            st.extra.update(stats)
+    finally:
+        con.close()
+    report.write()
+    size = f", {stats['bytes'] / 1024:.0f} KiB" if 'bytes' in stats else ''
+    print(f"🔎 {SUGGEST_TABLE}: {stats['suggestions']} suggestions for {stats['prefixes']} prefixes "
+          f"(1-{max_prefix} chars, top {top_k}{size})")
+    return stats
+
+
+if __name__ == '__main__':
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join(root, 'build', 'items.sqlite'),
+                        help="database with items and items_fts")
+    parser.add_argument('--max-prefix', type=int, default=MAX_PREFIX, help="longest prefix precomputed (characters)")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="suggestions kept per prefix")
+    parser.add_argument('--profile', action='store_true', help="dump cProfile stats per stage to build/profile/")
+    args = parser.parse_args()
+    build_item_suggest(args.db, args.max_prefix, args.top_k, args.profile)
@@ -2,43 +2,47 @@
 set -euo pipefail
 DB=${1:-build/items_mega_enhanced.sqlite}
 EXPECTED_PATCH=${EXPECTED_PATCH:-1.15.7}
+# Optional query-latency gate (bench/bench_queries.py); any of these enables it:
+#   QUERY_BASELINE   baseline JSON to compare warm p95 per query kind against
+#   QUERY_TOLERANCE  allowed p95 growth vs the baseline (default 0.5 = 50%)
+#   MAX_QUERY_P95_MS fail when any query kind's warm p95 exceeds this
+#   FAIL_ON_SCAN     set to 1 to fail when an app query plan does a full scan
+#   QUERY_WORKLOAD   replay this saved workload instead of generating one
+QUERY_BASELINE=${QUERY_BASELINE:-}
+MAX_QUERY_P95_MS=${MAX_QUERY_P95_MS:-}
+FAIL_ON_SCAN=${FAIL_ON_SCAN:-0}
+
+# Content manifest (db_verify.py); either enables it:
+#   MANIFEST         check the DB's items / spell rows against this manifest
+#   REFERENCE_DB     verify this DB as well, write its manifest to MANIFEST_OUT
+#                    (default build/items.manifest.json) and check the DB against it
+MANIFEST=${MANIFEST:-}
+REFERENCE_DB=${REFERENCE_DB:-}
+ROOT_DIR=$(cd "$(dirname "$0")" && pwd)
 
 fail(){ echo "❌ $1" >&2; exit 1; }
 [ -f "$DB" ] || fail "Database not found: $DB"
 
-echo "🔎 Verifying $DB"
-# 1. Version table
-if sqlite3 "$DB" \
-  "SELECT 1 FROM sqlite_master WHERE type='table' AND name='data_version';" | grep -q 1; then
-  read PATCH BUILD_DATE ITEM_COUNT MAX_ILVL <<<"$(sqlite3 "$DB" "SELECT patch_version||'|'||build_date||'|'||item_count||'|'||max_item_level FROM data_version ORDER BY id DESC LIMIT 1;" | tr '|' ' ')"
-  echo "   Patch: $PATCH  Build Date: $BUILD_DATE  Items: $ITEM_COUNT  Max iLvl: $MAX_ILVL"
-  [ "$PATCH" = "$EXPECTED_PATCH" ] || echo "   ⚠️ Expected patch $EXPECTED_PATCH got $PATCH"
-else
-  echo "   ⚠️ data_version table missing"
-fi
-
-# 2. Basic invariants
-read COUNT MAX_ILVL_ACTUAL <<<"$(sqlite3 "$DB" "SELECT COUNT(*)||' '||MAX(item_level) FROM items;")"
-[ "$COUNT" -ge 1000 ] || fail "Too few items ($COUNT)"
-[ "$MAX_ILVL_ACTUAL" -ge 60 ] || fail "Suspicious max item_level ($MAX_ILVL_ACTUAL)"
-echo "   Item count + max item_level OK"
-
-# 3. Drillborer Disk armor check (entry 17066)
-DRILL_ARMOR=$(sqlite3 "$DB" "SELECT armor FROM items WHERE entry=17066;") || true
-if [ -n "$DRILL_ARMOR" ]; then
-  echo "   Drillborer Disk armor: $DRILL_ARMOR"
-  [ "$DRILL_ARMOR" = "2539" ] || echo "   ⚠️ Expected 2539; app will show override if running DEBUG build"
+# 1. Integrity, FTS, version, invariants, spot values, references and manifest:
+#    one connection per DB, several DBs in parallel
+VERIFY_ARGS=(--expected-patch "$EXPECTED_PATCH")
+if [ -n "$REFERENCE_DB" ]; then
+  python3 "$ROOT_DIR/db_verify.py" "$REFERENCE_DB" "$DB" "${VERIFY_ARGS[@]}" \
+    --write-manifest "${MANIFEST_OUT:-$ROOT_DIR/build/items.manifest.json}" || fail "Verification failed"
 else
-  echo "   ⚠️ Drillborer Disk not found (entry 17066)"
+  [ -n "$MANIFEST" ] && VERIFY_ARGS+=(--manifest "$MANIFEST")
+  python3 "$ROOT_DIR/db_verify.py" "$DB" "${VERIFY_ARGS[@]}" || fail "Verification failed"
 fi
 
-# 4. Random shield sample
-sqlite3 "$DB" "SELECT entry,name,armor,block FROM items WHERE class=4 AND subclass=6 ORDER BY RANDOM() LIMIT 5;" | sed 's/^/   /'
-
-# 5. Change tracking
-if sqlite3 "$DB" "SELECT 1 FROM sqlite_master WHERE type='table' AND name='item_changes';" | grep -q 1; then
-  CHANGED_COUNT=$(sqlite3 "$DB" "SELECT COUNT(*) FROM item_changes;")
-  echo "   item_changes rows: $CHANGED_COUNT"
+# 2. Query latency (opt-in)
+if [ -n "$QUERY_BASELINE" ] || [ -n "$MAX_QUERY_P95_MS" ] || [ "$FAIL_ON_SCAN" = 1 ]; then
+  BENCH_ARGS=(--tolerance "${QUERY_TOLERANCE:-0.5}")
+  [ -n "$QUERY_BASELINE" ] && BENCH_ARGS+=(--baseline "$QUERY_BASELINE")
+  [ -n "$MAX_QUERY_P95_MS" ] && BENCH_ARGS+=(--max-p95-ms "$MAX_QUERY_P95_MS")
+  [ "$FAIL_ON_SCAN" = 1 ] && BENCH_ARGS+=(--fail-on-scan)
+  [ -n "${QUERY_WORKLOAD:-}" ] && BENCH_ARGS+=(--workload "$QUERY_WORKLOAD")
+  python3 "$ROOT_DIR/bench/bench_queries.py" "$DB" "${BENCH_ARGS[@]}" | sed 's/^/   /' \
+    || fail "Query latency regressed (see build/bench/queries.json)"
 fi
 
-echo "✅ Verification complete"
+echo "✅ All checks passed"
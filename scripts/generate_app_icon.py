@@ -8,20 +8,47 @@ Creates stylised fantasy item icon artwork (original, non-infringing):
 
 Writes PNGs into Assets.xcassets/AppIcon.appiconset matching updated Contents.json.
 
+The master is rendered with NumPy array operations (background and gem
+gradients, vignette inversion, diamond mask, composites); shapes and blurs
+stay in Pillow's C drawing and filter code. Without NumPy the per-scanline
+Pillow renderer is used; `--check` renders both and reports how far apart
+they are.
+
+Sizes come from a downscale pyramid: the master is halved repeatedly (2x2
+box averages) and each size is LANCZOS-resampled from the smallest level at
+least twice its size, so every resample still reduces by 2x or more (the
+same antialiasing as resampling the master, at a fraction of the cost).
+Every distinct pixel size is encoded once, in a process pool, with the
+chosen PNG compress level / optimize setting. A file is only rewritten when
+its SHA-256 differs from the new bytes, and the total icon bytes of the
+asset catalog are reported.
+
 Usage:
-  python scripts/generate_app_icon.py
+  python scripts/generate_app_icon.py [--jobs N] [--check]
+      [--compress-level 0-9] [--optimize]
 
-Requires Pillow:
-  pip install pillow
+Requires Pillow (NumPy optional but recommended):
+  pip install pillow numpy
 """
 from __future__ import annotations
+import argparse
+import hashlib
+import io
 import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Tuple
 try:
     from PIL import Image, ImageDraw, ImageFilter
 except ImportError as e:  # pragma: no cover
     raise SystemExit("Pillow not installed. Run: pip install pillow") from e
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 ROOT = Path(__file__).resolve().parents[1]
 APPICON_PATH = ROOT / "WoWCA" / "Assets.xcassets" / "AppIcon.appiconset"
 IOS_SPECS = [
@@ -57,7 +84,8 @@ def lerp(a: float, b: float, t: float) -> float:
 def lerp_color(c1: Tuple[int, int, int], c2: Tuple[int, int, int], t: float):
     return tuple(int(lerp(a, b, t)) for a, b in zip(c1, c2))
 
-def build_master(size: int = 1024) -> Image.Image:
+def build_master_pillow(size: int = 1024) -> Image.Image:
+    """Reference renderer: one Pillow draw call per scanline."""
     img = Image.new("RGBA", (size, size))
     draw = ImageDraw.Draw(img)
     for y in range(size):
@@ -108,30 +136,220 @@ def build_master(size: int = 1024) -> Image.Image:
         sdraw.ellipse([sx-r, sy-r, sx+r, sy+r], fill=SPARKLE)
     return img.filter(ImageFilter.GaussianBlur(size/512)).convert("RGBA")
 
-def save_scaled(master: Image.Image, px: int, filename: str):
-    out = master.resize((px, px), Image.LANCZOS)
-    out.save(APPICON_PATH / filename, "PNG")
+# Max per-channel difference allowed between the NumPy and Pillow masters
+# (currently identical; headroom for Pillow rasterisation changes).
+CHECK_TOLERANCE = 8
 
-def main():
-    APPICON_PATH.mkdir(parents=True, exist_ok=True)
-    master = build_master(1024)
-    generated = []
+def _gradient(c1, c2, n: int, denom: float):
+    """Rows 0..n-1 of lerp_color(c1, c2, i / denom), as an (n, 3) uint8 array."""
+    t = np.arange(n, dtype=np.float64)[:, None] / denom
+    a = np.array(c1, dtype=np.float64)
+    b = np.array(c2, dtype=np.float64)
+    return (a + (b - a) * t).astype(np.uint8)  # truncates like int()
+
+def _composite(fg, bg, mask):
+    """Image.composite(fg, bg, mask) on uint8 arrays, with Pillow's rounding.
+
+    Only the bounding box of the non-zero mask is touched; uint16 holds every
+    intermediate (255 * 255 + 255 + 128 < 65536).
+    """
+    ys, xs = np.nonzero(mask.any(axis=1))[0], np.nonzero(mask.any(axis=0))[0]
+    if not len(ys):
+        return bg
+    box = np.s_[ys[0]:ys[-1] + 1, xs[0]:xs[-1] + 1]
+    m = mask[box].astype(np.uint16)[..., None]
+    fg = np.asarray(fg, dtype=np.uint16)
+    tmp = bg[box] * (255 - m)
+    tmp += fg * m if fg.any() else 0
+    tmp += 128
+    tmp += tmp >> 8
+    tmp >>= 8
+    bg[box] = tmp
+    return bg
+
+def _blurred(size: int, radius: float, shapes) -> "np.ndarray":
+    """An L mask of filled ellipses [(box, fill)], Gaussian-blurred."""
+    layer = Image.new("L", (size, size), 0)
+    draw = ImageDraw.Draw(layer)
+    for box, fill in shapes:
+        draw.ellipse(box, fill=fill)
+    return np.asarray(layer.filter(ImageFilter.GaussianBlur(radius)))
+
+def build_master_numpy(size: int = 1024) -> Image.Image:
+    px = np.empty((size, size, 4), dtype=np.uint8)
+    px[..., :3] = _gradient(BG_TOP, BG_BOTTOM, size, size - 1)[:, None, :]
+    px[..., 3] = 255
+    rings = []
+    for r in [1.0, 0.85, 0.7, 0.55]:
+        radius = int(size * r / 2)
+        box = [size//2 - radius, size//2 - radius, size//2 + radius, size//2 + radius]
+        rings.append((box, int(255 * (1 - r) * 1.2)))
+    vignette = _blurred(size, size // 18, rings)
+    px = _composite((0, 0, 0, 255), px, 255 - vignette)
+    # No frames: build_master_pillow draws them on the image the vignette
+    # composite replaces, so the shipped icons have never shown them.
+    gem_size = size * 0.42
+    cx = cy = size / 2
+    half = gem_size / 2
+    # Gem: one gradient colour per scanline span (Pillow truncates line
+    # coordinates to ints), cut out by the rasterised diamond.
+    rows = int(gem_size)
+    i = np.arange(rows)
+    y = cy - half + i
+    w = (1 - np.abs(y - cy) / half) * half
+    row, x0, x1 = y.astype(np.int64), (cx - w).astype(np.int64), (cx + w).astype(np.int64)
+    colors = _gradient(GEM_DARK, GEM_LIGHT, rows, gem_size - 1)
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).polygon([(cx, cy - half), (cx + half, cy), (cx, cy + half), (cx - half, cy)], fill=255)
+    band = np.s_[row[0]:row[-1] + 1]
+    xs = np.arange(size)[None, :]
+    gem = (xs >= x0[:, None]) & (xs <= x1[:, None]) & (np.asarray(mask)[band] > 0)
+    fill = np.empty((rows, size, 4), dtype=np.uint8)
+    fill[..., :3] = colors[:, None, :]
+    fill[..., 3] = 255
+    px[band][gem] = fill[gem]
+    highlight = _blurred(size, size // 60, [
+        ([cx - gem_size*0.28, cy - gem_size*0.5, cx + gem_size*0.28, cy + gem_size*0.1], 140)])
+    px = _composite((255, 255, 255, 70), px, highlight)
+    img = Image.fromarray(px, "RGBA")
+    sdraw = ImageDraw.Draw(img)
+    for angle_deg, dist_frac, sz in [(15, 0.62, 0.045), (222, 0.58, 0.035), (300, 0.34, 0.028)]:
+        ang = math.radians(angle_deg)
+        d = dist_frac * half
+        sx = cx + math.cos(ang) * d
+        sy = cy + math.sin(ang) * d
+        r = sz * half
+        sdraw.ellipse([sx-r, sy-r, sx+r, sy+r], fill=SPARKLE)
+    return img.filter(ImageFilter.GaussianBlur(size/512)).convert("RGBA")
+
+def build_master(size: int = 1024) -> Image.Image:
+    if np is None:
+        return build_master_pillow(size)
+    return build_master_numpy(size)
+
+def check_master(master: Image.Image, size: int = 1024) -> bool:
+    """Compare `master` with the Pillow reference; prints max / mean channel difference."""
+    reference = build_master_pillow(size)
+    diff = np.abs(np.asarray(master, dtype=np.int16) - np.asarray(reference, dtype=np.int16))
+    off = np.count_nonzero(diff.max(axis=2))
+    print(f"Check vs Pillow reference: max diff {diff.max()}, mean {diff.mean():.4f}, "
+          f"{off} of {size * size} pixels differ (tolerance {CHECK_TOLERANCE})")
+    return int(diff.max()) <= CHECK_TOLERANCE
+
+# PNG encoder defaults (Pillow's own defaults: zlib level 6, no optimize pass).
+COMPRESS_LEVEL = 6
+
+_PYRAMID: List[Image.Image] = []
+
+def build_pyramid(master: Image.Image, smallest: int) -> List[Image.Image]:
+    """The master and its successive halvings, down to the last level >= 2 * `smallest`."""
+    levels = [master]
+    while levels[-1].width // 2 >= 2 * smallest:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+def scaled(levels: List[Image.Image], px: int) -> Image.Image:
+    """`px` x `px` icon, resampled from the smallest pyramid level >= 2x its size."""
+    source = levels[0]
+    for level in levels[1:]:
+        if level.width >= 2 * px:
+            source = level
+    if source.width == px:
+        return source
+    return source.resize((px, px), Image.LANCZOS)
+
+def _init_worker(data: bytes, size: int, smallest: int):
+    global _PYRAMID
+    _PYRAMID = build_pyramid(Image.frombytes("RGBA", (size, size), data), smallest)
+
+def _encode(px: int, compress_level: int = COMPRESS_LEVEL, optimize: bool = False) -> Tuple[int, bytes]:
+    buf = io.BytesIO()
+    scaled(_PYRAMID, px).save(buf, "PNG", compress_level=compress_level, optimize=optimize)
+    return px, buf.getvalue()
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Write `data` unless the file already holds the same bytes (by SHA-256); True if written."""
+    if path.exists() and _digest(path.read_bytes()) == _digest(data):
+        return False
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+def write_icons(master: Image.Image, targets: Dict[str, int], jobs: int = 1,
+                compress_level: int = COMPRESS_LEVEL, optimize: bool = False) -> Dict[str, int]:
+    """Encode each distinct size once (in `jobs` processes) and write the files whose content changed.
+
+    Returns counts of written / unchanged files and the bytes of the generated icons.
+    """
+    sizes = sorted(set(targets.values()), reverse=True)
+    initargs = (master.tobytes(), master.width, min(sizes))
+    encode = partial(_encode, compress_level=compress_level, optimize=optimize)
+    if jobs > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=initargs) as pool:
+            encoded = dict(pool.map(encode, sizes))
+    else:
+        _init_worker(*initargs)
+        encoded = dict(encode(px) for px in sizes)
+    stats = {"written": 0, "unchanged": 0, "bytes": 0}
+    for name, px in targets.items():
+        stats["written" if write_if_changed(APPICON_PATH / name, encoded[px]) else "unchanged"] += 1
+        stats["bytes"] += len(encoded[px])
+    return stats
+
+def asset_bytes(path: Path = APPICON_PATH) -> int:
+    """Total size of the PNGs in the icon set (what the app bundle carries)."""
+    return sum(p.stat().st_size for p in path.glob("*.png"))
+
+def icon_targets() -> Dict[str, int]:
+    """File name -> pixel size for every icon in Contents.json."""
+    targets: Dict[str, int] = {}
     for idiom, pts, scale in IOS_SPECS:
         px = int(round(pts * scale))
         name = f"icon-{idiom}-{str(pts).replace('.5','') }@{scale}x.png".replace('.0','')
-        save_scaled(master, px, name)
-        generated.append(name)
+        targets[name] = px
     for idiom, size_px, scale in MAC_SPECS:
-        px = size_px * scale
-        name = f"icon-mac-{size_px}@{scale}x.png"
-        save_scaled(master, px, name)
-        generated.append(name)
+        targets[f"icon-mac-{size_px}@{scale}x.png"] = size_px * scale
     _, marketing_px, _ = MARKETING
-    marketing_name = "icon-marketing-1024.png"
-    save_scaled(master, marketing_px, marketing_name)
-    generated.append(marketing_name)
-    print(f"Generated {len(generated)} icons:")
+    targets["icon-marketing-1024.png"] = marketing_px
+    return targets
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=0, help="resize/encode processes (0 = one per CPU)")
+    parser.add_argument("--check", action="store_true",
+                        help="compare the NumPy master with the Pillow reference renderer")
+    parser.add_argument("--compress-level", type=int, default=COMPRESS_LEVEL, choices=range(10),
+                        metavar="0-9", help=f"zlib level for the PNGs (default: {COMPRESS_LEVEL})")
+    parser.add_argument("--optimize", action="store_true",
+                        help="let the PNG encoder search for the smallest output (slower)")
+    args = parser.parse_args()
+    APPICON_PATH.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    master = build_master(1024)
+    rendered = time.perf_counter()
+    if args.check:
+        if np is None:
+            raise SystemExit("--check needs NumPy. Run: pip install numpy")
+        if not check_master(master):
+            raise SystemExit("NumPy master differs from the Pillow reference beyond tolerance")
+    targets = icon_targets()
+    before = asset_bytes()
+    encode_start = time.perf_counter()
+    stats = write_icons(master, targets, args.jobs if args.jobs > 0 else (os.cpu_count() or 1),
+                        args.compress_level, args.optimize)
+    done = time.perf_counter()
+    generated: List[str] = list(targets)
+    print(f"Generated {len(generated)} icons ({len(set(targets.values()))} sizes), "
+          f"{stats['written']} written, {stats['unchanged']} unchanged:")
     for g in generated:
         print(" -", g)
+    after = asset_bytes()
+    print(f"Icon assets: {after:,} bytes ({after - before:+,} vs before; generated icons {stats['bytes']:,})")
+    print(f"Master rendered in {rendered - start:.3f}s ({'NumPy' if np is not None else 'Pillow'}), "
+          f"resized and encoded in {done - encode_start:.3f}s")
 if __name__ == "__main__":
     main()
@@ -0,0 +1,61 @@
+"""Spell IDs the item database actually references.
+
+The spell stage only needs the spells that items point at through
+`items.spellid_1..5`; everything else in the world dump's `spell_template`
+is dead weight in the shipped DB. This module reads that set from the built
+items database and, optionally, extends it with the spells those spells
+trigger (`effectTriggerSpell1..3`, followed transitively), so the extractor
+can push the set down into `sql_dump` and skip unreferenced rows before their
+fields are decoded.
+
+Usage:
+  from spell_refs import referenced_spell_ids
+  ids = referenced_spell_ids(con, 'world_full_05_october_2019.sql', follow_triggers=True)
+"""
+from __future__ import annotations
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+from dump_cache import cached_rows
+
+ITEM_SPELL_COLUMNS = ['spellid_1', 'spellid_2', 'spellid_3', 'spellid_4', 'spellid_5']
+# spell_template positions of entry and effectTriggerSpell1..3
+TRIGGER_FIELDS = (0, 110, 111, 112)
+
+
+def item_spell_ids(con: sqlite3.Connection) -> Set[int]:
+    """Every non-zero spell ID in items.spellid_1..5."""
+    union = ' UNION '.join(f"SELECT {c} FROM items WHERE {c} > 0" for c in ITEM_SPELL_COLUMNS)
+    return {row[0] for row in con.execute(union)}
+
+
+def trigger_graph(src_sql: str, jobs: int = 1) -> Dict[int, Set[int]]:
+    """spell -> spells it triggers, over every build in the dump (only 4 fields decoded)."""
+    graph = defaultdict(set)
+    for entry, *triggers in cached_rows(src_sql, 'spell_template', jobs=jobs, fields=TRIGGER_FIELDS):
+        for t in triggers:
+            if isinstance(t, int) and t > 0 and t != entry:
+                graph[entry].add(t)
+    return graph
+
+
+def trigger_closure(ids: Iterable[int], graph: Dict[int, Set[int]]) -> Set[int]:
+    """Transitive closure of `ids` under the trigger graph."""
+    seen = set(ids)
+    stack = list(seen)
+    while stack:
+        for t in graph.get(stack.pop(), ()):
+            if t not in seen:
+                seen.add(t)
+                stack.append(t)
+    return seen
+
+
+def referenced_spell_ids(con: sqlite3.Connection, src_sql: str, follow_triggers: bool = False,
+                         jobs: int = 1) -> Set[int]:
+    """Item spell IDs, plus everything they trigger when `follow_triggers` is set."""
+    ids = item_spell_ids(con)
+    if follow_triggers:
+        ids = trigger_closure(ids, trigger_graph(src_sql, jobs))
+    return ids
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Render item spell tooltips at build time into `item_spell_text`.
+
+The app used to resolve every item spell at runtime: load the spell rows,
+then substitute `$s1`-style placeholders in `description1`
+(`Spell.parsedDescription()`). This stage does that once per build. It joins
+`items.spellid_1..5` / `spelltrigger_1..5` to `spell_template_ultimate_nerd`,
+renders the tooltip line with the same substitution rules, and prefixes it by
+trigger ("Use: ", "Equip: ", "Chance on hit: "). The result goes into:
+
+  item_spell_text(entry, slot, spell_id, trigger, name, text)
+      PRIMARY KEY (entry, slot), WITHOUT ROWID
+
+so an item detail view reads all of its spell lines with one primary-key
+lookup (`WHERE entry = ?`). ItemDetailView does (`ItemSpellText` in
+Spell.swift) and only calls `parsedDescription()` when the table is missing.
+
+Placeholders (mirroring Spell.swift):
+  $s1..3 / $o1..3   effectBasePoints + 1
+  $d                duration of the spell, $<id>d duration of spell <id>
+  $<id>s<n>         effectBasePoints<n> + 1 of spell <id>
+  $x1..3 / $m1..3   chain targets / misc value
+  $lsingular:plural;  plural form
+  anything else     X
+Spells referenced only by other spells' text resolve when they were extracted
+too (`spells_extract_full.py --follow-triggers`), else fall back like the app.
+
+Run after spells_extract_full.py:
+  python3 spell_tooltips.py [--db build/items.sqlite] [--profile]
+"""
+from __future__ import annotations
+import argparse
+import os
+import re
+import sqlite3
+from typing import Dict, Iterable, Optional
+
+from build_stats import BuildReport
+from sqlite_bulk import BulkLoader
+
+SPELL_TABLE = 'spell_template_ultimate_nerd'
+SPELL_COLUMNS = ('entry', 'name1', 'description1', 'durationIndex',
+                 'effectBasePoints1', 'effectBasePoints2', 'effectBasePoints3',
+                 'effectChainTarget1', 'effectChainTarget2', 'effectChainTarget3',
+                 'effectMiscValue1', 'effectMiscValue2', 'effectMiscValue3')
+SLOTS = range(1, 6)
+
+# items.spelltrigger_N -> tooltip prefix
+TRIGGER_PREFIX = {0: 'Use: ', 1: 'Equip: ', 2: 'Chance on hit: ', 3: 'Use: ', 4: 'Use: ', 5: 'Use: '}
+
+# Spell.durationText(): common Classic duration indices
+DURATION_TEXT = {
+    1: '10 sec', 2: '12 sec', 3: '18 sec', 4: '21 sec', 5: '27 sec', 6: '30 sec', 7: '45 sec',
+    8: '1 min', 9: '2 min', 10: '3 min', 15: '5 min', 18: '8 sec', 21: 'until cancelled',
+    22: '45 sec', 23: '1 hour', 25: '15 sec', 26: '3 sec', 27: '6 sec', 28: '5 sec', 29: '12 sec',
+    30: '30 min', 31: '8 sec',
+}
+# Spell.lookupSpellDuration / lookupSpellEffectValue fallbacks for spells not in the DB
+KNOWN_DURATIONS = {6788: '15 sec', 1706: '3 sec', 27648: '12 sec'}
+KNOWN_EFFECTS = {(17809, 1): '40', (27648, 1): '20'}
+KNOWN_TARGET_COUNTS = {21992: '4'}  # Thunderfury
+
+_PLACEHOLDER_RE = re.compile(
+    r"\$(?:(?P<ref_d>\d+)d"
+    r"|(?P<ref_s>\d+)s(?P<ref_i>\d+)"
+    r"|(?P<own>[so])(?P<own_i>[1-3])"
+    r"|(?P<misc>[xm])(?P<misc_i>[1-3])"
+    r"|l(?P<singular>[^:]+):(?P<plural>[^;]+);"
+    r"|(?P<dur>d)"
+    r"|[a-zA-Z0-9]+)")
+
+
+def duration_text(index) -> Optional[str]:
+    if not index or index <= 0:
+        return None
+    if index in DURATION_TEXT:
+        return DURATION_TEXT[index]
+    if index < 10:
+        return f"{index * 3} sec"
+    if index < 30:
+        return f"{index} sec"
+    return f"[{index} duration]"
+
+
+def render_description(spell: dict, spells: Dict[int, dict]) -> str:
+    """`description1` with every placeholder substituted, as Spell.parsedDescription() does."""
+    def replace(m: re.Match) -> str:
+        if m.group('ref_d'):
+            other_id = int(m.group('ref_d'))
+            other = spells.get(other_id)
+            text = duration_text(other['durationIndex']) if other else None
+            return text or KNOWN_DURATIONS.get(other_id, f"[{other_id} duration]")
+        if m.group('ref_s'):
+            other_id, i = int(m.group('ref_s')), int(m.group('ref_i'))
+            other = spells.get(other_id)
+            points = other.get(f'effectBasePoints{i}') if other else None
+            if points is not None:
+                return str(points + 1)
+            return KNOWN_EFFECTS.get((other_id, i), f"[{other_id}s{i}]")
+        if m.group('own'):
+            points = spell[f"effectBasePoints{m.group('own_i')}"]
+            return str(points + 1) if points is not None else 'X'
+        if m.group('misc'):
+            i = m.group('misc_i')
+            if m.group('misc') == 'x':
+                chain = spell[f'effectChainTarget{i}']
+                misc = spell[f'effectMiscValue{i}']
+                if chain and chain > 0:
+                    return str(chain)
+                if misc and misc > 0:
+                    return str(misc)
+                return KNOWN_TARGET_COUNTS.get(spell['entry'], 'X')
+            misc = spell[f'effectMiscValue{i}']
+            return str(misc) if misc else 'X'
+        if m.group('plural'):
+            return m.group('plural')
+        if m.group('dur'):
+            return duration_text(spell['durationIndex']) or '[duration]'
+        return 'X'
+
+    return _PLACEHOLDER_RE.sub(replace, spell['description1'] or '')
+
+
+def load_spells(con: sqlite3.Connection) -> Dict[int, dict]:
+    cur = con.execute(f"SELECT {', '.join(SPELL_COLUMNS)} FROM {SPELL_TABLE}")
+    return {row[0]: dict(zip(SPELL_COLUMNS, row)) for row in cur}
+
+
+def tooltip_rows(con: sqlite3.Connection, spells: Dict[int, dict], missing: set) -> Iterable[tuple]:
+    """(entry, slot, spell_id, trigger, name, text) for every item spell slot in use."""
+    columns = ', '.join(f"spellid_{n}, spelltrigger_{n}" for n in SLOTS)
+    rendered = {}  # (spell_id, trigger) -> (name, text); many items share a spell
+    for row in con.execute(f"SELECT entry, {columns} FROM items ORDER BY entry"):
+        entry = row[0]
+        for n in SLOTS:
+            spell_id, trigger = row[2 * n - 1], row[2 * n]
+            if not spell_id:
+                continue
+            key = (spell_id, trigger)
+            if key not in rendered:
+                spell = spells.get(spell_id)
+                if spell is None:
+                    missing.add(spell_id)
+                    rendered[key] = (None, None)
+                else:
+                    text = render_description(spell, spells)
+                    if text:
+                        text = TRIGGER_PREFIX.get(trigger, '') + text
+                    rendered[key] = (spell['name1'], text)
+            yield (entry, n, spell_id, trigger) + rendered[key]
+
+
+def build_item_spell_text(db_path: str, profile: bool = False) -> int:
+    report = BuildReport('spell_tooltips', profile=profile)
+    con = sqlite3.connect(db_path)
+    try:
+        with report.stage('load', unit='spells') as st:
+            spells = load_spells(con)
+            st.advance(len(spells))
+    except sqlite3.OperationalError as e:
+        raise SystemExit(f"❌ Cannot read {SPELL_TABLE} from {db_path} ({e}); run spells_extract_full.py first")
+    print(f"Loaded {len(spells)} spells")
+
+    con.executescript("""
+        DROP TABLE IF EXISTS item_spell_text;
+        CREATE TABLE item_spell_text (
+          entry INTEGER NOT NULL,
+          slot INTEGER NOT NULL,
+          spell_id INTEGER NOT NULL,
+          trigger INTEGER,
+          name TEXT,
+          text TEXT,
+          PRIMARY KEY (entry, slot)
+        ) WITHOUT ROWID;
+    """)
+    missing = set()
+    with report.stage('render') as st:
+        with BulkLoader(con, 'item_spell_text', label='tooltip', progress=st.advance) as loader:
+            inserted = loader.insert("INSERT INTO item_spell_text VALUES (?,?,?,?,?,?)",
+                                     tooltip_rows(con, spells, missing))
+        st.extra.update(missing_spells=len(missing))
+    con.close()
+    report.write()
+    print(f"Rendered {inserted} item spell lines into item_spell_text "
+          f"({len(missing)} spell IDs not in {SPELL_TABLE})")
+    return inserted
+
+
+if __name__ == '__main__':
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join(root, 'build', 'items.sqlite'),
+                        help="database with items and spell_template_ultimate_nerd")
+    parser.add_argument('--profile', action='store_true', help="dump cProfile stats per stage to build/profile/")
+    args = parser.parse_args()
+    build_item_spell_text(args.db, args.profile)
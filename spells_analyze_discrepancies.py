@@ -1,153 +1,253 @@
 #!/usr/bin/env python3
+"""Find spells whose builds disagree and generate build corrections for the extractor.
 
+Every build of every spell in `spell_template` is loaded into NumPy column
+arrays and each build is compared with the one the extractor would pick by
+default (5875, else 4222, else the newest), across all dump columns at once:
+numeric columns by value, text columns by interned string code. Every
+difference lands in a CSV report.
+
+Corrections keep the original heuristic's scope: spells named "Increase Spell
+Dam N" whose default build shows an N at least `--abs-threshold` (5) higher
+than an older build's prefer that older build. `--columns` widens the check to
+numeric dump columns (e.g. effectBasePoints1..3) and then also requires a
+relative increase of `--rel-threshold` (default 0.25), so ordinary patch buffs
+are not reverted wholesale.
+
+Generated corrections are written to build/spell_build_corrections.py, never
+to the tracked, hand-kept `spells_build_overrides.py`; `spells_extract_full.py`
+merges the two (`spells_build_overrides.build_corrections`, hand-kept entries win).
+
+Usage:
+  python3 spells_analyze_discrepancies.py [--src world_full_05_october_2019.sql]
+      [--columns effectBasePoints1,effectBasePoints2,effectBasePoints3]
+      [--abs-threshold 5] [--rel-threshold 0.25] [--items-only] [--jobs N] [--profile]
+
+Requires NumPy:
+  pip install numpy
+"""
+
+import argparse
+import csv
+import os
 import re
 import sqlite3
-from collections import defaultdict
+import time
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover
+    raise SystemExit("NumPy not installed. Run: pip install numpy") from e
+
+from best_version import PREFERRED_BUILDS
+from build_stats import BuildReport
+from dump_cache import cached_rows
+from spell_refs import item_spell_ids
+from spells_build_overrides import GENERATED_PATH
+from table_schema import SPELL_DUMP_COLUMNS
+
+SPELL_DAMAGE = re.compile(r'Increase Spell Dam (\d+)')
+NAME_LABEL = 'name1'
+# Relative threshold applied when --columns widens the check beyond spell damage
+COLUMNS_REL_THRESHOLD = 0.25
+REPORT_PATH = os.path.join('build', 'spell_discrepancies.csv')
+
+
+def column_labels(width):
+    """Names for dump positions (spell_template's dump layout, not the slimmer built table)."""
+    names = [name for name, _ in SPELL_DUMP_COLUMNS]
+    return [names[i] if i < len(names) else f"field{i}" for i in range(width)]
+
+
+def load_columns(rows):
+    """Pad rows into an object matrix and split it into numeric and text column arrays."""
+    width = max(len(r) for r in rows)
+    if any(len(r) != width for r in rows):
+        rows = [tuple(r) + (None,) * (width - len(r)) for r in rows]
+    matrix = np.array(rows, dtype=object)
+    numeric, text = {}, {}
+    for c in range(width):
+        col = matrix[:, c]
+        if any(isinstance(v, str) for v in col):
+            strings = np.where(col == None, '', col).astype(str)  # noqa: E711 (elementwise)
+            text[c] = np.unique(strings, return_inverse=True)[1].reshape(-1)
+        else:
+            numeric[c] = np.where(col == None, np.nan, col).astype(np.float64)  # noqa: E711
+    return width, numeric, text
+
+
+def reference_rows(entry, build):
+    """Sort rows by spell, default build last, and give each row its group's reference index."""
+    rank = np.zeros(len(build), dtype=np.int64)
+    for i, b in enumerate(reversed(PREFERRED_BUILDS), start=1):
+        rank[build == b] = i
+    order = np.lexsort((build, rank, entry))
+    sorted_entry = entry[order]
+    group_end = np.flatnonzero(np.r_[sorted_entry[1:] != sorted_entry[:-1], True])
+    group_id = np.cumsum(np.r_[0, sorted_entry[1:] != sorted_entry[:-1]])
+    return order, group_end[group_id]
+
+
+def spell_damage_values(rows, name_index):
+    """N of "Increase Spell Dam N" in each row's name (NaN for other spells), parsed once per distinct name."""
+    names = np.array([r[name_index] if len(r) > name_index and r[name_index] else '' for r in rows], dtype=object)
+    distinct, inverse = np.unique(names.astype(str), return_inverse=True)
+    parsed = np.array([float(m.group(1)) if (m := SPELL_DAMAGE.search(n)) else np.nan for n in distinct])
+    return parsed[inverse.reshape(-1)]
 
-def analyze_spell_discrepancies():
-    """Analyze all spells to find discrepancies between builds and create comprehensive fixes."""
-    
+
+def analyze_spell_discrepancies(src='world_full_05_october_2019.sql', db_path='build/items.sqlite',
+                                columns=None, abs_threshold=5.0, rel_threshold=None,
+                                items_only=False, jobs=1, profile=False, out_path=GENERATED_PATH):
+    """Compare every build of every spell across all columns and write build corrections."""
     print("Analyzing spell discrepancies across all builds...")
-    
-    # Read the list of spell IDs we need
-    with open('used_spell_ids.txt', 'r') as f:
-        needed_spell_ids = set(int(line.strip()) for line in f if line.strip().isdigit())
-    
-    # Store all versions of each spell
-    spell_builds = defaultdict(list)  # spell_id -> [(build, name, effectBasePoints1)]
-    
-    # Read the SQL file and extract all spell variants
-    with open('world_full_05_october_2019.sql', 'r', encoding='utf-8', errors='ignore') as f:
-        inside_spell_template = False
-        for line in f:
-            if 'INSERT INTO `spell_template`' in line:
-                inside_spell_template = True
-                continue
-            elif inside_spell_template and line.strip().startswith('INSERT INTO'):
-                inside_spell_template = False
-                continue
-            
-            if inside_spell_template and line.strip().startswith('(') and ',' in line:
-                match = re.match(r'\((\d+),\s*(\d+),', line.strip())
-                if match:
-                    spell_id = int(match.group(1))
-                    build = int(match.group(2))
-                    if spell_id in needed_spell_ids:
-                        try:
-                            # Parse the line
-                            data = line.strip()
-                            if data.endswith('),'):
-                                data = data[1:-2]
-                            elif data.endswith(';'):
-                                data = data[1:-2]
-                            else:
-                                data = data[1:-1]
-                            
-                            # Split fields carefully
-                            fields = []
-                            current_field = ""
-                            in_quotes = False
-                            quote_char = None
-                            i = 0
-                            
-                            while i < len(data):
-                                char = data[i]
-                                if not in_quotes:
-                                    if char in ("'", '"'):
-                                        in_quotes = True
-                                        quote_char = char
-                                        current_field += char
-                                    elif char == ',':
-                                        fields.append(current_field.strip())
-                                        current_field = ""
-                                    else:
-                                        current_field += char
-                                else:
-                                    current_field += char
-                                    if char == quote_char and (i == 0 or data[i-1] != '\\'):
-                                        in_quotes = False
-                                        quote_char = None
-                                i += 1
-                            
-                            if current_field.strip():
-                                fields.append(current_field.strip())
-                            
-                            if len(fields) >= 122:
-                                name1 = fields[121].strip("'\"") if len(fields) > 121 else ""
-                                effect1 = int(fields[76]) if len(fields) > 76 and fields[76].lstrip('-').isdigit() else None
-                                
-                                if name1 and name1 != 'NULL' and name1 != '':
-                                    spell_builds[spell_id].append((build, name1, effect1))
-                        except Exception as e:
-                            continue
-    
-    print(f"Found spell data for {len(spell_builds)} spells")
-    
-    # Analyze discrepancies
-    discrepancies = []
+    start = time.perf_counter()
+    report = BuildReport('spells_analyze_discrepancies', profile=profile)
+
+    keys = None
+    if items_only:
+        con = sqlite3.connect(db_path)
+        keys = item_spell_ids(con)
+        con.close()
+    with report.stage('load', nbytes=os.path.getsize(src)) as st:
+        rows = [r for r in cached_rows(src, 'spell_template', jobs=jobs, keys=keys) if len(r) > 1]
+        if not rows:
+            raise SystemExit(f"No spell_template rows found in {src}")
+        width, numeric, text = load_columns(rows)
+        st.advance(len(rows))
+    labels = column_labels(width)
+    print(f"Loaded {len(rows)} spell rows x {width} columns in {time.perf_counter() - start:.2f}s")
+    for c in columns or ():
+        if c >= width:
+            raise SystemExit(f"Spell column {c} is past the dump width ({width} columns)")
+        if c not in numeric:
+            raise SystemExit(f"Spell column {labels[c]} is not numeric; --columns checks numeric columns only")
+
+    entry = numeric[0].astype(np.int64)
+    build = np.nan_to_num(numeric[1], nan=PREFERRED_BUILDS[0]).astype(np.int64)  # NULL build = 5875
+    order, ref = reference_rows(entry, build)
+    entry, build = entry[order], build[order]
+    is_variant = np.arange(len(order)) != ref
+    multi = np.unique(entry[is_variant])
+    print(f"{len(np.unique(entry))} spells, {len(multi)} with more than one build")
+
+    # Diff every column of every non-reference build against its reference build
+    diffs = []  # (column, row indexes)
+    per_column = {}
+    with report.stage('diff') as st:
+        for c in range(2, width):
+            if c in numeric:
+                v = numeric[c][order]
+                r = v[ref]
+                differ = (v != r) & ~(np.isnan(v) & np.isnan(r))
+            else:
+                v = text[c][order]
+                differ = v != v[ref]
+            differ &= is_variant
+            idx = np.flatnonzero(differ)
+            if len(idx):
+                diffs.append((c, idx))
+                per_column[labels[c]] = len(np.unique(entry[idx]))
+        st.advance(len(order))
+
+    print(f"\nColumns that differ between builds ({len(per_column)} of {width - 2}):")
+    for name, count in sorted(per_column.items(), key=lambda kv: -kv[1])[:15]:
+        print(f"  {name:<32} {count} spells")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    original = [rows[i] for i in order]
+    with report.stage('report') as st, open(REPORT_PATH, 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(['entry', 'build', 'reference_build', 'column', 'value', 'reference_value'])
+        for c, idx in diffs:
+            for i in idx:
+                row, ref_row = original[i], original[ref[i]]
+                w.writerow([entry[i], build[i], build[ref[i]], labels[c],
+                            row[c] if c < len(row) else None, ref_row[c] if c < len(ref_row) else None])
+            st.advance(len(idx))
+    print(f"Wrote per-field differences to {REPORT_PATH}")
+
+    # Flag outliers: the default build inflating a checked value over an older build. By default
+    # the value is the spell damage in the name; --columns checks numeric dump columns instead.
+    if columns:
+        checked = [(labels[c], numeric[c]) for c in columns]
+        if rel_threshold is None:
+            rel_threshold = COLUMNS_REL_THRESHOLD
+    else:
+        checked = [('spell damage', spell_damage_values(rows, labels.index(NAME_LABEL)))]
+        if rel_threshold is None:
+            rel_threshold = 0.0
     spell_damage_corrections = {}
-    
-    for spell_id, builds in spell_builds.items():
-        if len(builds) <= 1:
-            continue
-        
-        # Look for spell damage discrepancies
-        spell_damage_values = {}
-        for build, name, effect1 in builds:
-            # Extract spell damage from name
-            match = re.search(r'Increase Spell Dam (\d+)', name)
-            if match:
-                value = int(match.group(1))
-                spell_damage_values[build] = value
-        
-        if len(spell_damage_values) >= 2:
-            values = list(spell_damage_values.values())
-            builds_list = list(spell_damage_values.keys())
-            
-            # Check for significant discrepancies
-            min_val = min(values)
-            max_val = max(values)
-            
-            if max_val - min_val >= 5:  # Significant difference
-                # Get build 4222 and 5875 values specifically
-                val_4222 = spell_damage_values.get(4222)
-                val_5875 = spell_damage_values.get(5875)
-                
-                if val_4222 and val_5875 and val_4222 != val_5875:
-                    discrepancies.append({
-                        'spell_id': spell_id,
-                        'build_4222': val_4222,
-                        'build_5875': val_5875,
-                        'difference': abs(val_5875 - val_4222),
-                        'all_builds': spell_damage_values
-                    })
-                    
-                    # Apply heuristic: if 5875 is significantly higher, prefer 4222
-                    # This is based on the pattern that newer builds often have inflated values
-                    if val_5875 > val_4222 and (val_5875 - val_4222) >= 5:
-                        spell_damage_corrections[spell_id] = 4222
-                        print(f"Spell {spell_id}: Build 5875 shows {val_5875}, Build 4222 shows {val_4222} - preferring {val_4222}")
-    
-    print(f"\nFound {len(discrepancies)} spells with significant spell damage discrepancies")
-    print(f"Generated corrections for {len(spell_damage_corrections)} spells")
-    
-    # Show some examples
-    print("\nTop 10 discrepancies:")
-    sorted_discrepancies = sorted(discrepancies, key=lambda x: x['difference'], reverse=True)
-    for disc in sorted_discrepancies[:10]:
-        print(f"Spell {disc['spell_id']}: Build 4222={disc['build_4222']}, Build 5875={disc['build_5875']}, diff={disc['difference']}")
-    
-    # Save the corrections to a file
-    with open('spell_build_corrections.py', 'w') as f:
-        f.write("# Auto-generated spell build corrections based on discrepancy analysis\n")
-        f.write("# Prefer older builds when newer builds show significantly inflated values\n\n")
+    reasons = {}
+    for label, values in checked:
+        v = values[order]
+        r = v[ref]
+        inflation = r - v
+        rel = inflation / np.maximum(np.abs(v), 1.0)
+        flagged = (is_variant & (build < build[ref]) & (inflation >= abs_threshold)
+                   & (rel >= rel_threshold))
+        for i in np.flatnonzero(flagged):
+            spell_id = int(entry[i])
+            # Several older builds flagged: keep the newest of them
+            if spell_damage_corrections.get(spell_id, 0) < build[i]:
+                spell_damage_corrections[spell_id] = int(build[i])
+                reasons[spell_id] = (f"{label}: build {build[ref[i]]}={r[i]:g}, "
+                                     f"build {build[i]}={v[i]:g}")
+
+    print(f"\nGenerated corrections for {len(spell_damage_corrections)} spells")
+    for spell_id in sorted(spell_damage_corrections)[:10]:
+        print(f"Spell {spell_id}: {reasons[spell_id]} - preferring build {spell_damage_corrections[spell_id]}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp = out_path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write("# Generated by spells_analyze_discrepancies.py - do not edit; hand-kept pins go in\n")
+        f.write("# spells_build_overrides.py. Prefer older builds when the default build shows an inflated value.\n\n")
         f.write("SPELL_BUILD_CORRECTIONS = {\n")
         for spell_id, preferred_build in sorted(spell_damage_corrections.items()):
-            f.write(f"    {spell_id}: {preferred_build},  # Spell damage discrepancy detected\n")
+            f.write(f"    {spell_id}: {preferred_build},  # {reasons[spell_id]}\n")
         f.write("}\n")
-    
-    print(f"\nSaved corrections to spell_build_corrections.py")
+    os.replace(tmp, out_path)
+
+    print(f"\nSaved corrections to {out_path} ({time.perf_counter() - start:.2f}s total)")
+    report.write()
     return spell_damage_corrections
 
+
+def parse_columns(value):
+    """Comma-separated column names or dump positions."""
+    labels = None
+    out = []
+    for part in value.split(','):
+        part = part.strip()
+        if part.isdigit():
+            out.append(int(part))
+            continue
+        if labels is None:
+            labels = column_labels(256)
+        if part not in labels:
+            raise SystemExit(f"Unknown spell column {part!r}")
+        out.append(labels.index(part))
+    return out
+
+
 if __name__ == "__main__":
-    analyze_spell_discrepancies()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--src', default='world_full_05_october_2019.sql', help="world dump to read")
+    parser.add_argument('--db', default='build/items.sqlite', help="built DB (for --items-only)")
+    parser.add_argument('--columns', help="numeric columns checked for inflated values (names or positions) "
+                                          "instead of the spell damage in the name")
+    parser.add_argument('--abs-threshold', type=float, default=5.0,
+                        help="minimum absolute increase to flag (default: 5)")
+    parser.add_argument('--rel-threshold', type=float,
+                        help="minimum increase relative to the older value (default: 0.25 with --columns, "
+                             "else 0)")
+    parser.add_argument('--items-only', action='store_true', help="only spells referenced by items")
+    parser.add_argument('--jobs', type=int, default=1, help="decode worker processes (0 = one per CPU)")
+    parser.add_argument('--out', default=GENERATED_PATH, help="generated corrections module")
+    parser.add_argument('--profile', action='store_true', help="dump cProfile stats per stage to build/profile/")
+    args = parser.parse_args()
+    analyze_spell_discrepancies(args.src, args.db,
+                                parse_columns(args.columns) if args.columns else None,
+                                args.abs_threshold, args.rel_threshold, args.items_only, args.jobs,
+                                args.profile, args.out)
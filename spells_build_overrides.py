@@ -1,6 +1,16 @@
-# Auto-generated spell build corrections based on discrepancy analysis
-# Prefer older builds when newer builds show significantly inflated values
+"""Hand-kept spell build corrections: spell id -> client build the extractor should use.
+
+spells_analyze_discrepancies.py writes its generated corrections to
+build/spell_build_corrections.py (GENERATED_PATH) and never edits this file;
+`build_corrections()` merges the two for spells_extract_full.py, with the
+entries kept here taking precedence.
+"""
+import os
+import runpy
+
+GENERATED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'spell_build_corrections.py')
 
+# Prefer older builds when newer builds show significantly inflated values
 SPELL_BUILD_CORRECTIONS = {
     9342: 4222,  # Spell damage discrepancy detected
     9343: 4222,  # Spell damage discrepancy detected
@@ -31,3 +41,11 @@ SPELL_BUILD_CORRECTIONS = {
     18056: 4222,  # Spell damage discrepancy detected
     18057: 4222,  # Spell damage discrepancy detected
 }
+
+
+def build_corrections(generated_path: str = GENERATED_PATH) -> dict:
+    """Generated corrections (if the analysis has run) overlaid with the hand-kept ones."""
+    generated = {}
+    if os.path.exists(generated_path):
+        generated = runpy.run_path(generated_path).get('SPELL_BUILD_CORRECTIONS', {})
+    return {**generated, **SPELL_BUILD_CORRECTIONS}
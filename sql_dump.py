@@ -0,0 +1,279 @@
+"""Streaming reader for the MySQL dumps the build pipeline consumes.
+
+`classic-wow-item-db/db/unmodified.sql` and `world_full_05_october_2019.sql`
+are memory-mapped and scanned as bytes: `INSERT INTO `<table>`` headers and
+row boundaries are found by byte regexes running directly over the mapping,
+so statements for other tables (most of the world dump) are skipped without
+ever being decoded to `str`, and the file is never held twice in memory
+(the page cache backs the mapping; there is no bytes + str copy).
+
+Only the rows of the requested table are decoded, without `eval`: quoted
+strings are unescaped with MySQL rules and the remaining literals (integers,
+floats, NULL) are handed to the C JSON parser in one call per row. Passing
+`fields` decodes just those column positions instead, leaving every other
+string and number in the row untouched, and passing `keys` drops rows whose
+first column is not in that set before anything else in them is decoded.
+With `jobs > 1` the parent process
+only finds row boundaries and batches of rows are decoded in a process pool;
+batches are yielded in submission order, so the output is identical to a
+serial run.
+
+`iter_table_tuples` scans for several tables at once and tags each row with
+its table; dump_router.py builds single-pass, multi-consumer reads on it.
+
+Usage:
+  from sql_dump import iter_rows, iter_tuples
+  for raw in iter_tuples('classic-wow-item-db/db/unmodified.sql', 'items'):
+      ...  # raw == b"(25,0,2,7,'Worn Shortsword',...)"
+  for values in iter_rows('classic-wow-item-db/db/unmodified.sql', 'items'):
+      ...  # values == (25, 0, 2, 7, 'Worn Shortsword', ...)
+  for entry, name in iter_rows('world_full_05_october_2019.sql', 'spell_template', fields=(0, 121)):
+      ...
+"""
+from __future__ import annotations
+import json
+import mmap
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import AbstractSet, Iterator, Optional, Sequence, Union
+
+# Bump whenever decoded output changes; invalidates dump_cache entries.
+PARSER_VERSION = 1
+# Read size for hashing whole dumps (see dump_cache.source_digest).
+CHUNK_SIZE = 1 << 20
+# Rows per unit of work handed to a decode worker.
+PARALLEL_BATCH_ROWS = 2000
+# Above this many requested fields, decoding the whole row through the JSON
+# fast path and picking columns is cheaper than the selective walk.
+SPARSE_FIELDS = 16
+
+# Quoted MySQL string, unrolled so a truncated row fails fast instead of
+# backtracking: '...', with backslash escapes.
+_STRING = rb"'[^'\\]*(?:\\.[^'\\]*)*'"
+# One top-level row: parentheses inside strings do not count towards nesting.
+_TUPLE_RE = re.compile(rb"\s*(\([^'()]*(?:%s[^'()]*)*\))\s*([,;])" % _STRING)
+
+# String body capture for decoding; also accepts SQL-standard '' quote doubling.
+_STRING_BODY = r"'([^'\\]*(?:(?:\\.|'')[^'\\]*)*)'"
+_STRING_SPLIT_RE = re.compile(_STRING_BODY)
+_FIELD_RE = re.compile(_STRING_BODY + r"|([^,'()\s;]+)")
+# Same split over undecoded bytes, for field-selective decoding.
+_STRING_SPLIT_RE_B = re.compile(_STRING_BODY.encode())
+_SEPARATORS = b' ,\t\r\n'
+_ESCAPE_RE = re.compile(r"\\(.)|''", re.S)
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a', '%': '\\%', '_': '\\_'}
+
+# strict=False lets raw control characters (e.g. unescaped tabs) through in strings.
+_json_loads = json.JSONDecoder(strict=False).decode
+_json_dumps = json.dumps
+
+
+def _header_re(tables: Sequence[str]) -> re.Pattern:
+    names = b'|'.join(re.escape(t.encode()) for t in tables)
+    return re.compile(
+        rb"INSERT INTO `(%s)`(?:\s*\([^)]*\))?\s*VALUES\s*" % names,
+        re.IGNORECASE,
+    )
+
+
+def iter_table_tuples(path: str, tables: Sequence[str]) -> Iterator[tuple]:
+    """Yield (table, raw row bytes) for every row inserted into any of `tables`, in one pass.
+
+    Statements for all the tables are found by a single header regex, so
+    routing several tables costs one scan of the file, not one per table.
+    """
+    header_re = _header_re(tables)
+    by_name = {t.lower(): t for t in tables}
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while True:
+                m = header_re.search(mm, pos)
+                if m is None:
+                    return
+                table = by_name[m.group(1).decode().lower()]
+                pos = m.end()
+                while True:
+                    m = _TUPLE_RE.match(mm, pos)
+                    if m is None:
+                        if not mm[pos:].strip():
+                            return  # dump ends mid-statement
+                        raise ValueError(f"Malformed `{table}` row in {path}: {mm[pos:pos + 80]!r}...")
+                    yield table, m.group(1)
+                    pos = m.end()
+                    if m.group(2) == b';':
+                        break
+
+
+def iter_tuples(path: str, table: str) -> Iterator[bytes]:
+    """Yield the raw bytes of each row tuple inserted into `table`, in file order."""
+    for _, raw in iter_table_tuples(path, (table,)):
+        yield raw
+
+
+def _unescape_match(m: re.Match) -> str:
+    c = m.group(1)
+    if c is None:
+        return "'"
+    return _ESCAPES.get(c, c)
+
+
+def unescape(s: str) -> str:
+    """Undo MySQL string-literal escaping (backslash sequences and '')."""
+    if '\\' not in s and "''" not in s:
+        return s
+    return _ESCAPE_RE.sub(_unescape_match, s)
+
+
+def _decode_literal(token: str):
+    if token.upper() == 'NULL':
+        return None
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+
+def _decode_tokens(raw: str) -> tuple:
+    """Token-by-token fallback for literals the JSON fast path rejects."""
+    return tuple(
+        _decode_literal(bare) if bare else unescape(s)
+        for s, bare in _FIELD_RE.findall(raw)
+    )
+
+
+def decode_tuple(raw: Union[bytes, str]) -> tuple:
+    """Decode one `(...)` row into a tuple of int / float / str / None values."""
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8', 'ignore')
+    parts = _STRING_SPLIT_RE.split(raw[1:-1])
+    for k in range(0, len(parts), 2):
+        if 'NULL' in parts[k]:
+            parts[k] = parts[k].replace('NULL', 'null')
+    for k in range(1, len(parts), 2):
+        s = parts[k]
+        if '\\' in s or '"' in s or "''" in s:
+            parts[k] = _json_dumps(unescape(s))
+        else:
+            parts[k] = '"' + s + '"'
+    try:
+        return tuple(_json_loads('[' + ''.join(parts) + ']'))
+    except ValueError:
+        return _decode_tokens(raw)
+
+
+def decode_fields(raw: bytes, fields: Sequence[int]) -> tuple:
+    """Decode only the column positions in `fields` (None where the row is shorter).
+
+    The row is split into quoted strings and runs of bare literals at C speed;
+    only the requested strings are unescaped and converted to `str`, and only
+    the requested numbers are parsed.
+    """
+    if len(fields) > SPARSE_FIELDS:
+        row = decode_tuple(raw)
+        return tuple(row[i] if i < len(row) else None for i in fields)
+    wanted = sorted((f, slot) for slot, f in enumerate(fields))
+    out = [None] * len(fields)
+    w = 0
+    idx = 0  # column position of the next value
+    for k, part in enumerate(_STRING_SPLIT_RE_B.split(raw[1:-1])):
+        if w == len(wanted):
+            break
+        if k & 1:
+            while w < len(wanted) and wanted[w][0] == idx:
+                out[wanted[w][1]] = unescape(part.decode('utf-8', 'ignore'))
+                w += 1
+            idx += 1
+            continue
+        part = part.strip(_SEPARATORS)
+        if not part:
+            continue
+        pieces = part.split(b',')
+        end = idx + len(pieces)
+        while w < len(wanted) and wanted[w][0] < end:
+            token = pieces[wanted[w][0] - idx].strip().decode('ascii', 'ignore')
+            out[wanted[w][1]] = _decode_literal(token)
+            w += 1
+        idx = end
+    return tuple(out)
+
+
+def row_key(raw: bytes):
+    """First column of an undecoded row (the entry id), read without decoding the rest."""
+    try:
+        return int(raw[1:raw.index(b',')])
+    except ValueError:
+        return decode_fields(raw, (0,))[0]
+
+
+def _with_keys(tuples: Iterator[bytes], keys: Optional[AbstractSet]) -> Iterator[bytes]:
+    if keys is None:
+        return tuples
+    return (raw for raw in tuples if row_key(raw) in keys)
+
+
+def _decoder(fields: Optional[Sequence[int]]):
+    if fields is None:
+        return decode_tuple
+    return partial(decode_fields, fields=tuple(fields))
+
+
+def resolve_jobs(jobs: int) -> int:
+    """`--jobs` value to a worker count: 0 (or less) means one per CPU."""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+def _decode_batch(batch: list, fields: Optional[tuple] = None) -> list:
+    decode = _decoder(fields)
+    return [decode(raw) for raw in batch]
+
+
+def pool_context():
+    """Multiprocessing context for decode/verify worker pools: fork where available.
+
+    fork needs no re-import of __main__, which also covers the heredoc
+    importers in items_build.sh (their __main__ is <stdin>).
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _iter_rows_parallel(path: str, table: str, jobs: int, fields: Optional[tuple],
+                        keys: Optional[AbstractSet]) -> Iterator[tuple]:
+    tuples = _with_keys(iter_tuples(path, table), keys)
+    with ProcessPoolExecutor(jobs, mp_context=pool_context()) as pool:
+        pending = deque()
+        while True:
+            batch = list(islice(tuples, PARALLEL_BATCH_ROWS))
+            if batch:
+                pending.append(pool.submit(_decode_batch, batch, fields))
+            # Keep a bounded window of batches in flight; results leave in order.
+            while pending and (len(pending) > 2 * jobs or not batch):
+                yield from pending.popleft().result()
+            if not batch:
+                return
+
+
+def iter_rows(path: str, table: str, jobs: int = 1, fields: Optional[Sequence[int]] = None,
+              keys: Optional[AbstractSet] = None) -> Iterator[tuple]:
+    """Yield every row inserted into `table` as a decoded tuple, in file order.
+
+    With `fields`, each tuple holds just those column positions, in that order.
+    With `keys`, only rows whose first column is in the set are decoded.
+    """
+    jobs = resolve_jobs(jobs)
+    fields = tuple(fields) if fields is not None else None
+    if jobs > 1:
+        yield from _iter_rows_parallel(path, table, jobs, fields, keys)
+        return
+    decode = _decoder(fields)
+    for raw in _with_keys(iter_tuples(path, table), keys):
+        yield decode(raw)
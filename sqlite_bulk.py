@@ -0,0 +1,160 @@
+"""Bulk-load helper for the SQLite writes done by the build scripts.
+
+The build databases are throwaway until the final copy into the bundle, so a
+load can trade durability for speed:
+ - build-only pragmas: rollback journal kept in memory, no fsync, a large page
+   cache and in-memory temp storage. A failed load still rolls back cleanly
+   (the journal exists, it just never hits the disk). The journal mode is the
+   one setting a file remembers (WAL), so the previous mode is restored on exit
+ - one prepared INSERT fed through batched `executemany` inside one transaction
+ - secondary indexes on the target table are dropped for the load and recreated
+   from their original DDL afterwards; FTS tables are filled with a single
+   `rebuild` once the data is in place
+
+Usage:
+  with BulkLoader(con, 'items', fts_tables=['items_fts']) as loader:
+      loader.insert_records('items', records)   # iterable of column -> value dicts
+  # or: loader.insert('INSERT INTO t VALUES (?,?)', rows)
+"""
+from __future__ import annotations
+import sqlite3
+import time
+from itertools import islice
+from typing import Callable, Iterable, Mapping, Optional, Sequence
+
+BATCH_ROWS = 5000
+CACHE_SIZE_KIB = 256 * 1024
+BUILD_PRAGMAS = (
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KIB}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def apply_build_pragmas(con: sqlite3.Connection) -> None:
+    for pragma in BUILD_PRAGMAS:
+        con.execute(pragma)
+
+
+def table_indexes(con: sqlite3.Connection, table: str) -> list:
+    """(name, sql) of explicitly created indexes on `table` (not autoindexes)."""
+    return con.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,),
+    ).fetchall()
+
+
+class BulkLoader:
+    """Context manager wrapping one bulk load into `table`.
+
+    `progress`, when given, is called with each batch's row count instead of
+    printing a line every `progress_every` rows (e.g. `build_stats.Stage.advance`).
+    """
+
+    def __init__(self, con: sqlite3.Connection, table: str,
+                 fts_tables: Sequence[str] = (), batch_size: int = BATCH_ROWS,
+                 progress_every: int = 2000, label: Optional[str] = None,
+                 progress: Optional[Callable[[int], None]] = None):
+        self.con = con
+        self.table = table
+        self.fts_tables = list(fts_tables)
+        self.batch_size = batch_size
+        self.progress_every = progress_every
+        self.label = label or table
+        self.progress = progress
+        self.rows = 0
+        self.insert_seconds = 0.0
+        self.index_seconds = 0.0
+        self.fts_seconds = 0.0
+        self._indexes = []
+        self._isolation = None
+        self._journal_mode = None
+
+    def __enter__(self) -> 'BulkLoader':
+        self._isolation = self.con.isolation_level
+        self.con.commit()
+        self.con.isolation_level = None  # explicit BEGIN/COMMIT below
+        self._journal_mode = self.con.execute("PRAGMA journal_mode").fetchone()[0]
+        apply_build_pragmas(self.con)
+        self.con.execute("BEGIN")
+        self._indexes = table_indexes(self.con, self.table)
+        for name, _ in self._indexes:
+            self.con.execute(f'DROP INDEX "{name}"')
+        return self
+
+    def execute(self, sql: str, params: Sequence = ()) -> sqlite3.Cursor:
+        return self.con.execute(sql, params)
+
+    def insert(self, sql: str, rows: Iterable[Sequence]) -> int:
+        """Insert `rows` with one prepared statement, `batch_size` rows per executemany.
+
+        Only time spent inside SQLite counts towards the reported rows/sec, so
+        the figure is not diluted by however `rows` is produced.
+        """
+        cur = self.con.cursor()
+        it = iter(rows)
+        count = 0
+        while True:
+            batch = list(islice(it, self.batch_size))
+            if not batch:
+                break
+            start = time.perf_counter()
+            cur.executemany(sql, batch)
+            self.insert_seconds += time.perf_counter() - start
+            before = self.rows
+            count += len(batch)
+            self.rows += len(batch)
+            if self.progress is not None:
+                self.progress(len(batch))
+            elif self.progress_every and before // self.progress_every != self.rows // self.progress_every:
+                print(f"  inserted {self.rows} {self.label} rows")
+        return count
+
+    def insert_records(self, table: str, records: Iterable[Mapping], verb: str = 'INSERT') -> int:
+        """Insert column -> value dicts; the statement is prepared from the first record's keys."""
+        it = iter(records)
+        first = next(it, None)
+        if first is None:
+            return 0
+        cols = list(first)
+        sql = f"{verb} INTO {table} ({','.join(cols)}) VALUES ({','.join('?' * len(cols))})"
+
+        def values():
+            yield tuple(first.values())
+            for record in it:
+                yield tuple(record.values())
+        return self.insert(sql, values())
+
+    def _restore_journal_mode(self) -> None:
+        if self._journal_mode and self._journal_mode.lower() != 'memory':
+            self.con.execute(f"PRAGMA journal_mode = {self._journal_mode}")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.con.execute("ROLLBACK")
+            self._restore_journal_mode()
+            self.con.isolation_level = self._isolation
+            return
+        self.con.execute("COMMIT")
+
+        start = time.perf_counter()
+        self.con.execute("BEGIN")
+        for _, sql in self._indexes:
+            self.con.execute(sql)
+        self.con.execute("COMMIT")
+        self.index_seconds = index_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for fts in self.fts_tables:
+            self.con.execute(f"INSERT INTO {fts}({fts}) VALUES('rebuild')")
+        self.fts_seconds = fts_seconds = time.perf_counter() - start
+        self._restore_journal_mode()
+        self.con.isolation_level = self._isolation
+
+        rate = self.rows / self.insert_seconds if self.insert_seconds else 0.0
+        print(f"  bulk insert: {self.rows} {self.label} rows in {self.insert_seconds:.2f}s ({rate:,.0f} rows/sec)")
+        if self._indexes:
+            print(f"  rebuilt {len(self._indexes)} indexes in {index_seconds:.2f}s")
+        if self.fts_tables:
+            print(f"  rebuilt {', '.join(self.fts_tables)} in {fts_seconds:.2f}s")
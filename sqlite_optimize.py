@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Post-build layout optimization for the shipped items.sqlite.
+
+The build DB is written for load speed, not for reading: FTS5 keeps one
+segment per flush, there are no planner statistics, and pages end up in
+insert order. This stage prepares the read-only copy that goes into the app
+bundle. The source DB is only read (VACUUM INTO from a read-only connection);
+every change happens on a staging copy next to the destination:
+ - `VACUUM INTO` the staging copy, switched to a rollback journal
+ - merges every FTS5 table's segments (`'optimize'`) and runs ANALYZE there,
+   so `sqlite_stat1` ships with the bundle
+ - writes the copy with `VACUUM INTO` for each candidate page size and keeps
+   the smallest file; VACUUM rewrites each table in rowid order, so item rows
+   sit contiguously by `entry` (the items schema already lists the columns the
+   app reads first, ahead of the rarely used ones)
+ - checks that the copy uses a rollback journal (a WAL database cannot be
+   opened from a read-only bundle) and passes `PRAGMA quick_check`
+
+File size and the time to open the DB and run the first search on a fresh
+connection are measured before and after, and the bundle's bytes per table
+(dbstat) after; all of it is printed and recorded in build/build_report.json.
+The OS file cache is not dropped between runs, so the timings show SQLite-side
+cold-start work (schema parse, b-tree descent, FTS segment reads), not disk
+latency.
+
+Usage:
+  python3 sqlite_optimize.py [SRC_DB] [DEST_DB] [--page-size auto|4096|...]
+      [--query '"thunder"*']
+"""
+from __future__ import annotations
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from build_stats import BuildReport
+
+# Never below the 4 KiB OS page: smaller SQLite pages still cost a full page read
+PAGE_SIZES = (4096, 8192, 16384)
+DEFAULT_QUERY = '"thunder"*'
+PROBE_RUNS = 5
+# The app's search query (ItemRepository.searchItems)
+SEARCH_SQL = ("SELECT i.* FROM items i JOIN items_fts f ON i.entry = f.rowid "
+              "WHERE items_fts MATCH ? ORDER BY rank LIMIT 50")
+
+
+def file_size(path: str) -> int:
+    """Size of the database including any -wal file next to it."""
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def first_query_ms(path: str, query: str = DEFAULT_QUERY, runs: int = PROBE_RUNS) -> float:
+    """Median time to open `path` read-only and run the app's first search, in ms."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        con.execute(SEARCH_SQL, (query,)).fetchall()
+        con.close()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def fts_tables(con: sqlite3.Connection) -> List[str]:
+    return [r[0] for r in con.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%USING fts5%'")]
+
+
+def table_bytes(con: sqlite3.Connection) -> Optional[Dict[str, int]]:
+    """Bytes of pages per table, indexes and FTS shadow tables folded into their table.
+
+    None when SQLite was built without the dbstat virtual table.
+    """
+    owner = {name: table for name, table in con.execute("SELECT name, tbl_name FROM sqlite_master")}
+    for table in fts_tables(con):
+        for shadow in ('data', 'idx', 'content', 'docsize', 'config'):
+            owner[f"{table}_{shadow}"] = table
+    try:
+        pages = con.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall()
+    except sqlite3.OperationalError:
+        return None
+    sizes: Dict[str, int] = {}
+    for name, nbytes in pages:
+        table = owner.get(name, name)
+        sizes[table] = sizes.get(table, 0) + nbytes
+    return dict(sorted(sizes.items(), key=lambda kv: -kv[1]))
+
+
+def print_table_bytes(sizes: Optional[Dict[str, int]], limit: int = 12) -> None:
+    if sizes is None:
+        print("  (bytes per table unavailable: SQLite built without dbstat)")
+        return
+    total = sum(sizes.values()) or 1
+    for table, nbytes in list(sizes.items())[:limit]:
+        print(f"  {table:<32} {nbytes / 1e6:8.2f} MB {nbytes / total:6.1%}")
+
+
+def stage_copy(src: str, stage: str) -> None:
+    """Copy `src` to `stage` with VACUUM INTO over a read-only connection, leaving `src` untouched."""
+    if os.path.exists(stage):
+        os.remove(stage)
+    con = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    con.execute("VACUUM INTO ?", (stage,))
+    con.close()
+
+
+def prepare_copy(path: str) -> List[str]:
+    """Switch the staging copy to a rollback journal, merge FTS segments and gather statistics."""
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode = DELETE")
+    merged = fts_tables(con)
+    for table in merged:
+        con.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+    con.execute("ANALYZE")
+    con.commit()
+    con.close()
+    return merged
+
+
+def vacuum_into(src: str, dest: str, page_size: int) -> int:
+    if os.path.exists(dest):
+        os.remove(dest)
+    con = sqlite3.connect(src)
+    con.execute(f"PRAGMA page_size = {int(page_size)}")
+    con.execute("VACUUM INTO ?", (dest,))
+    con.close()
+    return os.path.getsize(dest)
+
+
+def check_read_only_layout(path: str) -> str:
+    """Make sure the bundle opens from read-only storage; returns its journal mode."""
+    with open(path, 'rb') as f:
+        header = f.read(20)
+    if header[18] == 2 or header[19] == 2:  # file format versions: 2 = WAL
+        con = sqlite3.connect(path)
+        con.execute("PRAGMA journal_mode = DELETE")
+        con.close()
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    mode = con.execute("PRAGMA journal_mode").fetchone()[0]
+    check = con.execute("PRAGMA quick_check").fetchone()[0]
+    con.close()
+    if mode == 'wal':
+        raise SystemExit(f"❌ {path} is still in WAL mode; it cannot be opened from a read-only bundle")
+    if check != 'ok':
+        raise SystemExit(f"❌ quick_check failed for {path}: {check}")
+    for stale in (path + '-wal', path + '-shm'):
+        if os.path.exists(stale):
+            os.remove(stale)
+    return mode
+
+
+def optimize_db(src: str, dest: str, page_size: Optional[int] = None, query: str = DEFAULT_QUERY,
+                profile: bool = False) -> dict:
+    """Write an optimized read-only copy of `src` to `dest`; returns the before/after numbers."""
+    report = BuildReport('sqlite_optimize', profile=profile)
+    before_size = file_size(src)
+    before_ms = first_query_ms(src, query)
+
+    staged = dest + '.stage'
+    with report.stage('prepare') as st:
+        stage_copy(src, staged)
+        merged = prepare_copy(staged)
+        st.extra['fts_tables'] = merged
+
+    tmp = dest + '.tmp'
+    try:
+        with report.stage('vacuum', nbytes=before_size) as st:
+            sizes = {}
+            for candidate in ([page_size] if page_size else PAGE_SIZES):
+                sizes[candidate] = vacuum_into(staged, tmp, candidate)
+                print(f"  page_size {candidate:>5}: {sizes[candidate] / 1e6:.2f} MB")
+            chosen = min(sizes, key=lambda p: (sizes[p], p))
+            if chosen != candidate:  # tmp holds the last candidate tried
+                vacuum_into(staged, tmp, chosen)
+            journal_mode = check_read_only_layout(tmp)
+            os.replace(tmp, dest)
+            st.extra.update(page_size=chosen, journal_mode=journal_mode)
+    finally:
+        for leftover in (staged, staged + '-journal'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    with report.stage('measure') as st:
+        after_size = file_size(dest)
+        after_ms = first_query_ms(dest, query)
+        result = {
+            'page_size': chosen,
+            'journal_mode': journal_mode,
+            'size_before_mb': round(before_size / 1e6, 2),
+            'size_after_mb': round(after_size / 1e6, 2),
+            'first_query_ms_before': round(before_ms, 2),
+            'first_query_ms_after': round(after_ms, 2),
+        }
+        con = sqlite3.connect(f"file:{dest}?mode=ro", uri=True)
+        sizes = table_bytes(con)
+        con.close()
+        st.extra.update(result, table_bytes=sizes)
+    report.write()
+
+    print(f"  size:        {before_size / 1e6:8.2f} MB -> {after_size / 1e6:8.2f} MB "
+          f"({(after_size - before_size) / before_size:+.1%})")
+    print(f"  first query: {before_ms:8.2f} ms -> {after_ms:8.2f} ms ({query!r}, median of {PROBE_RUNS})")
+    print(f"  page_size {chosen}, journal_mode {journal_mode}, FTS optimized: {', '.join(merged) or 'none'}")
+    print_table_bytes(sizes)
+    return result
+
+
+if __name__ == '__main__':
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('src', nargs='?', default=os.path.join(root, 'build', 'items.sqlite'))
+    parser.add_argument('dest', nargs='?', default=os.path.join(root, 'Resources', 'items.sqlite'))
+    parser.add_argument('--page-size', default='auto',
+                        help="page size in bytes, or 'auto' to keep the smallest of %s" % (PAGE_SIZES,))
+    parser.add_argument('--query', default=DEFAULT_QUERY, help="FTS query used for the first-query timing")
+    parser.add_argument('--profile', action='store_true', help="dump cProfile stats per stage to build/profile/")
+    args = parser.parse_args()
+    os.makedirs(os.path.dirname(os.path.abspath(args.dest)), exist_ok=True)
+    optimize_db(args.src, args.dest, None if args.page_size == 'auto' else int(args.page_size),
+                args.query, args.profile)
@@ -0,0 +1,382 @@
+"""Declarative schemas of the built tables: items and spells.
+
+Each table is a `TableSchema`: its columns in table order, each with a
+declared type, a DDL default and the position it is read from in a decoded
+dump row. From that one declaration the schema generates
+ - the CREATE TABLE statement (`create_sql`) and the INSERT (`insert_sql`)
+ - a compiled row mapper (`compile_mapper`): one `itemgetter` over the source
+   positions plus the typed converters of only the columns that need one, so
+   mapping a row is a tuple transform, not a per-cell branch or a dict build
+
+Registered tables (`SCHEMAS`, `schema(name)`):
+
+  items                          the 129-column item table items_build.sh and
+                                 items_rebuild_patch_priority.py load from
+                                 classic-wow-item-db's unmodified.sql
+                                 (`items_schema_sql()` adds items_fts, data_version,
+                                 item_changes and the indexes)
+  spell_template_ultimate_nerd   entry INTEGER PRIMARY KEY + SPELL_APP_COLUMNS
+                                 (the table Spell.swift maps; `Spell.filter(ids.contains(entry))`
+                                 and the `WHERE entry = ?` lookups use the primary key)
+
+The world dump carries 179 columns per spell build, most of them server-side
+data and eight locale copies of every text, so spells_extract_full.py keeps a
+few dozen (`spell_table(columns)` builds the schema for any other selection)
+and writes the non-empty locale texts the main table does not carry
+(name2..8, nameSubtext1..8, description2..8, auraDescription1..8) to
+`spell_locale (entry, field, locale, text)`. Spell fields missing from a dump
+row, empty strings and every field of an unused effect slot (`effectN = 0`)
+are stored as NULL, which Spell.swift already decodes as nil. Item fields
+missing from short rows are stored as 0, as they always were.
+
+Dump positions are what `spells_analyze_discrepancies.py` labels its columns
+with, so they do not depend on which columns the built table keeps.
+
+Usage:
+  from table_schema import ITEMS
+  map_item = ITEMS.compile_mapper()
+  loader.insert(ITEMS.insert_sql('INSERT OR REPLACE'), (map_item(v) for v in rows))
+
+  python3 table_schema.py items | sqlite3 build/items.sqlite   # print a table's schema script
+"""
+from __future__ import annotations
+import re
+import sys
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+
+def _expand(spec: str) -> List[str]:
+    """'reagent1-8 speed' -> ['reagent1', ..., 'reagent8', 'speed']"""
+    names = []
+    for token in spec.split():
+        m = re.fullmatch(r'(\w*?)(\d+)-(\d+)', token)
+        if m:
+            names.extend(f"{m.group(1)}{i}" for i in range(int(m.group(2)), int(m.group(3)) + 1))
+        else:
+            names.append(token)
+    return names
+
+
+class Column(NamedTuple):
+    name: str
+    type: str          # INTEGER, REAL or TEXT
+    source: int        # position in the decoded dump row
+    default: object = None
+    not_null: bool = False
+
+    def ddl(self, primary_key: bool = False) -> str:
+        if primary_key:
+            return f"{self.name} {self.type} PRIMARY KEY"
+        sql = f"{self.name} {self.type}"
+        if self.not_null:
+            sql += " NOT NULL"
+        if self.default is not None:
+            sql += f" DEFAULT {self.default!r}" if isinstance(self.default, str) else f" DEFAULT {self.default}"
+        return sql
+
+
+def _real(v):
+    return float(v) if isinstance(v, int) and not isinstance(v, bool) else v
+
+
+def _text(v):
+    return v if v is None or isinstance(v, str) else str(v)
+
+
+def _text_or_null(v):
+    return None if v is None or v == '' else _text(v)
+
+
+# Typed converters per declared type. The dump decoder already yields ints for
+# bare integer literals, so INTEGER columns pass straight through.
+CONVERTERS: Dict[str, Optional[Callable]] = {'INTEGER': None, 'REAL': _real, 'TEXT': _text}
+
+
+class TableSchema:
+    """One built table: its columns in table order and where each is read from."""
+
+    def __init__(self, name: str, columns: Sequence[Column], key: str = 'entry', missing=None,
+                 empty_text_is_null: bool = False):
+        self.name = name
+        self.columns = tuple(columns)
+        self.key = key
+        self.missing = missing  # value of a column the dump row is too short to hold
+        self.empty_text_is_null = empty_text_is_null
+        self.names = tuple(c.name for c in self.columns)
+        self.by_name = {c.name: c for c in self.columns}
+
+    def create_sql(self) -> str:
+        body = ',\n    '.join(c.ddl(primary_key=c.name == self.key) for c in self.columns)
+        return f"CREATE TABLE {self.name} (\n    {body}\n);\n"
+
+    def insert_sql(self, verb: str = 'INSERT') -> str:
+        return (f"{verb} INTO {self.name} ({', '.join(self.names)}) "
+                f"VALUES ({','.join('?' * len(self.names))})")
+
+    def converter(self, column: Column) -> Optional[Callable]:
+        if column.type == 'TEXT' and self.empty_text_is_null:
+            return _text_or_null
+        return CONVERTERS[column.type]
+
+    def compile_mapper(self) -> Callable[[Sequence], tuple]:
+        """A function mapping one decoded dump row to a tuple in `names` order."""
+        get = itemgetter(*(c.source for c in self.columns))
+        width = max(c.source for c in self.columns) + 1
+        pad = (self.missing,) * width
+        convert = tuple((i, f) for i, f in enumerate(map(self.converter, self.columns)) if f is not None)
+
+        def map_row(row: Sequence) -> tuple:
+            if len(row) < width:
+                row = tuple(row) + pad[len(row):]
+            values = get(row)
+            if not convert:
+                return values
+            values = list(values)
+            for i, f in convert:
+                values[i] = f(values[i])
+            return tuple(values)
+        return map_row
+
+
+# --- items (classic-wow-item-db unmodified.sql) -----------------------------
+
+# `items` rows, in dump order
+_ITEM_DUMP_NAMES = _expand("""
+    entry patch class subclass name description display_id quality flags buy_count buy_price
+    sell_price inventory_type allowable_class allowable_race item_level required_level
+    required_skill required_skill_rank required_spell required_honor_rank required_city_rank
+    required_reputation_faction required_reputation_rank max_count stackable container_slots
+""") + [f"stat_{kind}{n}" for n in range(1, 11) for kind in ('type', 'value')] + _expand("""
+    delay range_mod ammo_type
+""") + [f"dmg_{kind}{n}" for n in range(1, 6) for kind in ('min', 'max', 'type')] + _expand("""
+    block armor holy_res fire_res nature_res frost_res shadow_res arcane_res
+""") + [f"spell{kind}_{n}" for n in range(1, 6) for kind in
+        ('id', 'trigger', 'charges', 'ppmrate', 'cooldown', 'category', 'categorycooldown')] + _expand("""
+    bonding page_text page_language page_material start_quest lock_id material sheath
+    random_property set_id max_durability area_bound map_bound duration bag_family disenchant_id
+    food_type min_money_loot max_money_loot extra_flags other_team_entry
+""")
+ITEM_DUMP_INDEX: Dict[str, int] = {name: i for i, name in enumerate(_ITEM_DUMP_NAMES)}
+# Rows shorter than this are not items (the build skips them)
+ITEM_MIN_FIELDS = 110
+
+_ITEM_REAL = set(_expand("range_mod dmg_min1-5 dmg_max1-5 spellppmrate_1-5"))
+_ITEM_TEXT = {'name', 'description'}
+_ITEM_DEFAULTS = {
+    'name': '', 'description': '', 'buy_count': 1, 'allowable_class': -1, 'allowable_race': -1,
+    'stackable': 1, 'other_team_entry': 1,
+    **{f"spellcooldown_{n}": -1 for n in range(1, 6)},
+    **{f"spellcategorycooldown_{n}": -1 for n in range(1, 6)},
+}
+
+# Table order (what the app's Item model reads by name; kept from the original schema)
+_ITEM_TABLE_NAMES = _expand("""
+    entry name description quality class subclass patch display_id inventory_type flags
+    buy_count buy_price sell_price item_level required_level required_skill required_skill_rank
+    required_spell required_honor_rank required_city_rank required_reputation_faction
+    required_reputation_rank allowable_class allowable_race max_count stackable container_slots
+    bonding material sheath
+""") + [f"stat_{kind}{n}" for n in range(1, 11) for kind in ('type', 'value')] + _expand("""
+    delay range_mod ammo_type
+""") + [f"dmg_{kind}{n}" for n in range(1, 6) for kind in ('min', 'max', 'type')] + _expand("""
+    block armor holy_res fire_res nature_res frost_res shadow_res arcane_res
+""") + [f"spell{kind}_{n}" for n in range(1, 6) for kind in
+        ('id', 'trigger', 'charges', 'ppmrate', 'cooldown', 'category', 'categorycooldown')] + _expand("""
+    page_text page_language page_material start_quest lock_id random_property set_id
+    max_durability area_bound map_bound duration bag_family disenchant_id food_type
+    min_money_loot max_money_loot extra_flags other_team_entry
+""")
+
+ITEMS = TableSchema('items', [
+    Column(name, 'REAL' if name in _ITEM_REAL else 'TEXT' if name in _ITEM_TEXT else 'INTEGER',
+           ITEM_DUMP_INDEX[name], None if name == 'entry' else _ITEM_DEFAULTS.get(name, 0),
+           not_null=name in ('name', 'quality'))
+    for name in _ITEM_TABLE_NAMES
+], missing=0)
+
+# Everything else items_build.sh creates next to the items table
+_ITEMS_EXTRA_SQL = """
+-- Search-as-you-type sends one "token"* prefix query per keystroke; prefix indexes for
+-- 1-3 characters cover the shortest, most frequent and widest prefix scans (measured with
+-- bench/bench_fts.py). Apostrophes stay inside tokens (Tirion's, Zul'Gurub), hyphens split
+-- them (Anti-Venom matches venom*), and diacritics fold (ä matches a).
+CREATE VIRTUAL TABLE items_fts USING fts5(
+  entry,
+  name,
+  description,
+  content=items,
+  content_rowid=entry,
+  tokenize='unicode61 remove_diacritics 2 tokenchars ''''''''',
+  prefix='1 2 3'
+);
+
+CREATE TABLE data_version (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  patch_version TEXT NOT NULL,
+  build_date TEXT NOT NULL,
+  source TEXT,
+  source_url TEXT,
+  item_count INTEGER,
+  max_item_level INTEGER,
+  schema_version INTEGER DEFAULT 1,
+  created_at TEXT DEFAULT (datetime('now'))
+);
+
+CREATE TABLE item_changes (
+  entry INTEGER PRIMARY KEY,
+  changed_fields TEXT,
+  change TEXT,
+  deltas TEXT
+);
+
+CREATE INDEX idx_items_class ON items(class, subclass);
+CREATE INDEX idx_items_quality ON items(quality);
+CREATE INDEX idx_items_level ON items(item_level);
+CREATE INDEX idx_items_set ON items(set_id);
+CREATE INDEX idx_items_spellids ON items(spellid_1, spellid_2, spellid_3, spellid_4, spellid_5);
+"""
+
+
+def items_schema_sql() -> str:
+    """The full schema script of a fresh build/items.sqlite."""
+    return ("PRAGMA journal_mode = DELETE;\nPRAGMA synchronous = NORMAL;\n\n"
+            + ITEMS.create_sql() + _ITEMS_EXTRA_SQL)
+
+
+# --- spells (world dump spell_template) -------------------------------------
+
+SPELL_TABLE = 'spell_template_ultimate_nerd'
+LOCALE_TABLE = 'spell_locale'
+
+# spell_template, in dump order (all 179; the four trailing columns past customFlags carry no
+# name in the dump and keep their `fieldN` position labels)
+_DUMP_NAMES = _expand("""
+    entry build school category castUI dispel mechanic attributes attributesEx attributesEx2
+    attributesEx3 attributesEx4 stances stancesNot targets targetCreatureType requiresSpellFocus
+    casterAuraState targetAuraState castingTimeIndex recoveryTime categoryRecoveryTime
+    interruptFlags auraInterruptFlags channelInterruptFlags procFlags procChance procCharges
+    maxLevel baseLevel spellLevel durationIndex powerType manaCost manCostPerLevel manaPerSecond
+    manaPerSecondPerLevel rangeIndex speed modelNextSpell stackAmount totem1-2 reagent1-8
+    reagentCount1-8 equippedItemClass equippedItemSubClassMask equippedItemInventoryTypeMask
+    effect1-3 effectDieSides1-3 effectBaseDice1-3 effectDicePerLevel1-3 effectRealPointsPerLevel1-3
+    effectBasePoints1-3 effectMechanic1-3 effectImplicitTargetA1-3 effectImplicitTargetB1-3
+    effectRadiusIndex1-3 effectApplyAuraName1-3 effectAmplitude1-3 effectMultipleValue1-3
+    effectChainTarget1-3 effectItemType1-3 effectMiscValue1-3 effectTriggerSpell1-3
+    effectPointsPerComboPoint1-3 spellVisual1-2 spellIconId activeIconId spellPriority
+    name1-8 nameFlags nameSubtext1-8 nameSubtextFlags description1-8 descriptionFlags
+    auraDescription1-8 auraDescriptionFlags manaCostPercentage startRecoveryCategory
+    startRecoveryTime minTargetLevel maxTargetLevel spellFamilyName spellFamilyFlags
+    maxAffectedTargets dmgClass preventionType stanceBarOrder dmgMultiplier1-3 minFactionId
+    minReputation requiredAuraVision customFlags field175-178
+""")
+_REAL = set(_expand("speed effectDicePerLevel1-3 effectRealPointsPerLevel1-3 effectMultipleValue1-3 "
+                    "effectPointsPerComboPoint1-3 dmgMultiplier1-3"))
+_TEXT = set(_expand("name1-8 nameSubtext1-8 description1-8 auraDescription1-8"))
+
+SPELL_DUMP_COLUMNS: Tuple[Tuple[str, str], ...] = tuple(
+    (name, 'REAL' if name in _REAL else 'TEXT' if name in _TEXT else 'INTEGER') for name in _DUMP_NAMES)
+DUMP_INDEX: Dict[str, int] = {name: i for i, (name, _) in enumerate(SPELL_DUMP_COLUMNS)}
+
+# What Spell.swift and spell_tooltips.py read, in table order (entry is the primary key)
+SPELL_APP_COLUMNS = tuple(_expand("""
+    entry build school targets procFlags procChance spellLevel durationIndex manaCost rangeIndex
+    speed effect1-3 effectDieSides1-3 effectBaseDice1-3 effectBasePoints1-3 effectApplyAuraName1-3
+    effectChainTarget1-3 effectMiscValue1-3 effectTriggerSpell1-3 name1 description1
+    maxAffectedTargets dmgClass
+"""))
+
+# Locale texts: copy 1 of name/description stays in the main table, the rest go to spell_locale
+LOCALE_FIELDS = ('name', 'nameSubtext', 'description', 'auraDescription')
+LOCALES = range(1, 9)
+EFFECT_SLOTS = (1, 2, 3)
+
+_LOCALE_SQL = f"""
+CREATE TABLE {LOCALE_TABLE} (
+    entry INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    locale INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (entry, field, locale)
+) WITHOUT ROWID;
+"""
+
+
+def spell_table(columns: Sequence[str] = SPELL_APP_COLUMNS) -> TableSchema:
+    """The spell table keeping `columns` of the dump; `entry` must come first."""
+    if columns[0] != 'entry':
+        raise ValueError("the spell table's first column must be entry")
+    return TableSchema(SPELL_TABLE, [Column(c, SPELL_DUMP_COLUMNS[DUMP_INDEX[c]][1], DUMP_INDEX[c]) for c in columns],
+                       empty_text_is_null=True)
+
+
+SPELLS = spell_table()
+
+
+def table_sql(columns: Sequence[str] = SPELL_APP_COLUMNS) -> str:
+    """DDL for the spell table (and spell_locale) keeping `columns`; `entry` must come first."""
+    return (f"DROP TABLE IF EXISTS {SPELL_TABLE};\n" + spell_table(columns).create_sql()
+            + f"DROP TABLE IF EXISTS {LOCALE_TABLE};\n" + _LOCALE_SQL)
+
+
+class SpellRowMapper:
+    """Maps decoded dump rows onto the slim table's columns and spell_locale rows."""
+
+    def __init__(self, columns: Sequence[str] = SPELL_APP_COLUMNS):
+        self.schema = spell_table(columns)
+        self.columns = self.schema.names
+        self.map_row = self.schema.compile_mapper()
+        kept = set(self.columns)
+        self.locale_slots = [(DUMP_INDEX[f"{field}{n}"], field, n)
+                             for field in LOCALE_FIELDS for n in LOCALES if f"{field}{n}" not in kept]
+        # (dump position of effectN, table positions of slot N's columns)
+        self.effect_slots = []
+        for n in EFFECT_SLOTS:
+            positions = tuple(i for i, c in enumerate(self.columns) if self._effect_slot(c) == n)
+            if positions:
+                self.effect_slots.append((DUMP_INDEX[f"effect{n}"], positions))
+
+    @staticmethod
+    def _effect_slot(column: str) -> Optional[int]:
+        """The effect slot a per-effect column belongs to (effectBasePoints2 -> 2)."""
+        m = re.fullmatch(r'effect(?:[A-Z]\w*?)?([1-3])', column)
+        return int(m.group(1)) if m else None
+
+    @property
+    def insert_sql(self) -> str:
+        return self.schema.insert_sql('INSERT OR REPLACE')
+
+    def spell_row(self, row: Sequence) -> tuple:
+        values = self.map_row(row)
+        width = len(row)
+        unused = [positions for i, positions in self.effect_slots if i >= width or not row[i]]
+        if not unused:
+            return values
+        values = list(values)
+        for positions in unused:
+            for i in positions:
+                values[i] = None
+        return tuple(values)
+
+    def locale_rows(self, entry: int, row: Sequence) -> Iterator[tuple]:
+        width = len(row)
+        for i, field, locale in self.locale_slots:
+            if i < width and row[i]:
+                yield (entry, field, locale, str(row[i]))
+
+
+SCHEMAS: Dict[str, TableSchema] = {s.name: s for s in (ITEMS, SPELLS)}
+
+
+def schema(name: str) -> TableSchema:
+    try:
+        return SCHEMAS[name]
+    except KeyError:
+        raise KeyError(f"no schema registered for {name!r} (known: {', '.join(SCHEMAS)})") from None
+
+
+if __name__ == '__main__':
+    # Schema script of one table, for sqlite3 to run
+    name = sys.argv[1] if len(sys.argv) > 1 else 'items'
+    sys.stdout.write(items_schema_sql() if name == 'items' else table_sql() if name == SPELL_TABLE
+                     else schema(name).create_sql())
@@ -0,0 +1,204 @@
+"""Incremental sync of a built table against a freshly selected row set.
+
+Instead of wiping a table and reloading every row, `sync_table` hashes each
+incoming record and each row already in the database (after applying the
+column's SQLite type affinity, so 0 and 0.0 in a REAL column hash alike) and
+writes only the difference:
+ - rows whose key disappeared are deleted
+ - rows whose digest changed are updated in place
+ - new keys are inserted
+An external-content FTS5 table over the same rows is kept in step with
+per-row 'delete' / insert commands instead of a full repopulate, and an
+optional changes table receives one row per added, removed or changed key:
+
+  key, changed_fields TEXT, change TEXT, deltas TEXT
+
+in the same format db_diff.py records (both go through `change_row`):
+`change` is added / removed / changed, and for changed keys
+`changed_fields` lists the differing columns in table order and `deltas` is
+a JSON object `{"armor": [old, new], ...}`.
+
+Usage:
+  from table_sync import sync_table
+  stats = sync_table(con, 'items', 'entry', records,
+                     fts_table='items_fts', changes_table='item_changes')
+"""
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+from itertools import chain
+from typing import Callable, Iterable, List, Mapping, Optional, Sequence, Union
+
+
+def _as_int(v):
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _as_real(v):
+    if isinstance(v, int) and not isinstance(v, bool):
+        return float(v)
+    return v
+
+
+def _as_text(v):
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return str(v)
+    return v
+
+
+def _keep(v):
+    return v
+
+
+def affinity(decl_type: str) -> Callable:
+    """Python approximation of SQLite's column affinity rules for one declared type."""
+    t = (decl_type or '').upper()
+    if 'INT' in t:
+        return _as_int
+    if 'CHAR' in t or 'CLOB' in t or 'TEXT' in t:
+        return _as_text
+    if 'REAL' in t or 'FLOA' in t or 'DOUB' in t:
+        return _as_real
+    return _keep
+
+
+def row_digest(values: Sequence) -> bytes:
+    """Stable content hash of an already affinity-normalized row."""
+    return hashlib.blake2b(repr(tuple(values)).encode('utf-8'), digest_size=16).digest()
+
+
+def table_columns(con: sqlite3.Connection, table: str) -> List[tuple]:
+    """(name, declared type) for each column of `table`, in table order."""
+    return [(r[1], r[2]) for r in con.execute(f"PRAGMA table_info({table})")]
+
+
+CHANGES_COLUMNS = (('changed_fields', 'TEXT'), ('change', 'TEXT'), ('deltas', 'TEXT'))
+
+
+def change_row(key, change: str, fields: Sequence[tuple] = ()) -> tuple:
+    """One changes-table row `(key, changed_fields, change, deltas)`.
+
+    `fields` holds `(field, old, new)` for each changed column in table order;
+    added and removed keys have none, so their changed_fields and deltas are NULL.
+    """
+    names = ','.join(f for f, _, _ in fields) or None
+    deltas = None
+    if change == 'changed':
+        deltas = json.dumps({f: [old, new] for f, old, new in fields}, separators=(',', ':'), ensure_ascii=False)
+    return (key, names, change, deltas)
+
+
+def ensure_changes_table(con: sqlite3.Connection, name: str, key: str = 'entry', schema: str = 'main') -> None:
+    """Create the changes table, or add the columns older builds' tables lack."""
+    con.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{name} ({key} INTEGER PRIMARY KEY, changed_fields TEXT)")
+    have = {r[1] for r in con.execute(f"PRAGMA {schema}.table_info({name})")}
+    for column, decl in CHANGES_COLUMNS:
+        if column not in have:
+            con.execute(f"ALTER TABLE {schema}.{name} ADD COLUMN {column} {decl}")
+
+
+def write_changes(con: sqlite3.Connection, name: str, key: str, rows: Iterable[tuple],
+                  schema: str = 'main') -> None:
+    """Replace the content of changes table `name` with `change_row` tuples."""
+    ensure_changes_table(con, name, key, schema)
+    con.execute(f"DELETE FROM {schema}.{name}")
+    con.executemany(f"INSERT INTO {schema}.{name} ({key}, changed_fields, change, deltas) VALUES (?, ?, ?, ?)",
+                    rows)
+
+
+def sync_table(con: sqlite3.Connection, table: str, key: str, records: Iterable[Union[Mapping, Sequence]],
+               fts_table: Optional[str] = None, changes_table: Optional[str] = None,
+               columns: Optional[Sequence[str]] = None) -> dict:
+    """Make `table` hold exactly `records` (last record per key wins), writing only differences.
+
+    Records are column -> value mappings, or tuples in `columns` order when
+    `columns` is given (what table_schema's compiled mappers produce).
+    """
+    decl = dict(table_columns(con, table))
+    it = iter(records)
+    first = next(it, None)
+    if first is None:
+        raise ValueError(f"refusing to sync {table} against an empty record set")
+    cols = list(columns) if columns is not None else list(first)
+    missing = [c for c in cols if c not in decl]
+    if missing:
+        raise ValueError(f"{table} has no column(s) {', '.join(missing)}")
+    norms = [affinity(decl[c]) for c in cols]
+    k = cols.index(key)
+
+    def normalize(values):
+        return tuple([f(v) for f, v in zip(norms, values)])
+
+    incoming = {}
+    for rec in chain((first,), it):
+        row = normalize(rec if columns is not None else rec.values())
+        incoming[row[k]] = row
+
+    col_list = ','.join(cols)
+    existing = {}
+    for row in con.execute(f"SELECT {col_list} FROM {table}"):
+        row = normalize(row)
+        existing[row[k]] = row_digest(row)
+
+    added = [key_ for key_ in incoming if key_ not in existing]
+    deleted = [key_ for key_ in existing if key_ not in incoming]
+    changed = [key_ for key_, row in incoming.items()
+               if key_ in existing and existing[key_] != row_digest(row)]
+
+    fts_cols = [c for c, _ in table_columns(con, fts_table)] if fts_table else []
+    fts_idx = [cols.index(c) for c in fts_cols]
+
+    def old_row(key_):
+        return normalize(con.execute(f"SELECT {col_list} FROM {table} WHERE {key} = ?", (key_,)).fetchone())
+
+    change_log = []
+    fts_delete = []  # old rows whose FTS entry must go
+    fts_insert = []  # new rows to index
+    for key_ in changed:
+        old = old_row(key_)
+        new = incoming[key_]
+        diff = [(c, o, n) for c, o, n in zip(cols, old, new) if o != n and c != key]
+        change_log.append(change_row(key_, 'changed', diff))
+        if any(old[i] != new[i] for i in fts_idx):
+            fts_delete.append(old)
+            fts_insert.append(new)
+    if fts_table:
+        fts_delete.extend(old_row(key_) for key_ in deleted)
+        fts_insert.extend(incoming[key_] for key_ in added)
+
+    ph = ','.join('?' * len(cols))
+    set_clause = ','.join(f"{c} = ?" for c in cols if c != key)
+    with con:
+        if fts_table:
+            fts_list = ','.join(fts_cols)
+            fts_ph = ','.join('?' * len(fts_cols))
+            con.executemany(
+                f"INSERT INTO {fts_table}({fts_table}, rowid, {fts_list}) VALUES('delete', ?, {fts_ph})",
+                [(row[k], *[row[i] for i in fts_idx]) for row in fts_delete],
+            )
+        con.executemany(f"DELETE FROM {table} WHERE {key} = ?", [(key_,) for key_ in deleted])
+        con.executemany(
+            f"UPDATE {table} SET {set_clause} WHERE {key} = ?",
+            [tuple(v for i, v in enumerate(incoming[key_]) if i != k) + (key_,) for key_ in changed],
+        )
+        con.executemany(f"INSERT INTO {table} ({col_list}) VALUES ({ph})", [incoming[key_] for key_ in added])
+        if fts_table:
+            con.executemany(
+                f"INSERT INTO {fts_table}(rowid, {fts_list}) VALUES(?, {fts_ph})",
+                [(row[k], *[row[i] for i in fts_idx]) for row in fts_insert],
+            )
+        if changes_table:
+            change_log.extend(change_row(key_, 'added') for key_ in added)
+            change_log.extend(change_row(key_, 'removed') for key_ in deleted)
+            change_log.sort(key=lambda row: row[0])
+            write_changes(con, changes_table, key, change_log)
+
+    return {
+        'added': len(added),
+        'updated': len(changed),
+        'deleted': len(deleted),
+        'unchanged': len(incoming) - len(added) - len(changed),
+    }